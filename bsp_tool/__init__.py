@@ -1,11 +1,13 @@
 """A library for .bsp file analysis & modification"""
-__all__ = ["base", "branches", "load_bsp", "lumps",
+__all__ = ["base", "branches", "identify", "load_bsp", "lump_cache", "lumps", "probe", "scan", "shared_lumps",
            "D3DBsp", "FusionBsp", "Genesis3DBsp", "GoldSrcBsp", "IdTechBsp",
            "InfinityWardBsp", "QbismBsp", "QuakeBsp", "Quake64Bsp", "RavenBsp",
            "ReMakeQuakeBsp", "RespawnBsp", "RitualBsp", "ValveBsp"]
 
+from collections import namedtuple
 import os
 from types import ModuleType
+from typing import Any, Tuple, Type, Union
 
 from . import base  # base.Bsp base class
 from . import branches  # all known .bsp variant definitions
@@ -50,9 +52,13 @@ InfinityWard_versions = {v for s in branches.infinity_ward.scripts for v in s.GA
 Quake_versions = {*branches.id_software.quake.GAME_VERSIONS.values()}
 
 
-def load_bsp(filename: str, branch_script: ModuleType = None) -> base.Bsp:
-    """Calculate and return the correct base.Bsp sub-class for the given .bsp"""
-    # TODO: OPTION: use filepath to guess game / branch
+BspProbe = namedtuple("BspProbe", ["filename", "BspClass", "branch", "file_magic", "bsp_version",
+                                   "headers", "signature", "file_size"])
+# ^ summary of a .bsp returned by probe
+
+
+def identify(filename: str) -> (Type[base.Bsp], bytes, Union[int, Tuple[int, int]]):
+    """Reads just enough of the file to return the BspClass, file_magic & version"""
     # verify path
     if not os.path.exists(filename):
         raise FileNotFoundError(f".bsp file '{filename}' does not exist.")
@@ -106,16 +112,39 @@ def load_bsp(filename: str, branch_script: ModuleType = None) -> base.Bsp:
                 BspVariant = BspVariant_for_magic[file_magic]
     else:  # invalid extension
         raise RuntimeError(f"{filename} is not a .bsp file!")
+    return BspVariant, file_magic, version
+
+
+def load_bsp(filename: str, branch_script: ModuleType = None, memory_map: bool = False,
+             lump_cache: Any = None) -> base.Bsp:
+    """Calculate and return the correct base.Bsp sub-class for the given .bsp
+    memory_map reads lumps from a shared mmap of the file, rather than seeking a file handle
+    lump_cache (a lump_cache.LumpCache) skips decoding SpecialLumpClasses which have been decoded before"""
+    # TODO: OPTION: use filepath to guess game / branch
+    BspVariant, file_magic, version = identify(filename)
     # identify branch script
     if branch_script is None:
         branch_script = branches.identify[(file_magic, version)]
     # TODO: ata4's bspsrc uses unique entity classnames to identify branches
     # -- need this for identifying variants with overlapping identifiers
-    return BspVariant(branch_script, filename, autoload=True)  # might raise errors
+    return BspVariant(branch_script, filename, autoload=True, memory_map=memory_map,
+                      lump_cache=lump_cache)  # might raise errors
+
+
+def probe(filename: str, branch_script: ModuleType = None) -> BspProbe:
+    """Read the headers of a .bsp without loading lumps or listing associated files"""
+    BspVariant, file_magic, version = identify(filename)
+    if branch_script is None:
+        branch_script = branches.identify[(file_magic, version)]
+    bsp = BspVariant(branch_script, filename, autoload=False)
+    bsp._preload_headers()
+    bsp.file.close()
+    return BspProbe(os.path.join(bsp.folder, bsp.filename), BspVariant, branch_script, bsp.file_magic,
+                    bsp.bsp_version, bsp.headers, bsp.signature, bsp.bsp_file_size)
 
 
-# TODO: write a generator that walks a path for .bsps, including inside .pk3, .bz2, .iwd & .zip
-# -- this should greatly simplify testing theories / support against whole games
+# NOTE: bsp_tool.scan walks paths for .bsps (including inside .pk3 & .iwd)
+# TODO: scan inside .bz2 & .zip
 # TODO: allow loading .bsp files from bytestreams
 # -- base.Bsp @classmethod .from_stream(stream: bytes | io.BytesIO) alternate __init__?
 # -- requires faking both self.folder (need to hook to some ZipFile method) & overriding self.file
@@ -1,14 +1,31 @@
 from __future__ import annotations
+import copy
+import hashlib
+import importlib
+import io
 import os
+import shutil
 import struct
+import tempfile
+import threading
 from types import MethodType, ModuleType
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Set
+import weakref
+
+from . import lumps
+from .branches import shared
+
+
+def loaded_ref(lump: Any) -> weakref.ref:
+    """weakref to a freshly loaded lump; lumps that can't be weakref'd are always dirty"""
+    try:
+        return weakref.ref(lump)
+    except TypeError:
+        return lambda: None
 
 
 class Bsp:
     """Bsp base class"""
-    associated_files: List[str]  # files in the folder of loaded file with similar names
-    # TODO: include subfolder files (e.g. graphs/<mapname>.ain)
     bsp_version: int | (int, int) = 0  # .bsp format version
     branch: ModuleType  # soft copy of "branch script"
     bsp_file_size: int = 0  # size of .bsp in bytes
@@ -20,17 +37,36 @@ class Bsp:
     headers: Dict[str, Any]
     # ^ {"LUMP.name": LumpHeader}
     # NOTE: header type is self.branch.LumpHeader
-    loading_errors: Dict[str, Exception]
+    _loading_errors: Dict[str, Exception]
     # ^ {"LUMP.name": Error("details")}
+    # NOTE: only contains errors for lumps that have been loaded, see the loading_errors property
+    _loaded_lumps: Dict[str, weakref.ref]
+    # ^ {"LUMP.name": weakref.ref(lump)}
+    # NOTE: lumps which don't match their weakref have been replaced & must be written out in full
+    _load_lock: threading.RLock  # held while loading a lump, so threads don't load the same lump twice
+    _deleted_lumps: Set[str]
+    # ^ {"LUMP.name"}; lumps removed w/ `del bsp.LUMP_NAME`, which are written as empty lumps & not reloaded
+    _lump_hashes: Dict[str, str]
+    # ^ {"LUMP.name": hexdigest}; clean lumps only, cleared when lumps are unloaded
+    compact_entities: bool = False  # load entities lumps as branches.shared.CompactEntities; uses far less memory
+    lump_cache: Any = None  # lump_cache.LumpCache; SpecialLumpClasses are decoded via an on-disk cache
+    memory_mapped: bool = False  # lumps read from a shared mmap of the file
     signature: bytes = b""  # compiler signature; sometimes found between header & data
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True,
+                 memory_map: bool = False, lump_cache: Any = None):
         if not filename.lower().endswith(".bsp"):
             raise RuntimeError("Not a .bsp")
         filename = os.path.realpath(filename)
         self.folder, self.filename = os.path.split(filename)
+        self.memory_mapped = memory_map
+        self.lump_cache = lump_cache
         self.set_branch(branch)
         self.headers = dict()
+        self._load_lock = threading.RLock()
+        self._deleted_lumps = set()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         if autoload:
             if os.path.exists(filename):
                 self._preload()
@@ -38,11 +74,77 @@ class Bsp:
                 print(f"{filename} not found, creating a new .bsp")
                 self.headers = {L.name: self.branch.LumpHeader() for L in self.branch.LUMP}
 
+    def __getattr__(self, attr: str) -> Any:
+        """loads lumps when they are first accessed"""
+        # NOTE: __getattr__ is only called if the attribute doesn't exist, so we load the lump when the user asks for it
+        # -- `del bsp.LUMP_NAME` deletes the lump (see __delattr__), use `bsp.unload("LUMP_NAME")` to reload from file
+        # NOTE: lumps read from self.file w/ positional reads (lumps.read_at), so threads can share a Bsp
+        headers = self.__dict__.get("headers", dict())  # __init__ might not have set headers yet
+        if attr in headers and attr not in self.__dict__.get("_deleted_lumps", ()):
+            with self._load_lock:
+                if attr not in self.__dict__:  # another thread could have loaded it while we waited
+                    self._preload_lump(attr, headers[attr])  # setattr on success
+                    if attr in self.__dict__:
+                        self._loaded_lumps[attr] = loaded_ref(self.__dict__[attr])
+                if attr in self.__dict__:
+                    return self.__dict__[attr]
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{attr}'")
+
+    def __delattr__(self, attr: str):
+        """`del bsp.LUMP_NAME` deletes the lump; it won't be reloaded & is written as an empty lump"""
+        if attr in self.__dict__.get("headers", dict()):
+            self._delete_lump(attr)
+        else:
+            super().__delattr__(attr)
+
+    def _delete_lump(self, lump_name: str):
+        with self._load_lock:
+            self.__dict__.pop(lump_name, None)
+            self._loaded_lumps.pop(lump_name, None)
+            self._deleted_lumps.add(lump_name)
+
+    def unload(self, lump_name: str):
+        """discard the named lump & any changes to it; it will be reloaded from file on next access"""
+        with self._load_lock:
+            self.__dict__.pop(lump_name, None)
+            self._loaded_lumps.pop(lump_name, None)
+            self._deleted_lumps.discard(lump_name)
+
+    @property
+    def associated_files(self) -> List[str]:
+        """files in the folder of loaded file with similar names; listed on first access"""
+        # TODO: include subfolder files (e.g. graphs/<mapname>.ain)
+        if "_associated_files" not in self.__dict__:
+            prefix = self._associated_prefix()
+            self._associated_files = [f for f in os.listdir(self.folder) if f.startswith(prefix)]
+        return self._associated_files
+
+    def _associated_prefix(self) -> str:
+        """associated_files start with this (e.g. "dm.v2" for "dm.v2.bsp")"""
+        return os.path.splitext(self.filename)[0]
+
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.file.close()
+        self.close()
+
+    def close(self):
+        """close self.file & the streams of any loaded lumps (e.g. RespawnBsp .bsp_lump files)"""
+        streams = [self.file]
+        for stream in self._lump_streams():
+            if all(stream is not s for s in streams):
+                streams.append(stream)
+        for stream in streams:
+            try:
+                stream.close()
+            except BufferError:  # a memory-mapped lump is still in use (e.g. a zero-copy numpy array)
+                pass  # NOTE: the mmap is closed once the last view of it is garbage collected
+
+    def _lump_streams(self) -> List[lumps.Stream]:
+        """streams read by loaded lumps; usually self.file"""
+        loaded = [self.__dict__.get(lump_name, None) for lump_name in self.headers]
+        return [lump.stream for lump in loaded if getattr(lump, "stream", None) is not None]
 
     def __repr__(self):
         branch_script = ".".join(self.branch.__name__.split(".")[-2:])
@@ -59,8 +161,11 @@ class Bsp:
         # TODO: check for other conspicuous gaps between lumps (> 4 byte padding)
         lumps_start = min([h.offset for h in self.headers.values() if h.length != 0])
         if lumps_start > header_length:
-            self.file.seek(header_length)
-            self.signature = self.file.read(lumps_start - header_length)
+            self.signature = lumps.read_at(self.file, header_length, lumps_start - header_length)
+
+    def _open_file(self) -> lumps.Stream:
+        """open the .bsp for reading lumps from"""
+        return lumps.open_stream(os.path.join(self.folder, self.filename), self.memory_mapped)
 
     def _header_generator(self, offset: int = 4) -> (str, Any):
         """iterator for reading headers from self.file"""
@@ -71,20 +176,59 @@ class Bsp:
             yield (LUMP.name, lump_header)
 
     def _preload(self):
-        """parse .bsp data & prepare dynamic readers"""
+        """parse .bsp headers; lumps are loaded on first access by __getattr__"""
         raise NotImplementedError()
 
+    def _preload_headers(self):
+        """parse .bsp headers only; overriden by BspClasses that collect other files in _preload"""
+        self._preload()
+
+    def _preload_lump(self, lump_name: str, lump_header: Any):
+        """prepare a dynamic reader for the named lump & setattr; record errors in self._loading_errors"""
+        raise NotImplementedError()
+
+    def _preload_lump_bytes(self, lump_name: str, lump_bytes: bytes):
+        """load the named lump from lump_bytes instead of self.file (e.g. edits sent w/ a BspHandle)"""
+        lump_header = copy.copy(self.headers[lump_name])
+        lump_header.offset = 0
+        lump_header.length = len(lump_bytes)
+        if hasattr(lump_header, "fourCC"):
+            lump_header.fourCC = 0  # uncompressed
+        file, self.file = self.file, io.BytesIO(lump_bytes)
+        try:
+            self._preload_lump(lump_name, lump_header)
+        finally:
+            self.file = file
+
+    def _unload_lumps(self):
+        """discard loaded lumps; they will be reloaded from self.file on next access"""
+        for lump_name in self.headers:
+            self.__dict__.pop(lump_name, None)
+        self.__dict__.pop("_lump_hashes", None)  # self.file might have changed
+        self._deleted_lumps = set()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
+
+    @property
+    def loading_errors(self) -> Dict[str, Exception]:
+        """loads every lump to check for errors"""
+        for lump_name in self.headers:
+            getattr(self, lump_name, None)
+        return self._loading_errors
+
     def lump_as_bytes(self, lump_name: str) -> bytes:
         """convert the named lump back into bytes"""
         # NOTE: LumpClasses are derived from branch, not lump data!
         if not hasattr(self, lump_name):
             return b""  # lump is empty / deleted
         lump_entries = getattr(self, lump_name)
+        if hasattr(lump_entries, "dtype"):  # numpy.ndarray (see BspLump.as_numpy)
+            return lump_entries.tobytes()
         all_mapped_lumps = {*self.branch.BASIC_LUMP_CLASSES,
                             *self.branch.LUMP_CLASSES,
                             *self.branch.SPECIAL_LUMP_CLASSES}
         # RawBspLump -> bytes
-        if lump_name not in all_mapped_lumps or lump_name in self.loading_errors:
+        if lump_name not in all_mapped_lumps or lump_name in self._loading_errors:
             return bytes(lump_entries)
         # BasicBspLump -> bytes
         if lump_name in self.branch.BASIC_LUMP_CLASSES:
@@ -101,6 +245,78 @@ class Bsp:
             raw_lump = lump_entries.as_bytes()
         return raw_lump
 
+    def decode(self, SpecialLumpClass: Any, raw_lump: bytes) -> Any:
+        """SpecialLumpClass.from_bytes(raw_lump), w/ self.lump_cache & self.compact_entities"""
+        if self.compact_entities and SpecialLumpClass is shared.Entities:
+            SpecialLumpClass = shared.CompactEntities
+        return lumps.decode(SpecialLumpClass, raw_lump, self.lump_cache)
+
+    def lump_hash(self, lump_name: str) -> str:
+        """blake2b hexdigest of the named lump, as write_lump would write it
+        clean lumps are hashed straight from self.file (w/o decoding) & the result is cached"""
+        # NOTE: compressed lumps are hashed as stored if clean, but are decompressed when re-encoded
+        hasher = hashlib.blake2b(digest_size=16)
+        if self.is_dirty(lump_name):  # not cached, since edits could continue
+            lump_header = self.headers.get(lump_name)
+            lump_offset = getattr(lump_header, "offset", 0)  # GAME_LUMP headers are relative to the file
+            self.write_lump(lump_name, lumps.HashWriter(hasher), lump_offset)
+            return hasher.hexdigest()
+        lump_hashes = self.__dict__.setdefault("_lump_hashes", dict())
+        if lump_name not in lump_hashes:
+            lump_header = self.headers[lump_name]
+            lumps.hash_range(self.file, lump_header.offset, lump_header.length, hasher)
+            lump_hashes[lump_name] = hasher.hexdigest()
+        return lump_hashes[lump_name]
+
+    def lump_hashes(self) -> Dict[str, str]:
+        """{"LUMP.name": lump_hash} for every lump in headers; compare w/ another Bsp to find changed lumps"""
+        return {lump_name: self.lump_hash(lump_name) for lump_name in self.headers}
+
+    def is_dirty(self, lump_name: str) -> bool:
+        """does the named lump need to be re-encoded when saving? lumps which were never loaded are clean"""
+        if lump_name not in self.__dict__:
+            return lump_name in self._deleted_lumps  # written as an empty lump
+        lump = self.__dict__[lump_name]
+        loaded = self._loaded_lumps.get(lump_name, lambda: None)()
+        if lump is not loaded:  # replaced
+            return True
+        if not isinstance(lump, lumps.RawBspLump):  # SpecialLumpClasses could have been mutated in-place
+            return True
+        lump_header = self.headers[lump_name]
+        if lump.stream is not self.file or lump.offset != lump_header.offset:  # decompressed
+            return True
+        if len(lump) * lump._entry_size != lump_header.length:
+            return True
+        return lump.is_dirty()
+
+    def write_lump(self, lump_name: str, outfile: io.BufferedWriter, lump_offset: int = None) -> int:
+        """write the named lump at the current position in outfile; returns bytes written
+        clean lumps (see is_dirty) are copied straight from self.file
+        lump_offset is the lump's position in the final .bsp (GAME_LUMP headers hold offsets)"""
+        lump_header = self.headers.get(lump_name)
+        if lump_offset is None:
+            lump_offset = outfile.tell()
+        if lump_header is not None and not self.is_dirty(lump_name):
+            in_file = lump_header.offset + lump_header.length <= self.bsp_file_size
+            uncompressed = getattr(lump_header, "fourCC", 0) == 0
+            # NOTE: GAME_LUMP offsets are relative to the file, so it can only be copied to the same position
+            in_place = lump_name != "GAME_LUMP" or lump_header.offset == lump_offset
+            if in_file and uncompressed and in_place:
+                return lumps.copy_bytes(self.file, lump_header.offset, lump_header.length, outfile)
+        if not hasattr(self, lump_name):
+            return 0  # lump is empty / deleted
+        lump = getattr(self, lump_name)
+        if isinstance(lump, lumps.RawBspLump):  # encoded in chunks
+            chunks = lump.iter_bytes()
+        elif lump_name == "GAME_LUMP" and hasattr(lump, "headers"):
+            chunks = [lump.as_bytes(lump_offset)]
+        else:
+            chunks = [self.lump_as_bytes(lump_name)]
+        length = 0
+        for chunk in chunks:
+            length += outfile.write(chunk)
+        return length
+
     def save_as(self, filename: str):
         """Expects outfile to be a file with write bytes capability"""
         raise NotImplementedError()
@@ -116,12 +332,27 @@ class Bsp:
         # # write contents of lumps
 
     def save(self):
-        # NOTE: save_as must copy all lumps into memory (w/ lump_as_bytes) and close self.file
-        # -- otherwise a write conflict will occur
+        # NOTE: save_as streams unloaded lumps from self.file, so we can't overwrite it while saving
+        # -- instead we save to a temporary folder & move the new files over the old ones
         # NOTE: you should really be making backups anyway
-        self.save_as(os.path.join(self.folder, self.filename))
+        temp_folder = tempfile.mkdtemp(prefix=".bsp_tool_", dir=self.folder)
+        try:
+            self.save_as(os.path.join(temp_folder, self.filename))
+            # NOTE: close() leaves a memory-mapped file open if a lump is still in use (e.g. an as_numpy array)
+            # -- that's fine, os.replace swaps the file under it & reloading opens the new file
+            self._unload_lumps()
+            self.close()
+            for filename in os.listdir(temp_folder):
+                os.replace(os.path.join(temp_folder, filename), os.path.join(self.folder, filename))
+        finally:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+        self._unload_lumps()
         self._preload()  # reload self.file
 
+    def handle(self, dirty_lumps: bool = True) -> BspHandle:
+        """picklable stand-in for this Bsp, for sending to other processes"""
+        return BspHandle(self, dirty_lumps)
+
     def set_branch(self, branch: ModuleType):
         """Calling .set_branch(...) on a loaded .bsp will not convert it!"""
         # branch is a "branch script" that has been imported into python
@@ -134,3 +365,52 @@ class Bsp:
         for method_name, method in getattr(branch, "methods", dict()).items():
             method = MethodType(method, self)
             setattr(self, method_name, method)
+
+
+class BspHandle:
+    """Picklable stand-in for a loaded Bsp; reopens the file in the process that calls .open()"""
+    # NOTE: headers are only parsed once, by the process which created the handle
+    BspClass: type
+    branch_name: str  # modules can't be pickled
+    dirty_lumps: Dict[str, bytes]
+    # ^ {"LUMP.name": lump_bytes}; edits made before the handle was created
+    # NOTE: RespawnBsp.external lumps are always reloaded from their .bsp_lump files
+    state: Dict[str, Any]
+    # ^ Bsp.__dict__, minus the open file, lumps & branch methods
+    _bsp: Bsp = None  # opened on first use; not pickled
+
+    def __init__(self, bsp: Bsp, dirty_lumps: bool = True):
+        self.BspClass = bsp.__class__
+        self.branch_name = bsp.branch.__name__
+        self.dirty_lumps = dict()
+        if dirty_lumps:
+            for lump_name in bsp.headers:
+                if bsp.is_dirty(lump_name):
+                    lump_bytes = io.BytesIO()
+                    bsp.write_lump(lump_name, lump_bytes, lump_offset=0)
+                    self.dirty_lumps[lump_name] = lump_bytes.getvalue()
+        skip = {"branch", "file", "_load_lock", "_deleted_lumps", "_loaded_lumps", "_loading_errors", "_lump_hashes",
+                "_vis_matrix", *bsp.headers}
+        self.state = {k: v for k, v in bsp.__dict__.items() if k not in skip and not isinstance(v, MethodType)}
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} '{self.state['filename']}' {self.BspClass.__name__}>"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if k != "_bsp"}
+
+    def open(self) -> Bsp:
+        """the Bsp, w/ a freshly opened file; lumps are loaded on first access as usual"""
+        if self._bsp is None:
+            bsp = self.BspClass.__new__(self.BspClass)
+            bsp.__dict__.update(copy.deepcopy(self.state))  # lumps can modify headers (e.g. decompressed)
+            bsp.set_branch(importlib.import_module(self.branch_name))
+            bsp._load_lock = threading.RLock()
+            bsp._deleted_lumps = set()  # dirty_lumps holds deleted lumps as b""
+            bsp._loaded_lumps = dict()
+            bsp._loading_errors = dict()
+            bsp.file = bsp._open_file()
+            for lump_name, lump_bytes in self.dirty_lumps.items():
+                bsp._preload_lump_bytes(lump_name, lump_bytes)
+            self._bsp = bsp
+        return self._bsp
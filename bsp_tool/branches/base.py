@@ -1,12 +1,15 @@
 """Base classes for defining .bsp lump structs"""
 from __future__ import annotations
-import collections
+import copy
 import enum
+import functools
+import inspect
 import itertools
 import io
+import operator
 import re
 import struct
-from typing import Any, Dict, Iterable, List, Union
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
 
 # TODO: _decode: Dict[str, BytesDecodeArgs] class variable for both Struct & MappedArray
@@ -49,6 +52,150 @@ ClassesDict = Dict[str, Any]
 
 struct_attr_formats: Dict[Struct, Dict[str, str]] = dict()
 # ^ {LumpClass: {"attr": "sub_format"}}
+# NOTE: filled by Struct.__init_subclass__; same dict as LumpClass._layout.attr_formats
+
+
+class Layout:
+    """conversion metadata for a mapping & format; computed once & shared by every instance"""
+    __slots__ = ["_format", "types", "attr_formats", "slices", "is_int", "length", "child_bitfields",
+                 "child_classes", "_defaults"]
+    _format: str
+    types: Tuple[str]  # split_format(_format)
+    attr_formats: Dict[str, str]
+    # ^ {"attr": "sub_format"}
+    slices: Dict[str, slice]
+    # ^ {"attr": slice(start, stop)}  # indices in tuple
+    is_int: Tuple[bool]  # which values in tuple as_tuple must cast to int
+    length: int  # mapping_length(mapping)
+    child_bitfields: Dict[str, BitFieldsDict]
+    # ^ {"attr": dict_subgroup(_bitfields, "attr")}
+    child_classes: Dict[str, ClassesDict]
+    # ^ {"attr": dict_subgroup(_classes, "attr")}
+
+    def __init__(self, mapping: AttrMap, _format: str, _bitfields: BitFieldsDict, _classes: ClassesDict):
+        if isinstance(mapping, list):
+            mapping = {attr: None for attr in mapping}
+        self._format = _format
+        self.types = split_format(_format)
+        self.attr_formats, self.slices = dict(), dict()
+        index = 0
+        for attr, child_mapping in mapping.items():
+            length = mapping_length({None: child_mapping})
+            self.attr_formats[attr] = "".join(self.types[index:index + length])
+            self.slices[attr] = slice(index, index + length)
+            index += length
+        self.is_int = tuple(t in "bBhHiI" for t in self.types)
+        self.length = index
+        self.child_bitfields = {attr: dict_subgroup(_bitfields, attr) for attr in mapping}
+        self.child_classes = {attr: dict_subgroup(_classes, attr) for attr in mapping}
+        self._defaults = None
+
+    @property
+    def struct(self) -> struct.Struct:
+        # NOTE: not compiled until needed, so unpackable formats can still be mapped
+        return compiled_format(self._format)
+
+    def defaults(self) -> tuple:
+        """tuple of default values for each type"""
+        # NOTE: generated on first use, since type_defaults doesn't cover every type
+        if self._defaults is None:
+            self._defaults = tuple(type_defaults[t] if not t.endswith("s") else "" for t in self.types)
+        return self._defaults
+
+
+def hashable(value: Any) -> Any:
+    """convert nested lists & dicts into tuples, for use as a dict key"""
+    if isinstance(value, dict):
+        return (dict, *((k, hashable(v)) for k, v in value.items()))
+    elif isinstance(value, list):
+        return (list, *map(hashable, value))
+    return value
+
+
+class SpecCache:
+    """memoises func(*spec), for specs made of nested lists & dicts (e.g. _mapping)"""
+    # NOTE: keyed on the contents of each spec, so editing a _mapping in place can't return a stale value
+    values: Dict[tuple, Any]
+    # ^ {tuple(map(hashable, spec)): func(*spec)}
+
+    def __init__(self, func):
+        self.func = func
+        self.values = dict()
+
+    def __call__(self, *spec) -> Any:
+        key = tuple(map(hashable, spec))
+        value = self.values.get(key)
+        if value is None:
+            value = self.values[key] = self.func(*spec)
+        return value
+
+
+layout_of = SpecCache(Layout)
+# ^ layout_of(_mapping, _format, _bitfields, _classes) -> Layout
+
+
+class AutoSlots(type):
+    """metaclass for MappedArray & BitField; adds __slots__ for each attr in cls._slots_from (e.g. _mapping)"""
+    # NOTE: classes which define __slots__ (or class variables w/ the same name as an attr) are left alone
+    # -- unless __slots__ includes "__dict__"; then attrs are still slotted, but other attrs can be set
+    # NOTE: classes which override __init__ or __setattr__ get a __dict__, since they might set other attrs
+    # NOTE: other annotated attrs also get slots (e.g. LumpHeader.offset, calculated by some BspClasses)
+
+    def __new__(mcs, name: str, bases: tuple, namespace: Dict[str, Any], **kwargs):
+        def inherited(attr: str) -> Any:
+            if attr in namespace:
+                return namespace[attr]
+            return getattr([b for b in bases if hasattr(b, attr)][0], attr)
+
+        slots = list(namespace.get("__slots__", list()))
+        if ("__slots__" not in namespace or "__dict__" in slots) and len(bases) > 0:
+            attrs = list(inherited(inherited("_slots_from")))
+            if not any(attr in namespace for attr in attrs):
+                attrs.extend(
+                    attr for attr in namespace.get("__annotations__", dict())
+                    if attr not in attrs and attr not in namespace and not attr.startswith("_"))
+                # NOTE: skip attrs a parent already has a slot / descriptor for (e.g. vector.vec3.x)
+                slots.extend(
+                    attr for attr in attrs if attr not in slots
+                    and not any(hasattr(inspect.getattr_static(b, attr, None), "__set__") for b in bases))
+                if any(b.__dictoffset__ != 0 for b in bases):  # already has a __dict__
+                    slots = [slot for slot in slots if slot != "__dict__"]
+                elif "__dict__" not in slots and ("__init__" in namespace or "__setattr__" in namespace):
+                    slots.append("__dict__")
+                namespace["__slots__"] = slots
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+def pickle_state(instance, attrs: List[str]) -> Dict[str, Any]:
+    """{attr: value} for attrs & any other attrs which have been set (e.g. D3DBsp's LumpHeader.offset)"""
+    out = {attr: getattr(instance, attr) for attr in attrs}
+    for cls in type(instance).__mro__:
+        for slot in cls.__dict__.get("__slots__", list()):
+            if slot not in out and slot not in ("__dict__", "__weakref__") and hasattr(instance, slot):
+                out[slot] = getattr(instance, slot)
+    out.update({attr: value for attr, value in getattr(instance, "__dict__", dict()).items() if attr not in out})
+    return out
+
+
+def anonymous_subclass(root: type, **spec) -> type:
+    """subclass of root w/ spec overriding _mapping, _format etc.; shares root's name"""
+    # NOTE: spec is copied, since the caller could still edit it in place
+    namespace = {"__module__": root.__module__, "__qualname__": root.__qualname__, "_anonymous_base": root,
+                 **copy.deepcopy(spec)}
+    return type(root)(root.__name__, (root,), namespace)
+
+
+anonymous_mapped_arrays = SpecCache(lambda root, _mapping, _format, _bitfields, _classes: anonymous_subclass(
+    root, _mapping=_mapping, _format=_format, _bitfields=_bitfields, _classes=_classes))
+# ^ anonymous_mapped_arrays(root, _mapping, _format, _bitfields, _classes) -> type
+anonymous_bitfields = SpecCache(lambda root, _fields, _format, _classes: anonymous_subclass(
+    root, _fields=_fields, _format=_format, _classes=_classes))
+# ^ anonymous_bitfields(root, _fields, _format, _classes) -> type
+
+
+def spec_instance(root: type, spec: tuple) -> Any:
+    """uninitialised instance of root._with_spec(*spec); pickle can't find anonymous subclasses by name"""
+    return object.__new__(root._with_spec(*spec))
 
 
 class Struct:
@@ -64,6 +211,14 @@ class Struct:
     _bitfields: BitFieldsDict = dict()
     _classes: ClassesDict = dict()
     # NOTE: an attr should only go into either _classes or _bitfields, never both!
+    _layout: Layout  # generated by __init_subclass__
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        mapping = {s: cls._arrays.get(s, None) for s in cls.__slots__}
+        cls._layout = Layout(mapping, cls._format, cls._bitfields, cls._classes)
+        struct_attr_formats[cls] = cls._layout.attr_formats
+        generate_methods(cls, Struct, mapping)
 
     def __init__(self, *args, **kwargs):
         # LumpClass(attr1, [attr2_1, attr2_2]) or LumpClass(attr1, attr2=[attr2_1, attr2_2])
@@ -84,31 +239,22 @@ class Struct:
         default_values.update(dict(zip(self.__slots__, args)))
         default_values.update(kwargs)
         # TODO: set subattr_values
-        global struct_attr_formats
-        _attr_formats = struct_attr_formats[self.__class__] = dict()
-        types = split_format(self._format)
-        types_index = 0
+        layout = self._layout
         for attr, value in default_values.items():
             if attr not in self._arrays:  # Union[int, float, str]
-                _attr_formats[attr] = types[types_index]
-                types_index += 1
                 setattr(self, attr, value)  # handles _classes & _bitfields
                 continue  # next attr
             # child contructor metadata
             mapping = self._arrays[attr]
-            length = mapping_length({None: mapping})
-            _attr_formats[attr] = "".join(types[types_index:types_index + length])
-            types_index += length
-            _bitfields = dict_subgroup(self._bitfields, attr)
-            _classes = dict_subgroup(self._classes, attr)
+            _bitfields = layout.child_bitfields[attr]
+            _classes = layout.child_classes[attr]
             # value is MappedArray / _classes[attr]
             if attr in self._classes:
                 setattr(self, attr, value)  # no questions asked
             elif isinstance(value, MappedArray):
                 assert value._mapping == mapping
                 # NOTE: DON'T need to verify MappedArray._format
-                value._classes = _classes
-                value._bitfields = _bitfields
+                value.__class__ = value._with_spec(_bitfields=_bitfields, _classes=_classes)
                 setattr(self, attr, value)
             # TODO: List[MappedArray]
             # value -> MappedArray
@@ -116,7 +262,8 @@ class Struct:
                 assert len(value) == mapping
                 setattr(self, attr, value)
             elif isinstance(mapping, (list, dict)):  # create MappedArray
-                sub_kwargs = dict(_mapping=mapping, _format=_attr_formats[attr], _bitfields=_bitfields, _classes=_classes)
+                sub_kwargs = dict(_mapping=mapping, _format=layout.attr_formats[attr],
+                                  _bitfields=_bitfields, _classes=_classes)
                 setattr(self, attr, MappedArray.from_tuple(value, **sub_kwargs))  # assumes value is Iterable
             else:
                 raise RuntimeError(f"{self.__class__.__name__} has bad _arrays!")
@@ -145,65 +292,56 @@ class Struct:
         value = handle_child_class(self, attr, value)
         # TODO: enforce BitField spec (_fields, _format, _classes)
         if attr in self._bitfields and not isinstance(value, BitField):
-            global struct_attr_formats
-            _format = struct_attr_formats[self.__class__][attr]
-            value = BitField.from_int(value, _fields=self._bitfields[attr], _format=_format,
-                                      _classes=dict_subgroup(self._classes, attr))
+            layout = self._layout
+            value = BitField.from_int(value, _fields=self._bitfields[attr], _format=layout.attr_formats[attr],
+                                      _classes=layout.child_classes[attr])
         # TODO: enforce MappedArray spec
         super().__setattr__(attr, value)
 
     @classmethod
     def _defaults(cls) -> Dict[str, Any]:
-        types = split_format(cls._format)
-        global type_defaults
-        defaults = cls.from_tuple([type_defaults[t] if not t.endswith("s") else "" for t in types])
+        defaults = cls.from_tuple(cls._layout.defaults())
         return dict(zip(cls.__slots__, defaults))
 
     # convertors
     @classmethod
     def from_bytes(cls, _bytes: bytes) -> Struct:
-        expected_length = struct.calcsize(cls._format)
+        expected_length = cls._layout.struct.size
         assert len(_bytes) == expected_length, f"Not enough bytes! Expected {expected_length} got {len(_bytes)}"
-        _tuple = struct.unpack(cls._format, _bytes)
+        _tuple = cls._layout.struct.unpack(_bytes)
         expected_length = len(cls.__slots__) + mapping_length(cls._arrays) - len(cls._arrays)
         assert len(_tuple) == expected_length, f"{cls.__name__} mappings do not match _format"
         return cls.from_tuple(_tuple)
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> Struct:
-        return cls.from_bytes(stream.read(struct.calcsize(cls._format)))
+        return cls.from_bytes(stream.read(cls._layout.struct.size))
 
     @classmethod
     def from_tuple(cls, _tuple: Iterable) -> Struct:
         """_tuple comes from: struct.unpack(self._format, bytes)"""
         # NOTE: _classes & _bitfields are handled by cls.__init__
         out_args = list()
-        types = split_format(cls._format)
-        _tuple_index = 0
+        layout = cls._layout
         for attr in cls.__slots__:
             if attr not in cls._arrays:
-                value = _tuple[_tuple_index]
-                length = 1
+                value = _tuple[layout.slices[attr].start]
             else:  # partition up children
                 child_mapping = cls._arrays[attr]
                 if isinstance(child_mapping, (list, dict)):  # child_mapping: List[str]
-                    length = mapping_length({None: child_mapping})
-                    array = _tuple[_tuple_index:_tuple_index + length]
-                    child_format = "".join(types[_tuple_index:_tuple_index + length])
-                    value = MappedArray.from_tuple(array, _mapping=child_mapping, _format=child_format,
-                                                   _classes=dict_subgroup(cls._classes, attr),
-                                                   _bitfields=dict_subgroup(cls._bitfields, attr))
+                    value = MappedArray.from_tuple(_tuple[layout.slices[attr]], _mapping=child_mapping,
+                                                   _format=layout.attr_formats[attr],
+                                                   _classes=layout.child_classes[attr],
+                                                   _bitfields=layout.child_bitfields[attr])
                 elif isinstance(child_mapping, int):
-                    length = child_mapping
-                    value = _tuple[_tuple_index:_tuple_index + length]
+                    value = _tuple[layout.slices[attr]]
                 else:
                     raise RuntimeError(f"Invalid type: {type(child_mapping)} in {cls.__class__.__name__}._arrays")
             out_args.append(value)
-            _tuple_index += length
         return cls(*out_args)
 
     def as_bytes(self) -> bytes:
-        return struct.pack(self._format, *self.as_tuple())
+        return self._layout.struct.pack(*self.as_tuple())
 
     def as_tuple(self) -> list:
         """recreates the _tuple this instance was initialised from"""
@@ -224,7 +362,7 @@ class Struct:
                 _tuple.extend(value)
             else:
                 _tuple.append(value)
-        return [int(x) if f in "bBhHiI" else x for x, f in zip(_tuple, split_format(self._format))]
+        return [int(x) if is_int else x for x, is_int in zip(_tuple, self._layout.is_int)]
 
     @classmethod
     def as_cpp(cls, one_liner_limit: int = 80) -> str:
@@ -237,20 +375,33 @@ class Struct:
         return instance.as_cpp(one_liner_limit=one_liner_limit)
 
 
-class MappedArray:
+class MappedArray(metaclass=AutoSlots):
     """Maps a given iterable to a series of names, can even be a nested mapping"""
+    __slots__ = list()  # NOTE: AutoSlots generates __slots__ from _mapping for subclasses
     _mapping: AttrMap = list()
     _format: str = ""  # struct format string
-    _attr_formats: Dict[str, str] = dict()  # generated by __init__
+    _attr_formats: Dict[str, str] = dict()  # generated by __init_subclass__
     _bitfields: BitFieldsDict = dict()
     _classes: ClassesDict = dict()
+    _layout: Layout = None  # generated by __init_subclass__
+    _slots_from: str = "_mapping"
+    _anonymous_base: type = None
+    # NOTE: overriding _mapping, _format etc. w/ kwargs creates an anonymous subclass (see _with_spec)
+    # -- instances only hold their values, all other metadata is shared by the class
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._layout = layout_of(cls._mapping, cls._format, cls._bitfields, cls._classes)
+        cls._attr_formats = cls._layout.attr_formats
+        generate_methods(cls, MappedArray, cls._mapping)
+
+    def __new__(cls, *args, _mapping: AttrMap = None, _format: str = None,
+                _bitfields: BitFieldsDict = None, _classes: ClassesDict = None, **kwargs):
+        return super().__new__(cls._with_spec(_mapping, _format, _bitfields, _classes))
 
     def __init__(self, *args, _mapping: AttrMap = None, _format: str = None,
                  _bitfields: BitFieldsDict = None, _classes: ClassesDict = None, **kwargs):
-        self._mapping = self._mapping if _mapping is None else _mapping
-        self._format = self._format if _format is None else _format
-        self._bitfields = self._bitfields if _bitfields is None else _bitfields
-        self._classes = self._classes if _classes is None else _classes
+        # NOTE: _mapping, _format etc. are applied by __new__
         assert len(args) <= len(self._mapping), "Too many arguments! Should match top level attributes!"
         invalid_kwargs = set(kwargs).difference(set(self._mapping))
         # TODO: could branch here and check for subattr kwargs
@@ -263,35 +414,24 @@ class MappedArray:
         # NOTE: could also skip generating defaults if arg + kwargs defines the whole struct
         # -- however that's probably more work to detect than could be saved so \_(0.0)_/
         else:
-            # NOTE: _defaults is a classmethod, so we MUST override
-            default_values = self._defaults(_mapping=self._mapping, _format=self._format)
+            default_values = self._defaults()
         default_values.update(dict(zip(self._mapping, args)))
         default_values.update(kwargs)
         # TODO: set subattr_values
-        types = split_format(self._format)
-        types_index = 0
-        if isinstance(_mapping, list):
-            self._attr_formats = dict(zip(_mapping, types))
+        if isinstance(self._mapping, list):
             for attr, value in default_values.items():
                 setattr(self, attr, value)
             return
-        self._attr_formats = dict()  # must be unique
+        layout = self._layout
         for attr, value in default_values.items():
             # child contructor metadata
-            if isinstance(self._mapping, dict):
-                sub_mapping = self._mapping[attr]
-            else:
-                sub_mapping = None
-            length = mapping_length({None: sub_mapping})
-            self._attr_formats[attr] = "".join(types[types_index:types_index + length])
-            types_index += length
-            sub_classes = dict_subgroup(self._classes, attr)
-            sub_bitfields = dict_subgroup(self._bitfields, attr)
+            sub_mapping = self._mapping[attr]
+            sub_classes = layout.child_classes[attr]
+            sub_bitfields = layout.child_bitfields[attr]
             if isinstance(value, MappedArray):
                 assert isinstance(sub_mapping, (list, dict)), f"Invalid sub_mapping for {attr}: {sub_mapping}"
                 assert value._mapping == sub_mapping
-                value._classes = sub_classes
-                value._bitfields = sub_bitfields
+                value.__class__ = value._with_spec(_bitfields=sub_bitfields, _classes=sub_classes)
                 setattr(self, attr, value)
             # TODO: List[MappedArray]
             elif isinstance(sub_mapping, int):
@@ -323,6 +463,11 @@ class MappedArray:
     def __len__(self) -> int:
         return len(self._mapping)
 
+    def __reduce__(self):
+        cls = self.__class__
+        spec = (cls._mapping, cls._format, cls._bitfields, cls._classes)
+        return spec_instance, (cls._anonymous_base or cls, spec), (None, pickle_state(self, self._mapping))
+
     def __repr__(self) -> str:
         attrs = [f"{attr}: {value!r}" for attr, value in zip(self._mapping, self)]
         return f"<{self.__class__.__name__} ({', '.join(attrs)})>"
@@ -334,80 +479,82 @@ class MappedArray:
         if attr in self._bitfields and not isinstance(value, BitField):
             child_format = self._attr_formats[attr]
             value = BitField.from_int(value, _fields=self._bitfields[attr], _format=child_format,
-                                      _classes=dict_subgroup(self._classes, attr))
+                                      _classes=self._layout.child_classes[attr])
         # TODO: enforce child MappedArray spec
         super().__setattr__(attr, value)
 
     @classmethod
-    def _defaults(cls, _mapping: AttrMap = None, _format: str = None) -> Dict[str, Any]:
-        _format = cls._format if _format is None else _format
+    def _with_spec(cls, _mapping: AttrMap = None, _format: str = None,
+                   _bitfields: BitFieldsDict = None, _classes: ClassesDict = None) -> type:
+        """cls, or an anonymous subclass if any part of the spec is overridden"""
+        if _mapping is None and _format is None and _bitfields is None and _classes is None:
+            return cls
+        root = cls._anonymous_base or cls
         _mapping = cls._mapping if _mapping is None else _mapping
-        types = split_format(_format)
-        assert mapping_length(_mapping) == len(types), "Invalid mapping for format!"
-        global type_defaults
+        _format = cls._format if _format is None else _format
+        _bitfields = cls._bitfields if _bitfields is None else _bitfields
+        _classes = cls._classes if _classes is None else _classes
+        if (_mapping is root._mapping or _mapping == root._mapping) and _format == root._format \
+                and (_bitfields is root._bitfields or _bitfields == root._bitfields) \
+                and (_classes is root._classes or _classes == root._classes):
+            return root
+        return anonymous_mapped_arrays(root, _mapping, _format, _bitfields, _classes)
+
+    @classmethod
+    def _defaults(cls, _mapping: AttrMap = None, _format: str = None) -> Dict[str, Any]:
+        cls = cls._with_spec(_mapping, _format)
+        assert cls._layout.length == len(cls._layout.types), "Invalid mapping for format!"
         # TODO: allow default strings (requires a type_defaults function (see below))
         # -- pass down type_defaults _string_mode (warn / trim / fail) ?
-        defaults = cls.from_tuple([type_defaults[t] if not t.endswith("s") else "" for t in types],
-                                  _mapping=_mapping, _format=_format)
-        return dict(zip(list(_mapping), defaults))
+        defaults = cls.from_tuple(cls._layout.defaults())
+        return dict(zip(list(cls._mapping), defaults))
 
     # convertors
     @classmethod
     def from_bytes(cls, _bytes: bytes, _mapping: AttrMap = None, _format: str = None,
                    _bitfields: BitFieldsDict = None, _classes: ClassesDict = None) -> MappedArray:
-        _format = cls._format if _format is None else _format
-        _mapping = cls._mapping if _mapping is None else _mapping
-        _classes = cls._classes if _classes is None else _classes
-        _bitfields = cls._bitfields if _bitfields is None else _bitfields
-        assert len(_bytes) == struct.calcsize(_format)
-        _tuple = struct.unpack(_format, _bytes)
-        assert len(_tuple) == mapping_length(_mapping), f"{_tuple}"
-        return cls.from_tuple(_tuple, _mapping=_mapping, _format=_format, _bitfields=_bitfields, _classes=_classes)
+        cls = cls._with_spec(_mapping, _format, _bitfields, _classes)
+        assert len(_bytes) == cls._layout.struct.size
+        _tuple = cls._layout.struct.unpack(_bytes)
+        assert len(_tuple) == cls._layout.length, f"{_tuple}"
+        return cls.from_tuple(_tuple)
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO, _mapping: Any = None, _format: str = None,
                     _bitfields: BitFieldsDict = None, _classes: ClassesDict = None) -> MappedArray:
-        kwargs = dict(_mapping=_mapping, _format=_format, _bitfields=_bitfields, _classes=_classes)
-        return cls.from_bytes(stream.read(struct.calcsize(cls._format)), **kwargs)
+        cls = cls._with_spec(_mapping, _format, _bitfields, _classes)
+        return cls.from_bytes(stream.read(cls._layout.struct.size))
 
     @classmethod
     def from_tuple(cls, array: Iterable, _mapping: Any = None, _format: str = None,
                    _bitfields: BitFieldsDict = None, _classes: ClassesDict = None) -> MappedArray:
-        _format = cls._format if _format is None else _format
-        _mapping = cls._mapping if _mapping is None else _mapping
-        _classes = cls._classes if _classes is None else _classes
-        _bitfields = cls._bitfields if _bitfields is None else _bitfields
-        assert len(array) == mapping_length({None: _mapping}), f"{cls.__name__}({array}, _mapping={_mapping})"
+        if isinstance(_mapping, int):  # TODO: List[MappedArray]
+            assert len(array) == _mapping, f"{cls.__name__}({array}, _mapping={_mapping})"
+            return list(array)  # LAZY HACK?
+        spec_class = cls._with_spec(_mapping, _format, _bitfields, _classes)
+        if spec_class is not cls and is_generated(spec_class.from_tuple):
+            return spec_class.from_tuple(array)
+        cls = spec_class
+        if not isinstance(cls._mapping, (dict, list)):
+            raise RuntimeError(f"Unexpected mapping: {type(cls._mapping)}")
+        layout = cls._layout
+        assert len(array) == layout.length, f"{cls.__name__}({array}, _mapping={cls._mapping})"
         out_args = list()
-        if not isinstance(_mapping, (dict, list, int)):
-            raise RuntimeError(f"Unexpected mapping: {type(_mapping)}")
-        elif isinstance(_mapping, dict):
-            types = split_format(_format)
-            array_index = 0
-            for child_mapping in _mapping.values():
+        if isinstance(cls._mapping, dict):
+            for attr, child_mapping in cls._mapping.items():
                 if child_mapping is not None:  # __init__ might make this redundant
-                    length = mapping_length({None: child_mapping})
-                    segment = array[array_index:array_index + length]
-                    child_format = "".join(types[array_index:array_index + length])
-                    array_index += mapping_length({None: child_mapping})
-                    child = MappedArray.from_tuple(segment, _mapping=child_mapping, _format=child_format)
+                    child = MappedArray.from_tuple(array[layout.slices[attr]], _mapping=child_mapping,
+                                                   _format=layout.attr_formats[attr])
                     # NOTE: _classes & _bitfields will be passed down in __init__
                 else:  # if {"attr": None}
-                    child = array[array_index]  # take a single item, not a slice
-                    array_index += 1
+                    child = array[layout.slices[attr].start]  # take a single item, not a slice
                 out_args.append(child)
-        elif isinstance(_mapping, list):  # List[str]
+        else:  # List[str]
             out_args = array
-        # create MappedArray / List
-        if not isinstance(_mapping, int):
-            out = cls(*out_args, _mapping=_mapping, _format=_format, _bitfields=_bitfields, _classes=_classes)
-        # TODO: List[MappedArray]
-        else:
-            out = list(array)  # LAZY HACK?
-        return out
+        return cls(*out_args)
 
     def as_bytes(self) -> bytes:
-        return struct.pack(self._format, *self.as_tuple())
+        return self._layout.struct.pack(*self.as_tuple())
 
     # NOTE: cannot be a classmethod due to runtime type definition
     def as_cpp(self, inline_as: str = None, one_liner_limit: int = 80) -> str:
@@ -488,31 +635,43 @@ class MappedArray:
         return tuple(_tuple)
 
 
-class BitField:
+class BitField(metaclass=AutoSlots):
     """Maps sub-integer data"""
     # WARNING: field order & bit order may not match!
     # BitField(0xAA, 0XBBBB, 0xCC, _format="I", _fields={"a": 8, "b": 16, "c": 8}).as_int() == 0xCCBBBBAA
+    __slots__ = list()  # NOTE: AutoSlots generates __slots__ from _fields for subclasses
     _fields: BitFieldMapping = dict()  # must cover entire int type
-    # NOTE: _fields will become an OrderedDict when intialised, making it easier to tweak
-    # -- if re-ordering attrs, replace _fields with a new OrderedDict
+    # NOTE: _fields is shared by the class; to re-order attrs, create a new BitField w/ a new _fields dict
     # TODO: automatically add padding field w/ a UserWarning
     # -- throw an error if padding is already used
     _format: str = ""  # 1x uint8/16/32_t
     # TODO: endianness, wider BitFields (e.g. 2x)
     _classes: ClassesDict = dict()  # good for enum.IntFlags subclasses; bool also accepted
+    _slots_from: str = "_fields"
+    _anonymous_base: type = None
+    # NOTE: like MappedArray, overriding _fields etc. w/ kwargs creates an anonymous subclass
+    _fields_checked: bool = False  # set on each class by _check_spec
+    _masks: Tuple[Tuple[str, int, int]] = tuple()
+    # ^ ((attr, offset, mask),)  # generated by __init_subclass__
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        masks, offset = list(), 0
+        for attr, size in cls._fields.items():
+            masks.append((attr, offset, (1 << size) - 1))
+            offset += size
+        cls._masks = tuple(masks)
+        cls._fields_checked = False
+
+    def __new__(cls, *args, _fields: BitFieldMapping = None, _format: str = None, _classes: ClassesDict = None, **kwargs):
+        return super().__new__(cls._with_spec(_fields, _format, _classes))
 
     def __init__(self, *args, _fields: BitFieldMapping = None, _format: str = None, _classes: ClassesDict = None, **kwargs):
         """generate a unique class at runtime, just like MappedArray"""
+        # NOTE: _fields, _format & _classes are applied by __new__
         if len(args) == 1 and len(kwargs) == 0:  # BasicLumpClass
-            args = tuple(self.__class__.from_int(args[0], _fields, _format, _classes))
-        self._format = self._format if _format is None else _format
-        self._fields = collections.OrderedDict(self._fields if _fields is None else _fields)
-        self._classes = self._classes if _classes is None else _classes
-        # valid specification
-        if not (self._format in [*"BHIQ"] and len(self._format) == 1):  # pls no
-            raise NotImplementedError("Only unsigned single integer BitFields are supported")
-        if sum(self._fields.values()) != struct.calcsize(self._format) * 8:
-            raise RuntimeError("fields do not fill format! add an 'unused' field!")
+            args = tuple(self.__class__.from_int(args[0]))
+        self._check_spec()
         # valid data
         if len(args) > len(self._fields):
             raise RuntimeError("too many values for current spec")
@@ -526,12 +685,42 @@ class BitField:
         for attr, size in self._fields.items():
             setattr(self, attr, values[attr])
 
+    @classmethod
+    def _check_spec(cls):
+        """valid specification"""
+        if cls.__dict__.get("_fields_checked", False):
+            return
+        if not (cls._format in [*"BHIQ"] and len(cls._format) == 1):  # pls no
+            raise NotImplementedError("Only unsigned single integer BitFields are supported")
+        if sum(cls._fields.values()) != compiled_format(cls._format).size * 8:
+            raise RuntimeError("fields do not fill format! add an 'unused' field!")
+        cls._fields_checked = True
+
+    @classmethod
+    def _with_spec(cls, _fields: BitFieldMapping = None, _format: str = None, _classes: ClassesDict = None) -> type:
+        """cls, or an anonymous subclass if any part of the spec is overridden"""
+        if _fields is None and _format is None and _classes is None:
+            return cls
+        root = cls._anonymous_base or cls
+        _fields = cls._fields if _fields is None else _fields
+        _format = cls._format if _format is None else _format
+        _classes = cls._classes if _classes is None else _classes
+        if (_fields is root._fields or _fields == root._fields) and _format == root._format \
+                and (_classes is root._classes or _classes == root._classes):
+            return root
+        return anonymous_bitfields(root, _fields, _format, _classes)
+
     def __iter__(self) -> Iterable:
         return iter([getattr(self, attr) for attr in self._fields])
 
     def __len__(self) -> int:
         return len(self._fields)
 
+    def __reduce__(self):
+        cls = self.__class__
+        spec = (cls._fields, cls._format, cls._classes)
+        return spec_instance, (cls._anonymous_base or cls, spec), (None, pickle_state(self, self._fields))
+
     def __repr__(self) -> str:
         attrs = [f"{a}: {getattr(self, a)!r}" for a in self._fields.keys()]
         return f"<{self.__class__.__name__} ({', '.join(attrs)})>"
@@ -550,16 +739,15 @@ class BitField:
     @classmethod
     def from_int(cls, value: int, _fields: BitFieldMapping = None, _format: str = None,
                  _classes: ClassesDict = None) -> BitField:
-        out_fields = cls._fields if _fields is None else _fields
-        out_format = cls._format if _format is None else _format
-        out_classes = cls._classes if _classes is None else _classes
-        out_args = list()
-        offset = 0
-        for size in out_fields.values():
-            mask = 2 ** size - 1 << offset
-            out_args.append((value & mask) >> offset)
-            offset += size
-        return cls(*out_args, _format=out_format, _fields=out_fields, _classes=out_classes)
+        cls = cls._with_spec(_fields, _format, _classes)
+        if overrides(cls, BitField, "__init__", "__setattr__"):
+            return cls(*[(value >> offset) & mask for attr, offset, mask in cls._masks])
+        # NOTE: skipping __init__ & __setattr__, since every field is already in range
+        cls._check_spec()
+        out = object.__new__(cls)
+        for attr, offset, mask in cls._masks:
+            object.__setattr__(out, attr, handle_child_class(out, attr, (value >> offset) & mask))
+        return out
 
     def as_int(self) -> int:
         out = 0
@@ -573,7 +761,7 @@ class BitField:
         return out
 
     def as_bytes(self, endianness: str = "little") -> bytes:
-        return self.as_int().to_bytes(struct.calcsize(self._format), endianness)
+        return self.as_int().to_bytes(compiled_format(self._format).size, endianness)
 
     # NOTE: cannot be a classmethod due to runtime type definition
     def as_cpp(self, _fields: BitFieldMapping = None, _format: str = None, inline_as: str = None) -> str:
@@ -625,7 +813,14 @@ def mapping_length(mapping: AttrMap) -> int:  # MappedArray._mapping focused
     return length
 
 
-def split_format(_format: str) -> List[str]:
+@functools.lru_cache(maxsize=None)
+def compiled_format(_format: str) -> struct.Struct:
+    """shared struct.Struct for _format; saves re-parsing the format string on every pack / unpack"""
+    return struct.Struct(_format)
+
+
+@functools.lru_cache(maxsize=None)
+def split_format(_format: str) -> Tuple[str]:
     """split a struct format string to zip with tuple"""
     # NOTE: strings returned as f"{count}s" (untouched)
     # FIXME: does not check to see if format is valid! invalid chars are thrown out silently
@@ -638,7 +833,291 @@ def split_format(_format: str) -> List[str]:
             out.extend(f * int(count))
         else:
             out.append(f)
-    return out
+    return tuple(out)
+
+
+# conversion plans
+# NOTE: from_tuple & as_tuple are called for every entry in every lump
+# -- rather than walk _arrays, _classes & _bitfields each time, each LumpClass flattens it's Layout into a plan
+# -- from_tuple plan: ((attr, getter),); each getter reads attr's value straight out of _tuple
+# -- as_tuple plan: ((attr, expected_classes, convert, extend),); falls back to the generic method for other types
+# TODO: List[MappedArray] mappings
+raw_types = {**{t: int for t in "bBhHiIlLqQnN"}, **{t: float for t in "efd"}, "?": bool}
+cast_types = "bBhHiI"  # Struct.as_tuple casts these to int
+expected_types = {int: (int,), float: (float, int), bool: (bool,)}
+
+
+def is_generated(method: Any) -> bool:
+    return getattr(getattr(method, "__func__", method), "_generated", False)
+
+
+def overrides(cls: type, base_class: type, *method_names: str) -> bool:
+    """does any class between cls & base_class define one of method_names (excluding generated methods)"""
+    for parent in cls.__mro__[:cls.__mro__.index(base_class)]:
+        for name in method_names:
+            if name in parent.__dict__ and not is_generated(parent.__dict__[name]):
+                return True
+    return False
+
+
+def mapping_items(mapping: AttrMap) -> Dict[str, Any]:
+    return {attr: None for attr in mapping} if isinstance(mapping, list) else mapping
+
+
+def generate_methods(cls: type, base_class: type, mapping: AttrMap):
+    """set cls.from_tuple & cls.as_tuple to methods following a plan made from cls._layout (where possible)"""
+    generators = {"from_tuple": planned_from_tuple, "as_tuple": planned_as_tuple}
+    locks = {"from_tuple": ("__init__", "__setattr__", "from_tuple"), "as_tuple": ("as_tuple",)}
+    valid = cls._layout.length == len(cls._layout.types)  # mapping must match _format
+    for name, generator in generators.items():
+        if overrides(cls, base_class, *locks[name]):
+            continue
+        elif not valid:
+            if is_generated(getattr(cls, name)):
+                setattr(cls, name, base_class.__dict__[name])
+            continue
+        try:
+            method = generator(cls, base_class, mapping_items(mapping))
+            method._generated = True
+        except NotImplementedError:  # fall back to generic method
+            method = base_class.__dict__[name]
+        setattr(cls, name, classmethod(method) if name == "from_tuple" and is_generated(method) else method)
+    # NOTE: if cls overrides __init__ etc. a generated method inherited from a parent would skip it
+    for name in generators:
+        if is_generated(getattr(cls, name)) and overrides(cls, base_class, *locks[name]) \
+                and not is_generated(cls.__dict__.get(name)):
+            setattr(cls, name, base_class.__dict__[name])
+
+
+# from_tuple
+def planned_from_tuple(cls: type, base_class: type, items: Dict[str, Any]) -> Any:
+    in_struct = base_class is Struct
+    plan = tuple((attr, tuple_getter(0, cls._layout, attr, child_mapping, cls._bitfields, cls._classes, in_struct))
+                 for attr, child_mapping in items.items())
+    if in_struct:
+        def from_tuple(cls, _tuple):
+            out = object.__new__(cls)
+            for attr, getter in plan:
+                object.__setattr__(out, attr, getter(_tuple))
+            return out
+        return from_tuple
+
+    generic, length = base_class.__dict__["from_tuple"].__func__, cls._layout.length
+
+    def from_tuple(cls, _tuple, _mapping=None, _format=None, _bitfields=None, _classes=None):
+        if _mapping is not None or _format is not None or _bitfields is not None or _classes is not None:
+            return generic(cls, _tuple, _mapping, _format, _bitfields, _classes)
+        assert len(_tuple) == length, f"{cls.__name__}({_tuple})"
+        out = object.__new__(cls)
+        for attr, getter in plan:
+            object.__setattr__(out, attr, getter(_tuple))
+        return out
+    return from_tuple
+
+
+def tuple_getter(offset: int, layout: Layout, attr: str, child_mapping: Any,
+                 _bitfields: BitFieldsDict, _classes: ClassesDict, in_struct: bool) -> Any:
+    """getter(_tuple) -> attr's value, as the generic from_tuple would make it"""
+    start, stop = offset + layout.slices[attr].start, offset + layout.slices[attr].stop
+    if attr in _classes and attr in _bitfields:
+        raise NotImplementedError()
+    child_class = _classes.get(attr, None)
+    if child_mapping is None:
+        if attr in _bitfields:
+            from_int = BitField._with_spec(_bitfields[attr], layout.attr_formats[attr], layout.child_classes[attr]).from_int
+            return lambda _tuple: from_int(_tuple[start])
+        elif child_class is not None:
+            raw_type = raw_types.get(layout.types[start - offset], None)
+            if raw_type is None:
+                raise NotImplementedError()
+            if not issubclass(raw_type, child_class):  # handle_child_class leaves value as is
+                return lambda _tuple: child_class(_tuple[start])
+        return operator.itemgetter(start)
+    if attr in _bitfields:
+        raise NotImplementedError()
+    if isinstance(child_mapping, int):
+        if child_class is not None:
+            if issubclass(tuple, child_class) or issubclass(list, child_class):
+                raise NotImplementedError()
+            return lambda _tuple: child_class(*_tuple[start:stop])
+        return operator.itemgetter(slice(start, stop)) if in_struct else lambda _tuple: list(_tuple[start:stop])
+    elif isinstance(child_mapping, (list, dict)):
+        if in_struct:  # _classes & _bitfields are passed to the child's __init__
+            child_bitfields, child_classes = layout.child_bitfields[attr], layout.child_classes[attr]
+        else:  # child is created bare, then assigned _classes & _bitfields
+            child_bitfields, child_classes = MappedArray._bitfields, MappedArray._classes
+        child_format = layout.attr_formats[attr]
+        child_layout = layout_of(child_mapping, child_format, child_bitfields, child_classes)
+        mapped_class = MappedArray._with_spec(child_mapping, child_format, layout.child_bitfields[attr],
+                                              layout.child_classes[attr])
+        plan = tuple((child_attr, tuple_getter(start, child_layout, child_attr, grandchild_mapping,
+                                               child_bitfields, child_classes, False))
+                     for child_attr, grandchild_mapping in mapping_items(child_mapping).items())
+
+        def getter(_tuple):
+            child = object.__new__(mapped_class)
+            for child_attr, child_getter in plan:
+                object.__setattr__(child, child_attr, child_getter(_tuple))
+            return child
+        if child_class is not None:
+            if issubclass(MappedArray, child_class):
+                raise NotImplementedError()
+            return lambda _tuple: child_class(*getter(_tuple))
+        return getter
+    raise NotImplementedError()
+
+
+# as_tuple
+def planned_as_tuple(cls: type, base_class: type, items: Dict[str, Any]) -> Any:
+    layout, in_struct = cls._layout, base_class is Struct
+    plan = list()
+    cast = list()  # indices of values Struct.as_tuple must cast to int
+    index = 0
+    for attr, child_mapping in items.items():
+        types = layout.types[layout.slices[attr]]
+        plan.append((attr, *as_tuple_step(layout, attr, child_mapping, cls._bitfields, cls._classes, types, in_struct)))
+        exact_int = child_mapping is None and attr not in cls._classes and attr not in cls._bitfields
+        cast.extend(index + i for i, t in enumerate(types) if t in cast_types and not exact_int)
+        index += len(types)
+    plan, generic = tuple(plan), base_class.as_tuple
+
+    def as_tuple(self):
+        out = list()
+        for attr, expected, convert, extend in plan:
+            value = getattr(self, attr)
+            if value.__class__ not in expected:
+                return generic(self)
+            if convert is not None:
+                value = convert(value)
+            if extend:
+                out.extend(value)
+            else:
+                out.append(value)
+        if not in_struct:
+            return tuple(out)
+        for i in cast:
+            out[i] = int(out[i])
+        return out
+    return as_tuple
+
+
+def as_tuple_step(layout: Layout, attr: str, child_mapping: Any, _bitfields: BitFieldsDict,
+                  _classes: ClassesDict, types: Tuple[str], in_struct: bool) -> (tuple, Any, bool):
+    """(expected_classes, convert, extend) to add attr's value to the tuple"""
+    if attr in _classes:
+        child_class = _classes[attr]
+        if issubclass(child_class, (str, bytes, BitField)):
+            raise NotImplementedError()
+        elif issubclass(child_class, MappedArray):
+            return (child_class,), operator.methodcaller("as_tuple"), True
+        elif issubclass(child_class, enum.Enum):  # NOTE: Flags are Iterable
+            if len(types) != 1:
+                raise NotImplementedError()
+            return (child_class,), operator.attrgetter("_value_"), False
+        elif issubclass(child_class, Iterable):
+            return (child_class,), None, True
+        elif len(types) != 1:
+            raise NotImplementedError()
+        return (child_class,), None, False
+    elif attr in _bitfields:
+        bitfield = BitField._with_spec(_bitfields[attr], layout.attr_formats[attr], layout.child_classes[attr])
+        return (bitfield,), bitfield.as_int, False
+    elif child_mapping is None:
+        if types[0][-1] in "sc":
+            return (bytes,), None, False
+        elif types[0] not in raw_types:
+            raise NotImplementedError()
+        return expected_types[raw_types[types[0]]], None, False
+    elif isinstance(child_mapping, int):
+        return (tuple, list), None, True
+    elif isinstance(child_mapping, (list, dict)):
+        child_format = layout.attr_formats[attr]
+        mapped_class = MappedArray._with_spec(child_mapping, child_format, layout.child_bitfields[attr],
+                                              layout.child_classes[attr])
+        return (mapped_class,), mapped_class.as_tuple, True
+    raise NotImplementedError()
+
+
+@functools.lru_cache(maxsize=None)
+def numpy_dtype(LumpClass: Any) -> Any:
+    """structured numpy.dtype w/ the same memory layout as LumpClass._format; cached per LumpClass"""
+    import numpy  # optional dependency; pip install numpy
+    _format = LumpClass._format.replace(" ", "")
+    byteorder = _format[0] if _format[:1] in ("@", "=", "<", ">", "!") else "@"
+    types, offsets = format_offsets(byteorder, split_format(_format))
+    itemsize = compiled_format(_format).size
+    if issubclass(LumpClass, Struct):
+        mapping = {s: LumpClass._arrays.get(s, None) for s in LumpClass.__slots__}
+    elif issubclass(LumpClass, MappedArray):
+        mapping = LumpClass._mapping
+    elif len(set(types)) == 1:  # BasicLumpClass, BitField or list subclass (e.g. quake.Edge)
+        type_ = numpy_type(byteorder, types[0])
+        return numpy.dtype(type_ if len(types) == 1 else (type_, (len(types),)))
+    else:  # list subclass w/ mixed types; fields are named by index
+        mapping = [f"f{i}" for i in range(len(types))]
+    assert mapping_length(mapping) == len(types), f"{LumpClass.__name__} mappings do not match _format"
+    dtype, length = numpy_fields(mapping, byteorder, types, offsets, itemsize)
+    return numpy.dtype(dtype)
+
+
+def format_offsets(byteorder: str, split: Tuple[str]) -> (List[str], List[int]):
+    """types (w/o padding) & the offset of each type in a split_format, respecting alignment"""
+    types, offsets = list(), list()
+    offset = 0
+    for type_ in split:
+        if type_ == "x":  # padding
+            offset += 1
+            continue
+        size = struct.calcsize(byteorder + type_)
+        if byteorder == "@":  # native alignment
+            alignment = struct.calcsize(f"@c{type_}") - size
+            offset += -offset % alignment
+        types.append(type_)
+        offsets.append(offset)
+        offset += size
+    return types, offsets
+
+
+def numpy_fields(mapping: AttrMap, byteorder: str, types: List[str], offsets: List[int], itemsize: int) -> (dict, int):
+    """generate numpy.dtype fields dict from a (nested) mapping; also returns number of types consumed"""
+    if isinstance(mapping, list):
+        mapping = {attr: None for attr in mapping}
+    names, formats, field_offsets = list(), list(), list()
+    base_offset = offsets[0]
+    index = 0
+    for attr, child_mapping in mapping.items():
+        length = mapping_length({None: child_mapping})
+        child_types = types[index:index + length]
+        child_offsets = offsets[index:index + length]
+        if child_mapping is None:
+            formats.append(numpy_type(byteorder, child_types[0]))
+        elif len(set(child_types)) == 1 and isinstance(child_mapping, (int, list)):  # uniform array
+            formats.append(f"({length},){numpy_type(byteorder, child_types[0])}")
+        else:  # nested struct
+            child_size = child_offsets[-1] + struct.calcsize(byteorder + child_types[-1]) - child_offsets[0]
+            child_dtype, _ = numpy_fields(child_mapping, byteorder, child_types, child_offsets, child_size)
+            formats.append(child_dtype)
+        names.append(attr)
+        field_offsets.append(child_offsets[0] - base_offset)
+        index += length
+    return dict(names=names, formats=formats, offsets=field_offsets, itemsize=itemsize), index
+
+
+def numpy_type(byteorder: str, type_: str) -> str:
+    """struct format type -> numpy.dtype type string"""
+    endian = {"<": "<", ">": ">", "!": ">"}.get(byteorder, "=")
+    if type_.endswith("s"):  # char[]
+        return f"S{type_[:-1] or 1}"
+    elif type_ in "c?":
+        return {"c": "S1", "?": "?"}[type_]
+    size = struct.calcsize(byteorder + type_)
+    if type_ in "efd":
+        return f"{endian}f{size}"
+    elif type_ in "bhilqn":
+        return f"{endian}i{size}"
+    elif type_ in "BHILQN":
+        return f"{endian}u{size}"
+    raise NotImplementedError(f"No numpy type for struct format '{type_}'")
 
 
 # NOTE: C: #include <stdint.h>; C++: #include <cstdint.h>
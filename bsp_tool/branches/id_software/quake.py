@@ -4,14 +4,16 @@ from __future__ import annotations
 import enum
 import io
 import struct
-from typing import Dict, List, Set, Tuple, Union
+from typing import Any, Dict, List, Set, Tuple, Union
 
+from ... import lumps
 from ...utils import geometry
 from ...utils import physics
 from ...utils import texture
 from ...utils import vector
 from .. import base
 from .. import shared  # special lumps
+from .. import visibility
 
 
 FILE_MAGIC = None
@@ -416,17 +418,36 @@ def parse_vis(bsp, leaf_index: int) -> bytes:
     if leaf.vis_offset == -1:
         # render everything
         return b"\xFF" * expected_length
-    out = []
-    i = 0
-    while len(out) < expected_length:
-        c = bsp.VISIBILITY[leaf.vis_offset + i]
-        if c == 0:  # RLE [0, num_0]
-            out.extend([0] * bsp.VISIBILITY[leaf.vis_offset + i + 1])
-            i += 2
-        else:
-            out.append(c)
-            i += 1
-    return bytes(out)
+    # NOTE: a compressed row is never more than twice as long as expected_length
+    raw_vis = bytes(bsp.VISIBILITY[leaf.vis_offset:leaf.vis_offset + expected_length * 2])
+    return visibility.run_length_decode(raw_vis, 0, expected_length)[0]
+
+
+def vis_matrix(bsp) -> visibility.VisibilityMatrix:
+    """parse_vis for every leaf, as one VisibilityMatrix (requires numpy)
+    cached until VISIBILITY or LEAVES change"""
+    sources = (bsp.VISIBILITY, bsp.LEAVES)
+    states = (lump_state(bsp, "VISIBILITY", sources[0]), lump_state(bsp, "LEAVES", sources[1]))
+    cached_sources, cached_states, matrix = bsp.__dict__.get("_vis_matrix", ((None, None), None, None))
+    if any(a is not b for a, b in zip(sources, cached_sources)) or states != cached_states:
+        vis_offsets = [leaf.vis_offset for leaf in bsp.LEAVES]
+        num_clusters = len([o for o in vis_offsets if o != -1])
+        row_size = num_clusters + 7 >> 3
+        rows = iter(visibility.decode_rows(bsp.VISIBILITY[::], [o for o in vis_offsets if o != -1], row_size))
+        rows = [b"\xFF" * row_size if offset == -1 else next(rows) for offset in vis_offsets]
+        matrix = visibility.VisibilityMatrix.from_rows(rows, num_clusters)
+        bsp.__dict__["_vis_matrix"] = (sources, states, matrix)
+    return matrix
+
+
+def lump_state(bsp, lump_name: str, lump: Any) -> Any:
+    """changes whenever lump does; for caches built from a lump (see vis_matrix)"""
+    # NOTE: caches also hold the lump itself, so a replaced lump is never mistaken for an edited one
+    if isinstance(lump, lumps.RawBspLump):
+        return lump.edit_state()  # only encodes edited entries
+    elif isinstance(lump, bytes):  # immutable
+        return None
+    return bsp.lump_hash(lump_name)
 
 
 def face_mesh(bsp, face_index: int, lightmap_scale: float = 16) -> geometry.Mesh:
@@ -455,8 +476,7 @@ def face_mesh(bsp, face_index: int, lightmap_scale: float = 16) -> geometry.Mesh
 
 def model(bsp, model_index: int) -> geometry.Model:
     # entity
-    entities = bsp.ENTITIES.search(model=f"*{model_index}")
-    model_entity = entities[0] if len(entities) != 0 else dict()
+    model_entity = bsp.ENTITIES.where(model=f"*{model_index}").first(dict())
     origin = model_entity.get("origin", "0 0 0")
     origin = vector.vec3(*origin.split())
     pitch, yaw, roll = model_entity.get("angles", "0 0 0").split()
@@ -474,5 +494,5 @@ def model(bsp, model_index: int) -> geometry.Model:
 # -- probably split the brush tools of vmf_tool into it's own repo & utilise other repos for parsing?
 
 
-methods = [leaves_of_node, lightmap_of_face, parse_vis, face_mesh, model]
+methods = [leaves_of_node, lightmap_of_face, parse_vis, vis_matrix, face_mesh, model]
 methods = {m.__name__: m for m in methods}
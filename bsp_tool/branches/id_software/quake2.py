@@ -1,5 +1,6 @@
 # https://www.flipcode.com/archives/Quake_2_BSP_File_Format.shtml
 # https://github.com/id-Software/Quake-2/blob/master/qcommon/qfiles.h#L214
+from __future__ import annotations
 import enum
 import io
 import itertools
@@ -12,6 +13,7 @@ from ...utils import texture
 from ...utils import vector
 from .. import base
 from .. import shared
+from .. import visibility
 from . import quake
 
 
@@ -255,59 +257,44 @@ class Visibility:
     # -- not RLE encoded in Source Engine branches?
     pvs: List[bytes]  # Potential Visible Set
     pas: List[bytes]  # Potential Audible Set
-    # TODO: List[bool] -> bytes
-    # -- sum([2 ** i if b else 0 for i, b in enumerate(x)]).to_bytes(math.ciel(len(x) / 8), "big")
-    # TODO: bytes -> List[bool]
-    # -- [b == "1" for b in f"{int.from_bytes(x, 'big'):b}"[::-1]]
+    # NOTE: pvs_matrix().as_bools() & pas_matrix().as_bools() unpack every row into a numpy array of bools
 
     def __init__(self, pvs_table: List[List[bool]] = tuple(), pas_table: List[List[bool]] = tuple()):
         assert len(pvs_table) == len(pas_table)
         self.pvs = pvs_table
         self.pas = pas_table
 
+    def __getstate__(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if k != "_matrices"}  # rebuilt on demand
+
     @classmethod
     def from_bytes(cls, raw_lump: bytes):
-        _buffer = io.BytesIO(raw_lump)
-        num_clusters = int.from_bytes(_buffer.read(4), "little")
-        offsets = list(struct.iter_unpack("2I", _buffer.read(8 * num_clusters)))
-        pvs, pas = list(), list()
-        for pvs_offset, pas_offset in offsets:
-            # get Potentially Visible Set
-            _buffer.seek(pvs_offset)
-            pvs.append(cls.run_length_decode(_buffer, num_clusters))
-            # get Potentially Audible Set
-            _buffer.seek(pas_offset)
-            pas.append(cls.run_length_decode(_buffer, num_clusters))
-        return cls(pvs, pas)
+        raw_lump = bytes(raw_lump)
+        num_clusters = int.from_bytes(raw_lump[:4], "little")
+        offsets = struct.iter_unpack("2I", raw_lump[4:4 + 8 * num_clusters])
+        rows = visibility.decode_rows(raw_lump, [*itertools.chain(*offsets)], num_clusters + 7 >> 3)
+        return cls(rows[0::2], rows[1::2])  # interleaved Potentially Visible & Audible Sets
+
+    @classmethod
+    def from_matrices(cls, pvs: visibility.VisibilityMatrix, pas: visibility.VisibilityMatrix) -> Visibility:
+        return cls(pvs.rows(), pas.rows())
 
     @staticmethod
     def run_length_decode(stream: io.BytesIO, num_clusters: int) -> bytes:
-        out = list()
-        out_size = math.ceil(num_clusters / 8)
-        while len(out) < out_size:
-            byte = int(stream.read(1).hex(), 16)
-            if byte == 0:
-                count = int(stream.read(1).hex(), 16)
-                assert count != 0, "stream is not compressed"
-                out.extend([0] * count)
-            else:
-                out.append(byte)
-        return bytes(out)
+        out, end = visibility.run_length_decode(stream.getvalue(), stream.tell(), math.ceil(num_clusters / 8))
+        stream.seek(end)
+        return out
 
     @staticmethod
     def run_length_encode(data: bytes) -> bytes:
-        out, zeroes = list(), 0
-        for byte in data:
-            if byte == 0:
-                zeroes += 1
-                if zeroes == 0xFF:
-                    out.extend([0x00, zeroes])
-                    zeroes = 0
-            else:
-                out.extend([0x00, zeroes, byte] if zeroes != 0 else [byte])
-                zeroes = 0
-        out.extend([0x00, zeroes] if zeroes != 0 else [])
-        return bytes(out)
+        return visibility.run_length_encode(data)
+
+    # NOTE: requires numpy; cached until a row is replaced
+    def pvs_matrix(self) -> visibility.VisibilityMatrix:
+        return visibility.cached_matrix(self, "pvs", self.pvs, len(self.pvs))
+
+    def pas_matrix(self) -> visibility.VisibilityMatrix:
+        return visibility.cached_matrix(self, "pas", self.pas, len(self.pas))
 
     def as_bytes(self) -> bytes:
         """should be a byte-for-byte match"""
@@ -317,7 +304,7 @@ class Visibility:
         compressed_sets = list()
         offsets = [4 + (num_clusters * 8)]
         for s in interleaved_sets:
-            compressed_sets.append(self.run_length_encode(s))
+            compressed_sets.append(visibility.run_length_encode(s))
             offsets.append(offsets[-1] + len(compressed_sets[-1]))
         header = struct.pack(f"{len(offsets)}I", num_clusters, *offsets[:-1])
         assert len(header) + sum(map(len, compressed_sets)) == offsets[-1]
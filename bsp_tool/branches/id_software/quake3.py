@@ -12,6 +12,7 @@ from ...utils import vector
 from .. import base
 from .. import colour
 from .. import shared
+from .. import visibility
 from . import quake
 
 
@@ -354,6 +355,9 @@ class Visibility(list):
     def __init__(self, vectors: List[bytes] = tuple()):
         super().__init__(vectors)
 
+    def __reduce__(self) -> tuple:
+        return (self.__class__, (list(self),))  # matrix() cache is rebuilt on demand
+
     def as_bytes(self, compress=False):
         # default behaviour should be to match input bytes; hence compress=False
         # TODO: verify "compression" does not break maps
@@ -365,13 +369,7 @@ class Visibility(list):
             assert len({len(v) for v in self}) == 1, "not all vectors are the same size"
             return struct.pack(f"2i{vec_n * vec_sz}s", vec_n, vec_sz, b"".join(self))
         # robust method (compresses)
-        vecs = b""
-        for vec in self:
-            if len(vec) > best_vec_sz:
-                vec = vec[:best_vec_sz]  # unsure if safe
-            elif len(vec) < best_vec_sz:
-                vec += b"\0" * (best_vec_sz - len(vec))
-            vecs += vec
+        vecs = b"".join([vec[:best_vec_sz].ljust(best_vec_sz, b"\0") for vec in self])  # truncating is unsure if safe
         return struct.pack(f"2i{vec_n * best_vec_sz}s", vec_n, best_vec_sz, vecs)
 
     @classmethod
@@ -379,7 +377,12 @@ class Visibility(list):
         vec_n, vec_sz = struct.unpack("2i", raw_lump[:8])
         assert len(raw_lump) - 8 == vec_n * vec_sz, "lump size does not match internal header"
         # we could check if vec_sz is the smallest it could be here...
-        return cls([raw_lump[8:][i:i + vec_sz] for i in range(0, vec_n * vec_sz, vec_sz)])
+        raw_lump = bytes(raw_lump)
+        return cls([raw_lump[i:i + vec_sz] for i in range(8, 8 + vec_n * vec_sz, vec_sz)])
+
+    def matrix(self) -> visibility.VisibilityMatrix:
+        """requires numpy; cached until a vector is replaced"""
+        return visibility.cached_matrix(self, "vectors", self, len(self))
 
 
 # {"LUMP": LumpClass}
@@ -670,7 +670,7 @@ def water_body_model(bsp, water_body_index: int) -> geometry.Model:
     water_body = bsp.WATER_BODIES[water_body_index]
     origin = water_body.origin
     # material
-    material_names = {e["material"] for e in bsp.ENTITIES.search(classname="water_body")}
+    material_names = {e["material"] for e in bsp.ENTITIES.where(classname="water_body")}
     assert len(material_names) == 1, "need to use targetname_hash to get material"
     material = geometry.Material(list(material_names)[0])
     # geometry
@@ -1143,8 +1143,7 @@ def mesh(bsp, mesh_index: int) -> geometry.Mesh:
 
 def model(bsp, model_index: int) -> geometry.Model:
     # entity
-    entities = bsp.ENTITIES.search(model=f"*{model_index}")
-    model_entity = entities[0] if len(entities) != 0 else dict()
+    model_entity = bsp.ENTITIES.where(model=f"*{model_index}").first(dict())
     origin = model_entity.get("origin", "0 0 0")
     origin = vector.vec3(*origin.split())
     pitch, yaw, roll = model_entity.get("angles", "0 0 0").split()
@@ -1178,10 +1177,11 @@ def search_all_entities(bsp, **search: Dict[str, str]) -> Dict[str, List[Dict[st
     """search_all_entities(key="value") -> {"LUMP": [{"key": "value", ...}]}"""
     out = dict()
     for LUMP_name in ("ENTITIES", *(f"ENTITIES_{s}" for s in ("env", "fx", "script", "snd", "spawn"))):
-        entity_lump = getattr(bsp, LUMP_name, shared.Entities(b""))
-        results = entity_lump.search(**search)
+        if not hasattr(bsp, LUMP_name):
+            continue
+        results = getattr(bsp, LUMP_name).where(**search)
         if len(results) != 0:
-            out[LUMP_name] = results
+            out[LUMP_name] = list(results)
     return out
 
 
@@ -1,6 +1,11 @@
+from __future__ import annotations
+import array
+from collections.abc import MutableMapping
+import functools
+import itertools
 import math
 import re
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple, Union
 
 
 # Basic Lump Classes
@@ -33,77 +38,168 @@ class UnsignedShorts(int):
 
 
 # Special Lump Classes
+entity_edits = 0  # bumped by every in-place edit to an Entity or CompactEntity; Entities.index_of checks it
+
+
+def entity_edited():
+    global entity_edits
+    entity_edits += 1
+
+
+def marks_edit(method):
+    """wraps a dict method which edits an Entity, so indexes of every Entities lump are rebuilt on the next query"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        entity_edited()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Entity(dict):
+    """dict which tells Entities indexes when it's edited; Entities.from_bytes makes every entity an Entity"""
+    __slots__ = list()
+    # NOTE: editing a list value in place (e.g. ent["OnTrigger"].append(...)) isn't tracked
+    # -- lists are never matched by str queries, so where() & co. are unaffected
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    __setitem__ = marks_edit(dict.__setitem__)
+    __delitem__ = marks_edit(dict.__delitem__)
+    if hasattr(dict, "__ior__"):  # Python 3.9+
+        __ior__ = marks_edit(dict.__ior__)
+    clear = marks_edit(dict.clear)
+    pop = marks_edit(dict.pop)
+    popitem = marks_edit(dict.popitem)
+    setdefault = marks_edit(dict.setdefault)
+    update = marks_edit(dict.update)
+
+
+def invalidates_indexes(method):
+    """wraps a list method which edits Entities, so indexes are rebuilt on the next query"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.reindex()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
 class Entities(list):
+    index_keys: Tuple[str] = ("classname", "targetname", "model")
+    # ^ where() & where_any() look these keys up in a hash index, instead of checking every entity
+    _indexes: Dict[str, Dict[str, List[int]]]
+    # ^ {"key": {"value": [entity_index]}}; built on first use & cleared by any edit to the list
+    # NOTE: in-place edits to any Entity / CompactEntity also clear indexes (see entity_edits)
+    _indexed_at: int  # entity_edits when _indexes were last cleared
+    _untracked: List[int]  # indices of entities which aren't an Entity / CompactEntity (e.g. a dict)
+    # ^ in-place edits to these can't be seen, so where() & co. always check them
+
     def __init__(self, iterable: List[Dict[str, str]] = tuple()):
         super().__init__(iterable)
+        self.reindex()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))  # indexes aren't pickled
+
+    # edits
+    __setitem__ = invalidates_indexes(list.__setitem__)
+    __delitem__ = invalidates_indexes(list.__delitem__)
+    __iadd__ = invalidates_indexes(list.__iadd__)
+    __imul__ = invalidates_indexes(list.__imul__)
+    append = invalidates_indexes(list.append)
+    clear = invalidates_indexes(list.clear)
+    extend = invalidates_indexes(list.extend)
+    insert = invalidates_indexes(list.insert)
+    pop = invalidates_indexes(list.pop)
+    remove = invalidates_indexes(list.remove)
+    reverse = invalidates_indexes(list.reverse)
+    sort = invalidates_indexes(list.sort)
+
+    def reindex(self):
+        """discard all indexes; they are rebuilt on the next query"""
+        self._indexes = dict()
+        self._indexed_at = entity_edits
+        self._untracked = None
+
+    def index_of(self, key: str) -> Dict[str, List[int]]:
+        """{"value": [entity_index]} for every entity w/ key; entities w/ duplicate keys are listed under each value"""
+        if self._indexed_at != entity_edits:  # an entity was edited in place
+            self.reindex()
+        if key not in self._indexes:
+            index = dict()
+            for i, entity in enumerate(self):
+                value = entity.get(key, None)
+                if value is None:
+                    continue
+                for v in ([value] if isinstance(value, str) else value):
+                    index.setdefault(v, list()).append(i)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def untracked(self) -> List[int]:
+        """indices of entities whose in-place edits can't be seen by indexes"""
+        if self._untracked is None:
+            self._untracked = [i for i, entity in enumerate(self) if not isinstance(entity, (Entity, CompactEntity))]
+        return self._untracked
+
+    # queries
+    def where(self, **search: Dict[str, str]) -> EntityQuery:
+        """entities w/ all key-values; e.g. .where(classname="light").where_regex(targetname="lamp_.*")"""
+        return EntityQuery(self).where(**search)
+
+    def where_any(self, **search: Dict[str, str]) -> EntityQuery:
+        """entities w/ any key-value; e.g. .where_any(classname="light", targetname="lamp")"""
+        return EntityQuery(self).where_any(**search)
+
+    def where_regex(self, **search: Dict[str, str]) -> EntityQuery:
+        """entities w/ values matching all patterns; e.g. .where_regex(classname="info_player_.*")"""
+        return EntityQuery(self).where_regex(**search)
+
+    def where_regex_any(self, **search: Dict[str, str]) -> EntityQuery:
+        """entities w/ values matching any pattern; e.g. .where_regex_any(classname="func_.*", targetname="lamp_.*")"""
+        return EntityQuery(self).where_regex_any(**search)
 
-    # TODO: make searches stackable (bsp.search(...).search_any(...))
-    # -- search(...) -> Entities
     def search(self, **search: Dict[str, str]) -> List[Dict[str, str]]:
         """Search for entities by key-values; e.g. .search(key=value) -> [{"key": value, ...}, ...]"""
         # NOTE: all conditions must be satisfied
-        return [e for e in self if all([e.get(k, "") == v for k, v in search.items()])]
+        return list(self.where(**search))
 
     def search_any(self, **search: Dict[str, str]) -> List[Dict[str, str]]:
         """Search for entities by key-values; e.g. .search(key=value) -> [{"key": value, ...}, ...]"""
-        return [e for e in self if any([e.get(k, "") == v for k, v in search.items()])]
+        return list(self.where_any(**search))
 
     def search_regex(self, **search: Dict[str, str]) -> List[Dict[str, str]]:
-        return [e for e in self
-                if all([re.match(p, e.get(k, "")) is not None
-                        for k, p in search.items()])]
+        return list(self.where_regex(**search))
 
     def search_regex_any(self, **search: Dict[str, str]) -> List[Dict[str, str]]:
-        return [e for e in self
-                if any([re.match(p, e.get(k, "")) is not None
-                        for k, p in search.items()])]
+        return list(self.where_regex_any(**search))
 
     def as_bytes(self) -> bytes:
-        entities = list()
+        lines = list()
         for entity_dict in self:  # Dict[str, Union[str, List[str]]]
-            entity = list()
+            lines.append("{")
             for key, value in entity_dict.items():
                 if isinstance(value, str):
-                    entity.append(f'"{key}" "{value}"')
+                    lines.append(f'"{key}" "{value}"')
                 elif isinstance(value, list):  # multiple entries
-                    entity.extend([f'"{key}" "{v}"' for v in value])
+                    lines.extend([f'"{key}" "{v}"' for v in value])
                 else:
                     raise RuntimeError("Entity values must be either a string or list of strings")
-            entities.append("\n".join(["{", *entity, "}"]).encode("ascii", errors="ignore"))
-        return b"\n".join(entities) + b"\n\x00"
+            lines.append("}")
+        lines.append("\x00")
+        return "\n".join(lines).encode("ascii", errors="ignore") if len(self) > 0 else b"\n\x00"
 
     @classmethod
     def from_bytes(cls, raw_lump: bytes):
         entities: List[Dict[str, str]] = list()
         # ^ [{"key": "value"}]
-        enumerated_lines = enumerate(raw_lump.decode(errors="ignore").splitlines())
-        for line_no, line in enumerated_lines:
-            if re.match(r"^\s*$", line) is not None:  # line is blank / whitespace
-                continue
-            elif re.match(r"^\s*{\s*$", line) is not None:  # new entity
-                ent = dict()
-            elif '"' in line:
-                key_value_pair = re.search(r'"([^"]*)"\s"([^"]*)"', line)
-                # TODO: "key" 'value"
-                # -- DDayNormany-mappack mtownbh L18 opens w/ `'` & closes w/ `"`
-                # -- this seems illegal but the map runs without complaint
-                if key_value_pair is None:  # might be a multi-line value
-                    open_key_value_pair = re.search(r'"([^"]*)"\s"([^"]*)', line)
-                    if open_key_value_pair is None:
-                        raise RuntimeError(f"Unexpected line in entities: L{line_no + 1}: {line.encode()}")
-                    key, value = open_key_value_pair.groups()
-                    tail = None  # hacky do-while loop
-                    while tail is None:  # keep grabbing lines until the end of the value
-                        if line.startswith("{") or line.startswith("}"):  # previous value didn't terminate
-                            RuntimeError(f"Unexpected line in entities: L{line_no + 1}: {line.encode()}")
-                        # grab another line
-                        line_no, line = next(enumerated_lines)  # BUG: breaks line_no?
-                        tail = re.search(r'([^"]*)"\s*$', line)
-                        if tail is None:  # accumulate line
-                            value = "\n".join([value, line])
-                    value = "\n".join([value, tail.groups()[0]])
-                else:
-                    key, value = key_value_pair.groups()
+        for pairs, layout in entity_pairs(raw_lump):
+            ent = Entity(pairs)
+            if len(ent) == len(pairs):
+                entities.append(ent)
+                continue  # no duplicate keys
+            ent = dict()  # NOTE: built as a dict, since Entity.__setitem__ is slower
+            for key, value in pairs:
                 if key not in ent:
                     ent[key] = value
                 else:  # don't override duplicate keys, share a list instead
@@ -112,17 +208,351 @@ class Entities(list):
                         ent[key].append(value)
                     else:  # second occurance of key
                         ent[key] = [ent[key], value]
-            elif re.match(r"^\s*}\s*(\x00)?\s*$", line) is not None:  # close entity
-                entities.append(ent)
-            elif line.strip() == b"\0".decode():  # terminating line
-                continue
-            elif line.startswith("//"):  # ignore comments
-                continue  # TODO: preserve comments
-            else:
-                raise RuntimeError(f"Unexpected line in entities: L{line_no + 1}: {line.encode()}")
+            entities.append(Entity(ent))
         return cls(entities)
 
 
+def entity_pairs(raw_lump: bytes, errors: str = "ignore") -> Iterator[Tuple[List[Tuple[str, str]], Tuple[str]]]:
+    """([("key", "value")], layout) for each entity in an entities lump, in the order they appear
+    layout is None if the entity is written like Entities.as_bytes would write it
+    otherwise layout holds the whitespace (& comments) before "{", each "key", each "value" & "}" (see CompactEntity)
+    if any multi-line value had "\r\n" line endings, layout is the original text of the entity instead
+    errors is passed to bytes.decode; "surrogateescape" keeps any bytes which aren't utf-8"""
+    text = raw_lump.decode("utf-8", errors)
+    pairs = None  # entity currently being parsed
+    layout = None  # whitespace between each token of the current entity; only kept once it's unusual
+    open_space = ""  # whitespace before the current entity's "{"
+    open_index = 0  # index of the current entity's "{" in tokens
+    rewritten = False  # a value in the current entity was changed from the original text
+    usual = ("", "\n", " ")  # before the first "{", every other token & between "key" "value"
+    tokens = entity_tokens.findall(text)
+    for i, (space, key, gap, value, open_brace, close_brace, unexpected) in enumerate(tokens):
+        if key:  # '"key', "value"
+            if pairs is None:
+                raise RuntimeError(f"Key-value pair outside of entity: {entity_error(text, i)}")
+            if "\r" in value:  # multi-line value w/ "\r\n" line endings
+                value = "\n".join(value.splitlines())
+                rewritten = True
+            if layout is not None:
+                layout.extend((space, gap))
+            elif space != "\n" or gap != " ":
+                layout = [open_space, *usual[1:] * len(pairs), space, gap]
+            pairs.append((key[1:], value))
+        elif open_brace:  # new entity
+            pairs = list()
+            open_space = space
+            open_index = i
+            rewritten = False
+            layout = None if space == usual[0] else [space]
+            usual = ("\n", "\n", " ")
+        elif close_brace:
+            if pairs is None:
+                raise RuntimeError(f"Unexpected closing brace: {entity_error(text, i)}")
+            if layout is None and space != "\n":
+                layout = [open_space, *usual[1:] * len(pairs)]
+            if layout is not None:
+                layout.append(space)
+                layout = tuple(layout)
+            if rewritten:  # NOTE: rare, so we rebuild the original text from tokens
+                layout = "".join([f'{t[0]}{t[1]}"{t[2]}"{t[3]}"' if t[1] else "".join(t[:1] + t[4:6])
+                                  for t in tokens[open_index:i + 1]])
+            yield pairs, layout
+            pairs = None
+        elif unexpected:
+            raise RuntimeError(f"Unexpected line in entities: {entity_error(text, i)}")
+        # else: comment at the end of the lump
+    # NOTE: an entity left open at the end of the lump is discarded
+
+
+# NOTE: entity_pairs tokenises the whole lump in a single pass w/ this pattern
+# -- each token is a tuple of all 7 groups; only the groups for the token found are non-empty
+# -- group 2 includes the opening quote, so empty keys are still truthy
+# -- comments are kept w/ the whitespace before the next token, so CompactEntities can write them back
+# --- a comment always runs to the end of it's line, so there's only one way to match each line
+# TODO: "key" 'value"
+# -- DDayNormany-mappack mtownbh L18 opens w/ `'` & closes w/ `"`
+# -- this seems illegal but the map runs without complaint
+entity_tokens = re.compile(r"""
+    ([\s\x00]*(?://[^\n]*(?=\n|\Z)[\s\x00]*)*)(?:  # 1: whitespace, null terminators & comments before the token
+      ("[^"]*)"(\s)"([^"]*)"  # 2, 3 & 4: "key" "value"; value can span multiple lines
+    | ({) | (})  # 5 & 6: open & close entity
+    | //[^\n]*  # comment w/ no token after it; skipped
+    | ([^\s\x00][^\n]*))  # 7: anything else; reported w/ the rest of the line
+    """, re.VERBOSE)
+
+
+def entity_error(text: str, token_index: int) -> str:
+    """line number & contents of a bad token, for RuntimeErrors raised by entity_pairs"""
+    match = next(itertools.islice(entity_tokens.finditer(text), token_index, None))
+    start = min(s for s in map(match.start, range(2, 8)) if s != -1)
+    line_no = text.count("\n", 0, start) + 1
+    line = text[text.rfind("\n", 0, start) + 1:].partition("\n")[0].rstrip("\r")
+    return f"L{line_no}: {line.encode()}"
+
+
+class EntityQuery:
+    """chainable search of an Entities lump; e.g. bsp.ENTITIES.where(classname="light").where_regex(targetname="^lamp")
+    only holds indices into .entities, so edit the lump & run the query again to get fresh results"""
+    entities: Entities
+    indices: List[int]  # indices into entities which matched every query so far; None for all
+
+    def __init__(self, entities: Entities, indices: List[int] = None):
+        self.entities = entities
+        self.indices = indices
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {len(self)} entities at 0x{id(self):016X}>"
+
+    def __iter__(self):
+        if self.indices is None:
+            return iter(self.entities)
+        return (self.entities[i] for i in self.indices)
+
+    def __len__(self) -> int:
+        return len(self.entities) if self.indices is None else len(self.indices)
+
+    def __getitem__(self, index: int) -> Dict[str, str]:
+        if self.indices is None:
+            return self.entities[index]
+        return self.entities[self.indices[index]]
+
+    def first(self, default: Dict[str, str] = None) -> Dict[str, str]:
+        """first matching entity, or default if there are none"""
+        return next(iter(self), default)
+
+    def candidates(self, search: Dict[str, str], any_match: bool) -> List[int]:
+        """entity indices worth checking against search, narrowed by Entities.index_keys if possible"""
+        indices = range(len(self.entities)) if self.indices is None else self.indices
+        # NOTE: "" also matches entities which don't have the key, which indexes can't find
+        # -- indexes only hold str values; lists (duplicate keys) are checked against every candidate
+        indexed = {k: v for k, v in search.items() if k in self.entities.index_keys and isinstance(v, str) and v != ""}
+        if any_match:  # every key must be indexed, or we have to check every entity anyway
+            if len(indexed) == 0 or len(indexed) != len(search):
+                return indices
+            found = {i for k, v in indexed.items() for i in self.entities.index_of(k).get(v, ())}
+        elif len(indexed) != 0:
+            found = min([self.entities.index_of(k).get(v, ()) for k, v in indexed.items()], key=len)
+        else:
+            return indices
+        untracked = self.entities.untracked()
+        if len(untracked) != 0:
+            found = {*found, *untracked}
+        if self.indices is None:
+            return sorted(found)
+        found = set(found)
+        return [i for i in self.indices if i in found]
+
+    def where(self, **search: Dict[str, str]) -> EntityQuery:
+        entities = self.entities
+        return EntityQuery(entities, [
+            i for i in self.candidates(search, False)
+            if all(entities[i].get(k, "") == v for k, v in search.items())])
+
+    def where_any(self, **search: Dict[str, str]) -> EntityQuery:
+        entities = self.entities
+        return EntityQuery(entities, [
+            i for i in self.candidates(search, True)
+            if any(entities[i].get(k, "") == v for k, v in search.items())])
+
+    def where_regex(self, **search: Dict[str, str]) -> EntityQuery:
+        entities = self.entities
+        patterns = {k: re.compile(p) for k, p in search.items()}
+        return EntityQuery(entities, [
+            i for i in (range(len(entities)) if self.indices is None else self.indices)
+            if all(p.match(entities[i].get(k, "")) is not None for k, p in patterns.items())])
+
+    def where_regex_any(self, **search: Dict[str, str]) -> EntityQuery:
+        entities = self.entities
+        patterns = {k: re.compile(p) for k, p in search.items()}
+        return EntityQuery(entities, [
+            i for i in (range(len(entities)) if self.indices is None else self.indices)
+            if any(p.match(entities[i].get(k, "")) is not None for k, p in patterns.items())])
+
+
+class StringTable:
+    """interned strings shared by every CompactEntity in a CompactEntities lump; each unique string is stored once"""
+    __slots__ = ("strings", "_ids")
+    strings: List[str]  # [id] -> "string"
+    _ids: Dict[str, int]  # {"string": id}; dropped after parsing to save memory, rebuilt by the first edit
+
+    def __init__(self, strings: List[str] = tuple()):
+        self.strings = list(strings)
+        self._ids = None
+
+    def __getstate__(self) -> List[str]:
+        return self.strings
+
+    def __setstate__(self, strings: List[str]):
+        self.__init__(strings)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def id_of(self, string: str) -> int:
+        """adds string to the table if it's new"""
+        if self._ids is None:
+            self._ids = {s: i for i, s in enumerate(self.strings)}
+        string_id = self._ids.get(string, None)
+        if string_id is None:
+            string_id = self._ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def compact(self):
+        """drop the lookup used for adding strings; existing ids are unchanged"""
+        self._ids = None
+
+
+class CompactEntity(MutableMapping):
+    """dict-like entity which stores key-values as ids in a StringTable
+    key-value order & duplicate keys are preserved; duplicate keys read as a list, like Entities
+    NOTE: lists returned for duplicate keys are copies, assign a new list to edit them"""
+    __slots__ = ("_strings", "_pairs", "_layout")
+    _strings: StringTable
+    _pairs: array.array  # [key_id, value_id, key_id, value_id, ...]
+    _layout: Union[Tuple[str], str]
+    # ^ ("before {", "before key", "between key & value", ..., "before }"); see entity_pairs
+    # NOTE: None for the usual layout; edits reset the layout
+    # -- the original text of the entity if it had "\r\n" multi-line values (values are read w/ "\n" only)
+
+    def __init__(self, strings: StringTable, pairs: List[Tuple[str, str]] = tuple(),
+                 layout: Union[Tuple[str], str] = None):
+        self._strings = strings
+        self._pairs = array.array("I", [strings.id_of(s) for pair in pairs for s in pair])
+        self._layout = layout
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __getitem__(self, key: str) -> Union[str, List[str]]:
+        values = [v for k, v in self.pairs() if k == key]
+        if len(values) == 0:
+            raise KeyError(key)
+        return values[0] if len(values) == 1 else values
+
+    def __setitem__(self, key: str, value: Union[str, List[str]]):
+        """replaces all values for key, in the position of the first"""
+        values = [value] if isinstance(value, str) else value
+        pairs = list(self.pairs())
+        index = next((i for i, (k, v) in enumerate(pairs) if k == key), len(pairs))
+        pairs = [*pairs[:index], *[(key, v) for v in values], *[p for p in pairs[index:] if p[0] != key]]
+        self.__init__(self._strings, pairs)
+        entity_edited()
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self.__init__(self._strings, [(k, v) for k, v in self.pairs() if k != key])
+        entity_edited()
+
+    def __contains__(self, key: str) -> bool:
+        strings = self._strings.strings
+        return any(strings[k] == key for k in self._pairs[::2])
+
+    def __iter__(self):
+        strings = self._strings.strings
+        return iter(dict.fromkeys(strings[k] for k in self._pairs[::2]))
+
+    def __len__(self) -> int:
+        return len(set(self._pairs[::2]))
+
+    def pairs(self) -> Iterator[Tuple[str, str]]:
+        """("key", "value") for every key-value, in order; duplicate keys are not grouped"""
+        strings = self._strings.strings
+        ids = iter(self._pairs)
+        return ((strings[k], strings[v]) for k, v in zip(ids, ids))
+
+
+class CompactEntities(Entities):
+    """Entities which use far less memory; all entities are CompactEntity & share one StringTable
+    as_bytes writes key-values in their original order, so unedited lumps are written byte-for-byte
+    -- comments, "\r\n" line endings & bytes which aren't utf-8 (as "surrogateescape" surrogates) are kept too
+    set Bsp.compact_entities = True to load entities lumps as CompactEntities"""
+    strings: StringTable = None
+    trailer: str = "\n\x00"  # written after the last entity
+
+    def __init__(self, iterable: List[Dict[str, str]] = tuple()):
+        super().__init__(map(self.compact, iterable))
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),), {"trailer": self.trailer})
+
+    def compact(self, entity: Dict[str, str]) -> CompactEntity:
+        """entity as a CompactEntity using this lump's StringTable"""
+        if isinstance(entity, CompactEntity):
+            if self.strings is None:  # share the table
+                self.strings = entity._strings
+            if entity._strings is self.strings:
+                return entity
+            return CompactEntity(self.strings, entity.pairs(), entity._layout)
+        if self.strings is None:
+            self.strings = StringTable()
+        pairs = [(k, v) for k, vs in entity.items() for v in ([vs] if isinstance(vs, str) else vs)]
+        return CompactEntity(self.strings, pairs)
+
+    # edits; entities are converted to CompactEntity
+    def __setitem__(self, index: Union[int, slice], entity: Dict[str, str]):
+        if isinstance(index, slice):
+            super().__setitem__(index, [self.compact(e) for e in entity])
+        else:
+            super().__setitem__(index, self.compact(entity))
+
+    def __iadd__(self, entities: List[Dict[str, str]]) -> CompactEntities:
+        return super().__iadd__([self.compact(e) for e in entities])
+
+    def append(self, entity: Dict[str, str]):
+        super().append(self.compact(entity))
+
+    def extend(self, entities: List[Dict[str, str]]):
+        super().extend([self.compact(e) for e in entities])
+
+    def insert(self, index: int, entity: Dict[str, str]):
+        super().insert(index, self.compact(entity))
+
+    def as_bytes(self) -> bytes:
+        chunks = list()
+        for i, entity in enumerate(self):
+            if isinstance(entity._layout, str):  # original text
+                chunks.append(entity._layout)
+            elif entity._layout is None:
+                chunks.append("{" if i == 0 else "\n{")
+                chunks.extend([f'\n"{key}" "{value}"' for key, value in entity.pairs()])
+                chunks.append("\n}")
+            else:
+                open_space, *spaces, close_space = entity._layout
+                chunks.append(f"{open_space}{{")
+                spaces = iter(spaces)
+                chunks.extend([f'{space}"{key}"{gap}"{value}"' for (key, value), space, gap
+                               in zip(entity.pairs(), spaces, spaces)])
+                chunks.append(f"{close_space}}}")
+        chunks.append(self.trailer)
+        # NOTE: bytes which weren't utf-8 were decoded as surrogates by from_bytes
+        return "".join(chunks).encode("utf-8", "surrogateescape")
+
+    @classmethod
+    def from_bytes(cls, raw_lump: bytes) -> CompactEntities:
+        out = cls()
+        out.strings = StringTable()
+        entities = entity_pairs(raw_lump, "surrogateescape")
+        out.extend([CompactEntity(out.strings, pairs, layout) for pairs, layout in entities])
+        out.strings.compact()
+        end = raw_lump.rfind(b"}")
+        while end != -1:  # skip any "}" in a comment
+            line = raw_lump[raw_lump.rfind(b"\n", 0, end) + 1:end]
+            comment = line.find(b"//")
+            if comment == -1 or line.count(b'"', 0, comment) % 2 == 1:  # no comment, or "//" is in a value
+                break
+            end = raw_lump.rfind(b"}", 0, end)
+        trailer = raw_lump[end + 1:]
+        if len(out) != 0 and trailing_space.fullmatch(trailer):
+            out.trailer = trailer.decode("utf-8", "surrogateescape")
+        return out
+
+
+trailing_space = re.compile(rb"[\s\x00]*(?://[^\n]*(?=\n|\Z)[\s\x00]*)*")
+# ^ whitespace, null bytes & comments; CompactEntities only keeps a trailer after the last entity if it matches
+
+
 # methods
 def worldspawn_volume(bsp):
     """allows for sorting maps by size"""
@@ -1149,8 +1149,7 @@ def displacement_mesh(bsp, face_index: int) -> geometry.Mesh:
 
 def model(bsp, model_index: int) -> geometry.Model:
     # entity
-    entities = bsp.ENTITIES.search(model=f"*{model_index}")
-    model_entity = entities[0] if len(entities) != 0 else dict()
+    model_entity = bsp.ENTITIES.where(model=f"*{model_index}").first(dict())
     origin = model_entity.get("origin", "0 0 0")
     origin = vector.vec3(*origin.split())
     pitch, yaw, roll = model_entity.get("angles", "0 0 0").split()
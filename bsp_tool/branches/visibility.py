@@ -0,0 +1,157 @@
+"""Potentially Visible Sets; used by Quake, Quake 2 (& Source) and Quake 3 visibility lumps
+each row is a bitset, bit B of row A (1 << B % 8 of row[B // 8]) is set if cluster B is visible from cluster A"""
+from __future__ import annotations
+import re
+from typing import Any, List, Tuple
+
+
+# run-length encoding
+# NOTE: only runs of zeroes are encoded; each run is stored as a b"\x00" followed by it's length (up to 255)
+# -- all other bytes are copied as-is; so every b"\x00" in an encoded row is followed by a count
+zero_runs = re.compile(b"(\x00{1,255})")
+encoded_runs = [bytes([0, length]) for length in range(256)]
+
+
+def run_length_decode(raw: bytes, offset: int, num_bytes: int) -> Tuple[bytes, int]:
+    """decompress a row of at least num_bytes starting at raw[offset]; also returns the offset after the row
+    NOTE: rows can be longer than num_bytes if the last run of zeroes overshoots"""
+    out = bytearray()
+    while len(out) < num_bytes:
+        # copy every byte up to the next run of zeroes
+        remaining = num_bytes - len(out)
+        zero = raw.find(b"\x00", offset, offset + remaining)
+        if zero == -1:
+            out += raw[offset:offset + remaining]
+            offset += remaining
+            if len(raw) < offset:
+                raise RuntimeError("ran out of bytes mid-row")
+            break
+        out += raw[offset:zero]
+        if zero + 1 == len(raw):
+            raise RuntimeError("ran out of bytes mid-row")
+        count = raw[zero + 1]
+        if count == 0:
+            raise RuntimeError("stream is not compressed")
+        out += bytes(count)
+        offset = zero + 2
+    return bytes(out), offset
+
+
+def run_length_encode(row: bytes) -> bytes:
+    parts = zero_runs.split(row)  # [literal, zeroes, literal, zeroes, ..., literal]
+    parts[1::2] = [encoded_runs[len(zeroes)] for zeroes in parts[1::2]]
+    return b"".join(parts)
+
+
+def decode_rows(raw: bytes, offsets: List[int], num_bytes: int) -> List[bytes]:
+    """run_length_decode(raw, offset, num_bytes)[0] for each offset
+    decompresses everything after min(offsets) in one pass if numpy is installed"""
+    raw = bytes(raw)
+    if len(offsets) == 0:
+        return list()
+    try:
+        import numpy  # optional dependency; pip install numpy
+    except ImportError:
+        return [run_length_decode(raw, offset, num_bytes)[0] for offset in offsets]
+    start = min(offsets)
+    data = numpy.frombuffer(raw, dtype=numpy.uint8, offset=min(start, len(raw)))
+    starts = numpy.asarray(offsets, dtype=numpy.int64) - start
+    is_zero = data == 0
+    is_count = numpy.zeros_like(is_zero)
+    is_count[1:] = is_zero[:-1]
+    # NOTE: anything we can't decode in one pass (bad offsets, zero counts, truncated rows...) is done row-by-row
+    # -- so errors are raised by run_length_decode, and only for rows which are actually used
+    if len(data) == 0 or starts.max() >= len(data) or is_zero[-1] or (is_zero & is_count).any() \
+            or is_count[starts].any():
+        return [run_length_decode(raw, offset, num_bytes)[0] for offset in offsets]
+    counts = numpy.zeros(len(data), dtype=numpy.int64)
+    counts[:-1] = data[1:]
+    lengths = numpy.where(is_zero, counts, numpy.where(is_count, 0, 1))  # decompressed size of each byte
+    ends = numpy.concatenate([[0], numpy.cumsum(lengths)])  # ends[i]: len(decompressed data[:i])
+    decompressed = numpy.repeat(data, lengths)  # zero runs are already zeroes
+    out_starts = ends[starts]
+    if (out_starts + num_bytes > ends[-1]).any():
+        return [run_length_decode(raw, offset, num_bytes)[0] for offset in offsets]
+    # NOTE: a row ends on the first byte which reaches num_bytes; a run of zeroes can overshoot
+    out_ends = ends[numpy.searchsorted(ends, out_starts + num_bytes)]
+    return [decompressed[a:b].tobytes() for a, b in zip(out_starts.tolist(), out_ends.tolist())]
+
+
+class VisibilityMatrix:
+    """every row of a visibility lump, packed into one numpy array of bits (requires numpy)
+    bits[A, B // 8] & (1 << B % 8) is set if cluster B is visible from cluster A"""
+    bits: Any  # numpy.ndarray; dtype=uint8, shape=(num_rows, row_size)
+    num_clusters: int  # number of meaningful bits in each row; any trailing bits are masked off
+
+    def __init__(self, bits: Any, num_clusters: int):
+        self.bits = bits
+        self.num_clusters = num_clusters
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {len(self)}x{self.num_clusters} at 0x{id(self):016X}>"
+
+    def __len__(self) -> int:
+        return self.bits.shape[0]
+
+    @property
+    def row_size(self) -> int:
+        return (self.num_clusters + 7) >> 3
+
+    @classmethod
+    def from_rows(cls, rows: List[bytes], num_clusters: int = None) -> VisibilityMatrix:
+        """rows are padded or truncated to fit num_clusters (default: len(rows))"""
+        import numpy  # optional dependency; pip install numpy
+        if num_clusters is None:
+            num_clusters = len(rows)
+        row_size = (num_clusters + 7) >> 3
+        packed = b"".join([row[:row_size].ljust(row_size, b"\x00") for row in rows])
+        bits = numpy.frombuffer(bytearray(packed), dtype=numpy.uint8).reshape(len(rows), row_size)
+        if num_clusters % 8 != 0:
+            bits[:, -1] &= (1 << num_clusters % 8) - 1
+        return cls(bits, num_clusters)
+
+    def rows(self) -> List[bytes]:
+        return [row.tobytes() for row in self.bits]
+
+    def run_length_encoded(self) -> List[bytes]:
+        """run_length_encode(row) for each row"""
+        return [run_length_encode(row) for row in self.rows()]
+
+    # queries
+    def is_visible(self, a: int, b: int) -> bool:
+        """can cluster a see cluster b?"""
+        return bool(self.bits[a, b >> 3] >> (b & 7) & 1)
+
+    def are_visible(self, a: Any, b: Any) -> Any:
+        """is_visible for each pair of cluster indices in a & b (arrays); returns a numpy.ndarray of bools"""
+        import numpy  # optional dependency; pip install numpy
+        a, b = numpy.asarray(a), numpy.asarray(b)
+        return (self.bits[a, b >> 3] >> (b & 7) & 1).astype(bool)
+
+    def visible_from(self, cluster: int) -> Any:
+        """indices of every cluster visible from cluster; returns a numpy.ndarray"""
+        import numpy  # optional dependency; pip install numpy
+        row = numpy.unpackbits(self.bits[cluster], bitorder="little")[:self.num_clusters]
+        return numpy.flatnonzero(row)
+
+    def visible_counts(self) -> Any:
+        """number of clusters visible from each cluster; returns a numpy.ndarray"""
+        import numpy  # optional dependency; pip install numpy
+        popcount = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint32)
+        return popcount[self.bits].sum(axis=1)
+
+    def as_bools(self) -> Any:
+        """unpacked (num_rows, num_clusters) numpy.ndarray of bools; uses 8x as much memory"""
+        import numpy  # optional dependency; pip install numpy
+        return numpy.unpackbits(self.bits, axis=1, bitorder="little")[:, :self.num_clusters].astype(bool)
+
+
+def cached_matrix(owner: Any, name: str, rows: List[bytes], num_clusters: int = None) -> VisibilityMatrix:
+    """VisibilityMatrix.from_rows(rows, num_clusters), cached in owner.__dict__ until any row is replaced"""
+    cache = owner.__dict__.setdefault("_matrices", dict())
+    # NOTE: rows are immutable bytes, so comparing to the last rows we saw is mostly identity checks
+    cached_rows, cached_num_clusters, matrix = cache.get(name, (None, None, None))
+    if cached_rows != rows or cached_num_clusters != num_clusters:
+        matrix = VisibilityMatrix.from_rows(rows, num_clusters)
+        cache[name] = (list(rows), num_clusters, matrix)
+    return matrix
@@ -1,24 +1,43 @@
 import enum
 import inspect
 
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 
-def make_big_endian(cls) -> object:
+converted: Dict[Tuple[str, type], type] = dict()
+# ^ {("module", cls): cls_x360}; each module converts each LumpClass once, so LUMP_CLASSES can share them
+
+
+def make_big_endian(cls, module_globals: Dict[str, Any] = None) -> object:
     """forces cls._format to big endian"""
     # NOTE: using exec is silly, but it renames the class, other approaches do not
     # alternatives tried:
     # -- subclass w/ __name__: only applied on creation
     # -- copying class in locals() to a new name: original name persisted
+    if module_globals is None:  # globals of the module calling make_big_endian
+        module_globals = inspect.currentframe().f_back.f_globals
+    key = (module_globals["__name__"], cls)
+    if key in converted:
+        return converted[key]
     if issubclass(cls, enum.Enum):  # class BasicBspClass(FormatBase, enum.IntFlag): pass
-        BaseClass = make_big_endian(inspect.getmro(cls)[1])  # hopefully index is consistent
+        BaseClass = make_big_endian(inspect.getmro(cls)[1], module_globals)  # hopefully index is consistent
         exec("\n".join([f"class {cls.__name__}_x360(BaseClass, enum.IntFlag):",
                         *[f"    {FLAG} = {value}" for FLAG, value in cls.__members__.items()]]))
-        return locals()[f"{cls.__name__}_x360"]
-    exec("\n".join([f"class {cls.__name__}_x360(cls):",
-                    f'    _format = ">{cls._format}"']))
+    else:
+        exec("\n".join([f"class {cls.__name__}_x360(cls):",
+                        f'    _format = ">{cls._format}"']))
     # NOTE: trying to use the `inspect` module on a LumpClass_x360 will raise an OSError
-    return locals()[f"{cls.__name__}_x360"]
+    out = locals()[f"{cls.__name__}_x360"]
+    # NOTE: pickle finds classes by __module__ & __qualname__
+    # -- different classes can share a __name__ (e.g. source.Leaf & orange_box.Leaf), so later ones are numbered
+    name, i = out.__name__, 2
+    while name in module_globals and module_globals[name] is not out:
+        name, i = f"{cls.__name__}_x360_{i}", i + 1
+    out.__name__ = out.__qualname__ = name
+    out.__module__ = module_globals["__name__"]
+    module_globals[name] = out
+    converted[key] = out
+    return out
 
 
 LumpClassDict = Dict[str, Dict[int, Any]]
@@ -29,10 +48,11 @@ def convert_versioned(LumpClass_dict: LumpClassDict) -> (LumpClassDict, Dict[str
     """flip the endians on a dict of versioned LumpClasses & returns a list of global names"""
     out = dict()
     _globals = dict()
+    module_globals = inspect.currentframe().f_back.f_globals
     for LUMP_NAME, version_dict in LumpClass_dict.items():
         out[LUMP_NAME] = dict()
         for version, LumpClass in version_dict.items():
-            LumpClass_x360 = make_big_endian(LumpClass)
+            LumpClass_x360 = make_big_endian(LumpClass, module_globals)
             _globals[LumpClass_x360.__name__] = LumpClass_x360
             out[LUMP_NAME][version] = LumpClass_x360
     return out, _globals
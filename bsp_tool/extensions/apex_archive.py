@@ -293,6 +293,30 @@ def hash_history(filepath: str) -> Dict[str, List[str]]:
     return out
 
 
+# "maps/mp_rr_canyonlands_64k_x_64k.bsp" -> {"season/patch": ["LUMP_NAME", ...]}
+def lump_history(filepath: str) -> Dict[str, List[str]]:
+    """list lumps of 'filepath' which changed in each patch (first patch lists every lump)"""
+    import bsp_tool  # NOTE: only imported when needed, this script is usually run standalone
+    out = dict()
+    filepath = map_path(filepath)
+    season, patch = first_patch(filepath).split("/")
+    seasons = {season: patches_after(season, patch)}
+    seasons.update({s: dirs[s] for s in seasons_after(season)})
+    previous = dict()
+    for season, patches in seasons.items():
+        for patch in patches:
+            full_path = os.path.join(seasons_folder, season, patch, filepath)
+            if not os.path.exists(full_path):
+                continue
+            with bsp_tool.load_bsp(full_path) as bsp:
+                lump_hashes = bsp.lump_hashes()
+            changed = [L for L, h in lump_hashes.items() if previous.get(L) != h]
+            if len(changed) > 0:
+                out[f"{season}/{patch}"] = changed
+            previous = lump_hashes
+    return out
+
+
 def generate_hashfile_linux():
     """make 'hashes.sha256' in the local dir"""
     fn_patterns = ("*.bsp", "*.ent", "*.bsp_lump", "*.bsp_lump.client")
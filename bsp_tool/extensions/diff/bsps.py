@@ -1,10 +1,11 @@
+from concurrent import futures
 import difflib
-from typing import Any, Dict, List, Generator
+from typing import Any, Dict, List, Generator, Set
 
 from . import base
 from . import lumps
 
-from bsp_tool.base import Bsp
+from bsp_tool.base import Bsp, BspHandle
 
 
 class BspDiff:
@@ -23,6 +24,12 @@ class BspDiff:
 
     def __getattr__(self, lump_name: str) -> Any:
         """retrieve differ for given lump"""
+        old_header = self.old.headers.get(lump_name)
+        if old_header is not None and old_header.length != 0 and lump_name in self.unchanged_lumps():
+            lump_hash = self.old.lump_hash(lump_name)
+            diff = lumps.IdenticalDiff(lump_hash, lump_hash)  # skip decoding
+            setattr(self, lump_name, diff)  # cache
+            return diff
         old_lump = getattr(self.old, lump_name, None)
         new_lump = getattr(self.new, lump_name, None)
         no_old_lump = old_lump is None
@@ -36,29 +43,49 @@ class BspDiff:
             setattr(self, lump_name, diff)  # cache
             return diff
 
+    def unchanged_lumps(self) -> Set[str]:
+        """lumps w/ identical bytes in both bsps; found by comparing hashes, w/o decoding either lump"""
+        if "_unchanged_lumps" not in self.__dict__:
+            self._unchanged_lumps = {
+                lump_name for lump_name in self.old.headers
+                if lump_name in self.new.headers
+                and self.old.lump_hash(lump_name) == self.new.lump_hash(lump_name)}
+        return self._unchanged_lumps
+
+    def changed_lumps(self) -> List[str]:
+        """lumps which need to be diffed (bytes differ & at least one bsp has the lump)"""
+        unchanged = self.unchanged_lumps()
+        return [
+            lump_name for lump_name in self.old.headers
+            if lump_name not in unchanged
+            and (self.old.headers[lump_name].length != 0 or self.new.headers[lump_name].length != 0)]
+
     def has_no_changes(self) -> bool:
-        try:
-            assert self.headers.has_no_changes()
-            # TODO: other metadata
-            for lump in self.old.headers:
-                old_header = self.old.headers[lump]
-                new_header = self.new.headers[lump]
-                if old_header.length != 0 or new_header.length != 0:
-                    assert getattr(self, lump).has_no_changes()
-        except AssertionError:
+        if not self.headers.has_no_changes():
             return False
-        return True
+        # TODO: other metadata
+        # NOTE: lumps w/ different bytes could still decode to the same entries (e.g. Entities whitespace)
+        return all(getattr(self, lump).has_no_changes() for lump in self.changed_lumps())
 
     def what_changed(self) -> List[str]:
         check = {"headers": self.headers.has_no_changes()}
         # TODO: other metadata
-        for lump in self.old.headers:
-            old_header = self.old.headers[lump]
-            new_header = self.new.headers[lump]
-            if old_header.length != 0 or new_header.length != 0:
-                check[lump] = getattr(self, lump).has_no_changes()
+        for lump in self.changed_lumps():
+            check[lump] = getattr(self, lump).has_no_changes()
         return {attr for attr, unchanged in check.items() if not unchanged}
 
+    def short_stats(self, max_workers: int = None) -> Dict[str, str]:
+        """{"LUMP_NAME": short_stats} for each changed lump; lumps are diffed in parallel across a pool of processes
+        max_workers=1 diffs every lump in this process"""
+        changed = [lump for lump in self.changed_lumps() if not getattr(self, lump).has_no_changes()]
+        if max_workers == 1 or len(changed) < 2:
+            return {lump: getattr(self, lump).short_stats() for lump in changed}
+        # NOTE: each worker re-opens both bsps w/ a BspHandle; edited lumps are sent as bytes
+        old, new = self.old.handle(), self.new.handle()
+        with futures.ProcessPoolExecutor(max_workers) as executor:
+            stats = executor.map(lump_short_stats, [old] * len(changed), [new] * len(changed), changed)
+            return dict(zip(changed, stats))
+
     def save(self, base_filename: str, log_mode: base.LogMode = base.LogMode.VERBOSE):
         """generate & save .diff files"""
         raise NotImplementedError()
@@ -71,6 +98,16 @@ class BspDiff:
         # should also generate a general / meta diff for metadata etc.
 
 
+def lump_short_stats(old: BspHandle, new: BspHandle, lump_name: str) -> str:
+    """BspDiff.short_stats worker"""
+    old_bsp, new_bsp = old.open(), new.open()
+    try:
+        return getattr(BspDiff(old_bsp, new_bsp), lump_name).short_stats()
+    finally:
+        old_bsp.close()
+        new_bsp.close()
+
+
 class HeadersDiff(base.Diff):
     # TODO: support comparisons between different branches
     # TODO: how do we communicate a change in branch order?
@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, List, Set
 
 from . import base
 from . import shared
@@ -19,6 +19,8 @@ def diff_lumps(old_lump: Any, new_lump: Any) -> base.Diff:
             LumpClasses.add(lump.LumpClass)
         else:  # SpecialLumpClass / RawBspLump
             LumpClasses.add(lump.__class__)
+    if all(issubclass(LumpClass, branches.shared.Entities) for LumpClass in LumpClasses):
+        LumpClasses = {branches.shared.Entities}  # Entities & CompactEntities can be diffed
     # match LumpClasses to a base.Diff subclass
     # TODO: mismatched lump type diffs (substitute defaults for alternate versions?)
     # -- should only be used for extremely similar lumps
@@ -34,6 +36,8 @@ def diff_lumps(old_lump: Any, new_lump: Any) -> base.Diff:
     elif RawBspLump in LumpClasses or ExternalRawBspLump in LumpClasses:
         # TODO: core.xxd diff
         raise NotImplementedError("Cannot diff raw lumps")
+    elif isinstance(old_lump, BasicBspLump) and isinstance(new_lump, BasicBspLump):
+        DiffClass = BspLumpDiff
     # if all([issubclass(lc, branches.base.BitField) for lc in LumpClasses]):
     #     DiffClass = base.BitFieldDiff
     # if all([issubclass(lc, branches.base.MappedArray) for lc in LumpClasses]):
@@ -45,6 +49,51 @@ def diff_lumps(old_lump: Any, new_lump: Any) -> base.Diff:
     return DiffClass(old_lump, new_lump)
 
 
+class BspLumpDiff(base.Diff):
+    """BasicBspLump / BspLump diff which compares the raw bytes of entries, rather than decoding them"""
+    # NOTE: entries are compared byte-for-byte; e.g. -0.0 != 0.0
+    old: BasicBspLump
+    new: BasicBspLump
+
+    def has_no_changes(self) -> bool:
+        return len(self.old) == len(self.new) and self.old.as_memoryview() == self.new.as_memoryview()
+
+    def short_stats(self) -> str:
+        """mimick git diff --shortstat; vectorised w/ numpy if available"""
+        try:
+            import numpy  # optional dependency; pip install numpy
+        except ImportError:
+            old, new = self.raw_entries(self.old), self.raw_entries(self.new)
+            added = len(new.difference(old))
+            removed = len(old.difference(new))
+        else:
+            old, new = [numpy.unique(self.raw_rows(lump)) for lump in (self.old, self.new)]
+            added = int(numpy.count_nonzero(~numpy.isin(new, old)))
+            removed = int(numpy.count_nonzero(~numpy.isin(old, new)))
+        return f"{added} insertions(+) {removed} deletions(-)"
+
+    @staticmethod
+    def raw_entries(lump: BasicBspLump) -> Set[bytes]:
+        raw_lump = lump.as_memoryview()
+        size = lump._entry_size
+        return {bytes(raw_lump[i:i + size]) for i in range(0, len(raw_lump), size)}
+
+    @staticmethod
+    def raw_rows(lump: BasicBspLump) -> Any:  # numpy.ndarray
+        """1 opaque numpy.void per entry"""
+        import numpy
+        return numpy.frombuffer(lump.as_memoryview(), numpy.dtype((numpy.void, lump._entry_size)))
+
+
+class IdenticalDiff(base.Diff):
+    """for lumps w/ matching hashes (see BspDiff.unchanged_lumps); old & new are the hashes"""
+    def short_stats(self) -> str:
+        return "0 insertions(+) 0 deletions(-)"
+
+    def unified_diff(self) -> List[str]:
+        return list()
+
+
 class NoneDiff(base.Diff):
     """for diffing against None"""
     def short_stats(self) -> str:
@@ -1,5 +1,4 @@
-import os
-from typing import Any, Dict
+from typing import Any
 
 from . import base
 from . import lumps
@@ -24,30 +23,29 @@ class QuakeBsp(base.Bsp):
                 BspLump = lumps.BspLump.from_header(self.file, lump_header, LumpClass)
             elif lump_name in self.branch.SPECIAL_LUMP_CLASSES:
                 SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[lump_name]
-                self.file.seek(lump_header.offset)
-                BspLump = SpecialLumpClass.from_bytes(self.file.read(lump_header.length))
+                lump_data = lumps.read_at(self.file, lump_header.offset, lump_header.length)
+                BspLump = self.decode(SpecialLumpClass, lump_data)
             elif lump_name in self.branch.BASIC_LUMP_CLASSES:
                 LumpClass = self.branch.BASIC_LUMP_CLASSES[lump_name]
                 BspLump = lumps.BasicBspLump.from_header(self.file, lump_header, LumpClass)
             else:
                 BspLump = lumps.RawBspLump.from_header(self.file, lump_header)
         except Exception as exc:
-            self.loading_errors[lump_name] = exc
+            self._loading_errors[lump_name] = exc
             BspLump = lumps.RawBspLump.from_header(self.file, lump_header)
         setattr(self, lump_name, BspLump)
 
     def _preload(self):
         # collect files
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.file = self._open_file()
         # collect metadata
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect lumps
-        self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
-        for lump_name, lump_header in self._header_generator(offset=4):
-            self._preload_lump(lump_name, lump_header)
+        # collect headers (lumps are loaded on first access)
+        self.headers = dict(self._header_generator(offset=4))
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         # TODO: detect additional BSPX data appended to end of file
 
 
@@ -66,7 +64,7 @@ class ReMakeQuakeBsp(QuakeBsp):
 
     def _preload(self):
         # collect files
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.file = self._open_file()
         # collect metadata
         file_magic = self.file.read(4)
         if file_magic != self.file_magic and file_magic != bytes(reversed(self.file_magic)):
@@ -74,11 +72,10 @@ class ReMakeQuakeBsp(QuakeBsp):
         self.file_magic = file_magic
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect lumps
-        self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
-        for lump_name, lump_header in self._header_generator(offset=4):
-            self._preload_lump(lump_name, lump_header)
+        # collect headers (lumps are loaded on first access)
+        self.headers = dict(self._header_generator(offset=4))
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         self._get_signature(4 + (8 * len(self.branch.LUMP)))
 
 
@@ -100,11 +97,7 @@ class IdTechBsp(base.Bsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        # collect files
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.file = self._open_file()
         # collect metadata
         file_magic = self.file.read(4)
         if file_magic != self.file_magic:
@@ -112,11 +105,10 @@ class IdTechBsp(base.Bsp):
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect lumps
-        self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
-        for lump_name, lump_header in self._header_generator(offset=8):
-            self._preload_lump(lump_name, lump_header)
+        # collect headers (lumps are loaded on first access)
+        self.headers = dict(self._header_generator(offset=8))
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         self._get_signature(8 + (8 * len(self.branch.LUMP)))
 
 
@@ -1,6 +1,7 @@
 import os
+import threading
 from types import ModuleType
-from typing import Dict
+from typing import Any
 import warnings
 
 from . import id_software
@@ -16,14 +17,21 @@ class InfinityWardBsp(id_software.IdTechBsp):
     # -- cod2map.exe creates .d3dbsp, but extracting these from fastfiles may prove difficult
     # -- lumps may be split across multiple files
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True,
+                 memory_map: bool = False, lump_cache: Any = None):
         if not (filename.lower().endswith(".bsp") or filename.lower().endswith(".d3dbsp")):
             # ^ slight alteration to allow .d3dbsp extension
             raise RuntimeError("Not a .bsp")
         filename = os.path.realpath(filename)
         self.folder, self.filename = os.path.split(filename)
+        self.memory_mapped = memory_map
+        self.lump_cache = lump_cache
         self.set_branch(branch)
         self.headers = dict()
+        self._load_lock = threading.RLock()
+        self._deleted_lumps = set()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         if autoload:
             if os.path.exists(filename):
                 self._preload()
@@ -44,11 +52,7 @@ class D3DBsp(InfinityWardBsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        # collect files
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.file = self._open_file()
         # collect metadata
         file_magic = self.file.read(4)
         assert file_magic == self.file_magic, f"{self.file} is not a valid D3DBsp!"
@@ -56,9 +60,10 @@ class D3DBsp(InfinityWardBsp):
         self.lump_count = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect lumps
+        # collect headers (lumps are loaded on first access)
         self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         cursor = 12 + (self.lump_count * 8)  # end of headers; for "reading" lumps
         for i in range(self.lump_count):
             self.file.seek(12 + 8 * i)
@@ -69,9 +74,6 @@ class D3DBsp(InfinityWardBsp):
             cursor += lump_header.length
             lump_header.name = self.branch.LUMP(lump_header.id).name
             self.headers[lump_header.name] = lump_header
-            BspLump = self._preload_lump(lump_header.name, lump_header)
-            if BspLump is not None:
-                setattr(self, lump_header.name, BspLump)
 
     def print_headers(self):
         print(f"{'LUMP.name':<24s} OFFSET LENGTH", "-" * 38, sep="\n")
@@ -0,0 +1,189 @@
+"""On-disk cache of decoded SpecialLumpClasses, keyed by lump contents; for re-opening the same .bsps often"""
+from __future__ import annotations
+import hashlib
+import hmac
+import os
+import pickle
+import struct
+import tempfile
+from typing import Any, List, Tuple
+
+
+_code_version = None  # see code_version()
+
+
+def code_version() -> bytes:
+    """hash of every bsp_tool source file; invalidates cache entries decoded by old code"""
+    global _code_version
+    if _code_version is None:
+        package_folder = os.path.dirname(__file__)
+        hasher = hashlib.blake2b(digest_size=16)
+        for folder, sub_folders, filenames in os.walk(package_folder):
+            sub_folders.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    relative_folder = folder[len(package_folder):].replace(os.sep, "/")
+                    hasher.update(f"{relative_folder}/{filename}\x00".encode())
+                    with open(os.path.join(folder, filename), "rb") as source_file:
+                        hasher.update(hashlib.blake2b(source_file.read()).digest())
+        _code_version = hasher.digest()
+    return _code_version
+
+
+entry_header = struct.Struct("<4s32sQI")
+# ^ magic, digest, pickle length, buffer count
+# NOTE: followed by a uint64_t length for each buffer, the pickle & then each buffer
+# -- buffers are pickle protocol 5 out-of-band data (e.g. numpy arrays), stored raw & loaded w/o unpickling
+# -- digest covers everything after the header; keyed w/ LumpCache.secret (if set)
+
+
+def decoder_name(LumpClass: Any) -> str:
+    """unique name for a SpecialLumpClass, or the lambda which wraps one (e.g. GAME_LUMP_CLASSES)"""
+    name = f"{LumpClass.__module__}.{LumpClass.__qualname__}"
+    if hasattr(LumpClass, "__code__"):  # lambdas all share a __qualname__
+        name = f"{name}:{LumpClass.__code__.co_firstlineno}"
+    return name
+
+
+class LumpCache:
+    """folder of pickled SpecialLumpClasses; least recently used entries are deleted once max_size is exceeded
+    pass to load_bsp(..., lump_cache=LumpCache(folder)); safe to share between processes
+    WARNING: loading an entry unpickles it, which can run arbitrary code
+    -- only use a folder nobody untrusted can write to, or set a secret (entries w/o a matching digest are ignored)"""
+    folder: str
+    max_size: int  # in bytes
+    secret: bytes  # key for each entry's digest; None for an unkeyed checksum (trusted folders only!)
+    ext: str = ".pickle"
+    magic: bytes = b"BTLC"
+    _size: int = None  # estimated size of folder; None until first counted
+
+    def __init__(self, folder: str, max_size: int = 2 ** 30, secret: bytes = None):
+        self.folder = os.path.realpath(folder)
+        self.max_size = max_size
+        self.secret = secret
+        os.makedirs(self.folder, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} '{self.folder}' max_size={self.max_size}>"
+
+    def __getstate__(self) -> dict:
+        return {"folder": self.folder, "max_size": self.max_size, "secret": self.secret}  # _size is per-process
+
+    def key(self, LumpClass: Any, raw_lump: bytes) -> str:
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(code_version())
+        hasher.update(decoder_name(LumpClass).encode())
+        hasher.update(raw_lump)
+        return hasher.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.folder, key[:2], f"{key}{self.ext}")
+
+    def digest(self, *parts: bytes) -> bytes:
+        # NOTE: blake2b keys can't exceed 64 bytes, so the secret is hashed down first
+        key = b"" if self.secret is None else hashlib.blake2b(self.secret).digest()
+        hasher = hashlib.blake2b(digest_size=32, key=key)
+        for part in parts:
+            hasher.update(part)
+        return hasher.digest()
+
+    def from_bytes(self, LumpClass: Any, raw_lump: bytes) -> Any:
+        """LumpClass.from_bytes(raw_lump), loaded from the cache if it has been decoded before"""
+        path = self.path(self.key(LumpClass, raw_lump))
+        try:
+            out = self.load(path)
+            os.utime(path)  # mark as recently used
+            return out
+        except Exception:  # missing, pruned, corrupt, tampered w/ or pickled by another version of python
+            pass  # decode & overwrite
+        out = LumpClass.from_bytes(raw_lump)
+        self.save(path, out)
+        return out
+
+    def load(self, path: str) -> Any:
+        with open(path, "rb") as cache_file:
+            entry = bytearray(os.fstat(cache_file.fileno()).st_size)  # NOTE: writable, so buffers are too
+            cache_file.readinto(entry)
+        magic, digest, pickle_length, buffer_count = entry_header.unpack_from(entry)
+        body = memoryview(entry)[entry_header.size:]
+        if magic != self.magic or not hmac.compare_digest(digest, self.digest(body)):
+            raise RuntimeError(f"{path} was not written by this LumpCache")
+        offset = 8 * buffer_count
+        data = body[offset:offset + pickle_length]
+        buffers = list()
+        offset += pickle_length
+        for length in struct.unpack_from(f"<{buffer_count}Q", body):
+            buffers.append(body[offset:offset + length])
+            offset += length
+        return pickle.loads(data, buffers=buffers)
+
+    def save(self, path: str, lump: Any):
+        buffers = list()
+
+        def out_of_band(buffer: pickle.PickleBuffer) -> bool:
+            try:
+                buffers.append(buffer.raw())
+            except BufferError:  # not contiguous
+                return True  # pickle in-band
+            return False
+
+        try:
+            data = pickle.dumps(lump, protocol=5, buffer_callback=out_of_band)
+        except Exception:  # not all SpecialLumpClasses can be pickled (e.g. PakFile)
+            return
+        body = [struct.pack(f"<{len(buffers)}Q", *map(len, buffers)), data, *buffers]
+        header = entry_header.pack(self.magic, self.digest(*body), len(data), len(buffers))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # NOTE: written to a temp file first, so other processes never read half a file
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(temp_fd, "wb") as temp_file:
+                temp_file.write(header)
+                for part in body:
+                    temp_file.write(part)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        size = len(header) + sum(map(len, body))
+        if self._size is None:
+            self._size = sum(size for path, size, mtime in self.entries())
+        else:
+            self._size += size
+        if self._size > self.max_size:
+            self.prune()
+
+    def entries(self) -> List[Tuple[str, int, int]]:
+        """[(path, size, last_used)] for every entry in the cache"""
+        out = list()
+        for folder, sub_folders, filenames in os.walk(self.folder):
+            for filename in filenames:
+                if filename.endswith(self.ext):
+                    path = os.path.join(folder, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:  # pruned by another process
+                        continue
+                    out.append((path, stat.st_size, stat.st_mtime_ns))
+        return out
+
+    def prune(self, max_size: int = None):
+        """delete least recently used entries until the cache is under 3/4 of max_size"""
+        if max_size is None:
+            max_size = self.max_size
+        entries = sorted(self.entries(), key=lambda e: e[2])  # oldest first
+        self._size = sum(size for path, size, mtime in entries)
+        # NOTE: pruning to 3/4 so we don't prune on every save once the cache is full
+        for path, size, mtime in entries:
+            if self._size <= max_size * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def clear(self):
+        """delete every entry"""
+        self.prune(max_size=0)
@@ -1,18 +1,30 @@
 """classes for dynamically parsing lumps"""
 from __future__ import annotations
 
+import bisect
+import collections
+import copy
+import hashlib
 import io
+import itertools
 import lzma
+import mmap
+import os
 import struct
-from typing import Any, Dict, Union
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 import warnings
 
+from .branches import base as branches_base
+
 
 LumpHeader = Any
 # all: offset & length
 # ValveBsp / RespawnBsp: fourCC & version
 # external: filename & filesize
-Stream = Union[io.BufferedReader, io.BytesIO]
+Stream = Union[io.BufferedReader, io.BytesIO, mmap.mmap]
+Piece = Tuple[Union[None, bytearray, list], int, int]
+# ^ (buffer, start, stop)
 
 
 def _remap_index(index: int, length: int) -> int:
@@ -24,13 +36,101 @@ def _remap_index(index: int, length: int) -> int:
     return index
 
 
-def _remap_slice_to_range(_slice: slice, length: int) -> slice:
+def _remap_slice_to_range(_slice: slice, length: int) -> range:
     """simplify to positive start & stop within range(0, length)"""
-    start, stop, step = _slice.start, _slice.stop, _slice.step
-    start = 0 if (start is None) else max(length + start, 0) if (start < 0) else length if (start > length) else start
-    stop = length if (stop is None or stop > length) else max(length + stop, 0) if (stop < 0) else stop
-    step = 1 if (step is None) else step
-    return range(start, stop, step)
+    # NOTE: slice.indices handles negative steps, unlike doing the math by hand
+    return range(*_slice.indices(length))
+
+
+def open_stream(filename: str, memory_map: bool = False) -> Stream:
+    """open a file for reading lumps from; memory_map shares one page-cache copy between readers"""
+    if not memory_map:
+        return open(filename, "rb")
+    with open(filename, "rb") as file:  # mmap holds it's own handle to the file
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+_seek_lock = threading.Lock()  # for streams which can only seek & read
+
+
+def read_at(stream: Stream, offset: int, length: int) -> bytes:
+    """read length bytes from offset in stream, without moving it's cursor (safe to share across threads)"""
+    if isinstance(stream, mmap.mmap):  # zero-copy
+        return stream[offset:offset + length]
+    if isinstance(stream, io.BytesIO):
+        with stream.getbuffer() as view:
+            return bytes(view[offset:offset + length])
+    if hasattr(os, "pread") and hasattr(stream, "fileno"):  # not available on Windows
+        out = os.pread(stream.fileno(), length, offset)
+        while 0 < len(out) < length:  # short read
+            chunk = os.pread(stream.fileno(), length - len(out), offset + len(out))
+            if len(chunk) == 0:  # end of file
+                break
+            out += chunk
+        return out
+    with _seek_lock:
+        stream.seek(offset)
+        return stream.read(length)
+
+
+def copy_bytes(stream: Stream, offset: int, length: int, outfile: io.BufferedWriter) -> int:
+    """copy length bytes from offset in stream to the current position in outfile; returns bytes written"""
+    if isinstance(stream, mmap.mmap):  # zero-copy
+        with memoryview(stream) as view, view[offset:offset + length] as chunk:
+            return outfile.write(chunk)
+    copied = 0
+    if hasattr(os, "copy_file_range"):  # linux only; copied by the kernel, without a round trip through python
+        outfile.flush()
+        out_offset = outfile.tell()
+        try:
+            in_fd, out_fd = stream.fileno(), outfile.fileno()
+            while copied < length:
+                count = os.copy_file_range(in_fd, out_fd, length - copied, offset + copied, out_offset + copied)
+                if count == 0:  # end of stream
+                    break
+                copied += count
+        except OSError:  # io.BytesIO, or a filesystem that doesn't support it
+            pass
+        outfile.seek(out_offset + copied)
+    while copied < length:
+        chunk = read_at(stream, offset + copied, min(length - copied, 0x100000))
+        if len(chunk) == 0:  # end of stream
+            break
+        copied += outfile.write(chunk)
+    return copied
+
+
+def hash_range(stream: Stream, offset: int, length: int, hasher: Any):
+    """feed length bytes from offset in stream to hasher (e.g. hashlib.blake2b) w/o holding the whole range"""
+    if isinstance(stream, mmap.mmap):  # zero-copy
+        with memoryview(stream) as view, view[offset:offset + length] as chunk:
+            hasher.update(chunk)
+        return
+    end = offset + length
+    while offset < end:
+        chunk = read_at(stream, offset, min(end - offset, 0x100000))
+        if len(chunk) == 0:  # end of stream
+            break
+        hasher.update(chunk)
+        offset += len(chunk)
+
+
+class HashWriter:
+    """write-only file-like object which hashes everything written to it"""
+    hasher: Any  # e.g. hashlib.blake2b()
+    position: int = 0
+
+    def __init__(self, hasher: Any):
+        self.hasher = hasher
+
+    def write(self, data: bytes) -> int:
+        self.hasher.update(data)
+        length = memoryview(data).nbytes
+        self.position += length
+        return length
+
+    def tell(self) -> int:
+        return self.position
 
 
 def decompress_valve_LZMA(data: bytes) -> bytes:
@@ -43,26 +143,35 @@ def decompress_valve_LZMA(data: bytes) -> bytes:
 
 
 def decompressed(stream: Stream, lump_header: LumpHeader) -> (Stream, LumpHeader):
-    """Takes a lump and decompresses it if nessecary. Also corrects lump_header offset & length"""
+    """Takes a lump and decompresses it if nessecary. Also returns a lump_header w/ corrected offset & length
+    NOTE: lump_header is copied, not edited; Bsp.headers must still describe the file, so lumps can be reloaded"""
     if getattr(lump_header, "fourCC", 0) != 0:
         if not hasattr(lump_header, "filename"):
-            stream.seek(lump_header.offset)
-            data = stream.read(lump_header.length)
+            data = read_at(stream, lump_header.offset, lump_header.length)
         else:  # unlikely, but possible
-            data = open(lump_header.filename, "rb").read()
+            with open(lump_header.filename, "rb") as lump_file:
+                data = lump_file.read()
         stream = io.BytesIO(decompress_valve_LZMA(data))
+        lump_header = copy.copy(lump_header)
         lump_header.offset = 0
         lump_header.length = lump_header.fourCC
     return stream, lump_header
 
 
+def decode(LumpClass: Any, raw_lump: bytes, lump_cache: Any = None) -> Any:
+    """LumpClass.from_bytes(raw_lump); via lump_cache (a lump_cache.LumpCache) if given"""
+    if lump_cache is None:
+        return LumpClass.from_bytes(raw_lump)
+    return lump_cache.from_bytes(LumpClass, raw_lump)
+
+
 def create_RawBspLump(stream: Stream, lump_header: LumpHeader) -> RawBspLump:
     if hasattr(lump_header, "fourCC"):
         stream, lump_header = decompressed(stream, lump_header)
     if not hasattr(lump_header, "filename"):
         return RawBspLump.from_header(stream, lump_header)
     else:
-        return ExternalRawBspLump.from_header(lump_header)
+        return ExternalRawBspLump.from_header(lump_header, isinstance(stream, mmap.mmap))
 
 
 def create_BasicBspLump(stream: Stream, lump_header: LumpHeader, LumpClass: object) -> BasicBspLump:
@@ -71,7 +180,7 @@ def create_BasicBspLump(stream: Stream, lump_header: LumpHeader, LumpClass: obje
     if not hasattr(lump_header, "filename"):
         return BasicBspLump.from_header(stream, lump_header, LumpClass)
     else:
-        return ExternalBasicBspLump.from_header(lump_header, LumpClass)
+        return ExternalBasicBspLump.from_header(lump_header, LumpClass, isinstance(stream, mmap.mmap))
 
 
 def create_BspLump(stream: Stream, lump_header: LumpHeader, LumpClass: object = None) -> BspLump:
@@ -80,7 +189,7 @@ def create_BspLump(stream: Stream, lump_header: LumpHeader, LumpClass: object =
     if not hasattr(lump_header, "filename"):
         return BspLump.from_header(stream, lump_header, LumpClass)
     else:
-        return ExternalBspLump.from_header(lump_header, LumpClass)
+        return ExternalBspLump.from_header(lump_header, LumpClass, isinstance(stream, mmap.mmap))
 
 
 class RawBspLump:
@@ -88,13 +197,41 @@ class RawBspLump:
     # TODO: be more bytearray-like
     stream: Stream
     offset: int  # position in stream where lump begins
+    _added: bytearray  # entries inserted by edits (append, insert etc.)
     _changes: Dict[int, bytes]
-    # ^ {index: new_byte}
+    # ^ {stream_index: new_byte}; edit journal, only written to by __setitem__
+    _cache: collections.OrderedDict
+    # ^ {stream_index: decoded_entry}; least recently used first
+    cache_size: int = 0  # max entries in _cache; None for no limit, 0 to disable
+    _evicted: Dict[int, Any]
+    # ^ {stream_index: decoded_entry}; unedited entries evicted from _cache, checked for in-place edits by commit_cache
+    cache_hits: int
+    cache_misses: int
+    edits: int  # counts writes & inserts / deletes; in-place edits to cached entries count once journaled
+    # NOTE: for cheaply telling if a lump changed since it was last read (e.g. quake.vis_matrix)
+    _chunk_length: int = 0x10000  # max entries decoded at once by __iter__
+    _entry_size: int = 1  # bytes per entry
     _length: int  # number of indexable entries
+    _mutable_entries: bool = False  # entries can be edited in-place (e.g. bsp.VERTICES[0].z += 1)
+    _pieces: List[Piece]
+    # ^ [(buffer, start, stop)]; piece table, None until the first insert / delete
+    # -- buffer is None for entries in the stream, otherwise _added
+    _piece_starts: List[int]  # index of the first entry in each piece
+    _span_type: type = bytearray  # returned by slices
+    _stream_length: int  # entries in the stream, before any inserts / deletes
 
     def __init__(self):
+        self._added = bytearray()
+        self._cache = collections.OrderedDict()
         self._changes = dict()
+        self._evicted = dict()
         self._length = 0
+        self._pieces = None
+        self._piece_starts = list()
+        self._stream_length = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.edits = 0
         self.offset = 0
         self.stream = io.BytesIO(b"")
 
@@ -112,81 +249,346 @@ class RawBspLump:
     def __delitem__(self, index: Union[int, slice]):
         if isinstance(index, int):
             index = _remap_index(index, self._length)
-            self[index:] = self[index + 1:]
-            # NOTE: slice assignment will change length
+            self._replace(index, index + 1, ())
         elif isinstance(index, slice):
-            for i in _remap_slice_to_range(index, self._length):
-                del self[i]
+            _range = _remap_slice_to_range(index, self._length)
+            if len(_range) == 0:
+                return
+            if abs(_range.step) == 1:
+                self._replace(min(_range), max(_range) + 1, ())
+            else:  # extended slice
+                for i in sorted(_range, reverse=True):
+                    self._replace(i, i + 1, ())
         else:
             raise TypeError(f"list indices must be integers or slices, not {type(index)}")
 
+    # piece table
+    def _locate(self, index: int) -> (Any, int):
+        """(buffer, index into buffer) of an entry; buffer is None for entries in the stream"""
+        if self._pieces is None:
+            return None, index
+        piece = bisect.bisect_right(self._piece_starts, index) - 1
+        buffer, start, stop = self._pieces[piece]
+        return buffer, start + index - self._piece_starts[piece]
+
+    def _spans(self, start: int = 0, stop: int = None) -> Iterator[Piece]:
+        """(buffer, start, stop) for each piece of the entries in range(start, stop)"""
+        stop = self._length if stop is None else stop
+        if start >= stop:
+            return
+        if self._pieces is None:
+            yield None, start, stop
+            return
+        piece = bisect.bisect_right(self._piece_starts, start) - 1
+        while piece < len(self._pieces) and self._piece_starts[piece] < stop:
+            buffer, piece_start, piece_stop = self._pieces[piece]
+            head = self._piece_starts[piece]
+            yield buffer, piece_start + max(start - head, 0), piece_start + min(stop - head, piece_stop - piece_start)
+            piece += 1
+
+    def _split(self, index: int) -> int:
+        """ensure a piece starts at index; returns that piece's index in _pieces"""
+        if index >= self._length:
+            return len(self._pieces)
+        piece = bisect.bisect_right(self._piece_starts, index) - 1
+        offset = index - self._piece_starts[piece]
+        if offset == 0:
+            return piece
+        buffer, start, stop = self._pieces[piece]
+        self._pieces[piece:piece + 1] = [(buffer, start, start + offset), (buffer, start + offset, stop)]
+        self._piece_starts.insert(piece + 1, index)
+        return piece + 1
+
+    def _replace(self, start: int, stop: int, entries: Iterable):
+        """replace entries in range(start, stop) w/ entries; lengths can differ"""
+        self.edits += 1
+        if self._pieces is None:
+            self._stream_length = self._length
+            self._pieces = [(None, 0, self._length)] if self._length > 0 else list()
+            self._piece_starts = [0] if self._length > 0 else list()
+        first, last = self._split(start), self._split(stop)
+        added_start = len(self._added)
+        self._added.extend(entries)
+        new_pieces = list()
+        if len(self._added) > added_start:
+            new_pieces.append((self._added, added_start, len(self._added)))
+        self._pieces[first:last] = new_pieces
+        self._length += len(self._added) - added_start - (stop - start)
+        # merge neighbouring pieces (e.g. repeated appends)
+        for junction in (first + len(new_pieces), first):
+            if 0 < junction < len(self._pieces):
+                before, after = self._pieces[junction - 1:junction + 1]
+                if before[0] is after[0] and before[2] == after[1]:
+                    self._pieces[junction - 1:junction + 1] = [(before[0], before[1], after[2])]
+        # update _piece_starts
+        first = max(first - 1, 0)
+        del self._piece_starts[first:]
+        head = 0
+        if first > 0:
+            buffer, piece_start, piece_stop = self._pieces[first - 1]
+            head = self._piece_starts[-1] + piece_stop - piece_start
+        for buffer, piece_start, piece_stop in itertools.islice(self._pieces, first, None):
+            self._piece_starts.append(head)
+            head += piece_stop - piece_start
+
+    def entry_as_bytes(self, entry: int) -> bytes:
+        return bytes([entry])
+
+    def entries_as_bytes(self, entries: bytearray) -> bytes:
+        return bytes(entries)
+
     def get(self, index: int, mutable: bool = True) -> int:
+        """mutable=False skips the cache; in-place edits to the returned entry will be lost"""
         # NOTE: don't use get! we can't be sure the given index in bounds
+        if self._pieces is not None:
+            buffer, index = self._locate(index)
+            if buffer is not None:
+                return buffer[index]
         if index in self._changes:
             return self._changes[index]
-        else:
-            value = self.get_unchanged(index)
-            if mutable:
-                self._changes[index] = value
-            return value
+        if index in self._cache:
+            self.cache_hits += 1
+            self._cache.move_to_end(index)
+            return self._cache[index]
+        if index in self._evicted:  # might still be held (& edited) by whoever read it last
+            self.cache_hits += 1
+            return self._evicted[index]
+        self.cache_misses += 1
+        value = self.get_unchanged(index)
+        if mutable and self.cache_size != 0:
+            self._cache[index] = value
+            if self.cache_size is not None:
+                while len(self._cache) > self.cache_size:
+                    self._evict(*self._cache.popitem(last=False))
+        return value
+
+    def _evict(self, index: int, entry: Any):
+        """journal an entry leaving _cache if it was edited in-place; otherwise keep it in _evicted"""
+        # NOTE: whoever read the entry could still edit it, so unedited entries are checked again by commit_cache
+        if self._mutable_entries and not self._journal(index, entry):
+            self._evicted[index] = entry
+
+    def _journal(self, index: int, entry: Any) -> bool:
+        """copy entry into _changes if it was edited in-place; returns True if entry is (now) in _changes"""
+        if not self._mutable_entries:
+            return False
+        if index not in self._changes:
+            size = self._entry_size
+            if self.entry_as_bytes(entry) == self.read_bytes(index * size, (index + 1) * size):
+                return False
+            self._changes[index] = entry
+            self.edits += 1
+        return True
+
+    def clear_cache(self):
+        """empty _cache & _evicted, keeping any in-place edits in _changes
+        NOTE: in-place edits to entries read before clear_cache are lost; read them again"""
+        self.commit_cache()
+        self._cache.clear()
+        self._evicted.clear()
+
+    def commit_cache(self):
+        """copy cached entries which were edited in-place into _changes"""
+        # NOTE: entries stay in _cache, so further in-place edits are also seen by _changes
+        for index, entry in self._cache.items():
+            self._journal(index, entry)
+        for index in [i for i, entry in self._evicted.items() if self._journal(i, entry)]:
+            del self._evicted[index]
 
     def get_unchanged(self, index: int) -> int:
         """no index remapping, be sure to respect stream data bounds!"""
-        self.stream.seek(self.offset + index)
-        return self.stream.read(1)[0]
+        if isinstance(self.stream, mmap.mmap):  # zero-copy
+            return self.stream[self.offset + index]
+        return read_at(self.stream, self.offset + index, 1)[0]
+
+    def get_range(self, _range: range) -> bytearray:
+        """bulk read w/ all edits applied; doesn't update _changes"""
+        if len(_range) == 0:
+            return self._span_type()
+        start, stop = min(_range), max(_range) + 1
+        if self._pieces is None:
+            out = self.get_stream_range(start, stop)
+        else:
+            out = self._span_type()
+            for buffer, span_start, span_stop in self._spans(start, stop):
+                if buffer is None:
+                    out.extend(self.get_stream_range(span_start, span_stop))
+                else:
+                    out.extend(buffer[span_start:span_stop])
+        if _range.step == 1:
+            return out
+        return self._span_type([out[i - start] for i in _range])
+
+    def get_stream_range(self, start: int, stop: int) -> bytearray:
+        """entries in the stream from start to stop w/ _changes applied as a sparse overlay"""
+        out = bytearray(self.read_bytes(start, stop))
+        if len(out) < stop - start:  # stream is too short
+            out.extend(bytes(stop - start - len(out)))
+        if len(self._changes) < stop - start:  # sparse changes
+            changes = [(i, b) for i, b in self._changes.items() if start <= i < stop]
+        else:
+            changes = [(i, self._changes[i]) for i in range(start, stop) if i in self._changes]
+        for index, byte in changes:
+            out[index - start] = byte
+        return out
+
+    def get_unchanged_range(self, _range: range) -> bytearray:
+        """no index remapping, be sure to respect stream data bounds!"""
+        if len(_range) == 0:
+            return bytearray()
+        start, stop = min(_range), max(_range) + 1
+        raw_bytes = self.read_bytes(start, stop)
+        if _range.step == 1:
+            return bytearray(raw_bytes)
+        return bytearray([raw_bytes[i - start] for i in _range])
+
+    def read_bytes(self, start: int, stop: int) -> bytes:
+        """read unchanged bytes from the lump's region of the stream"""
+        return read_at(self.stream, self.offset + start, stop - start)
 
     def __getitem__(self, index: Union[int, slice]) -> Union[int, bytearray]:
         """Reads bytes from the start of the lump"""
         if isinstance(index, int):
             return self.get(_remap_index(index, self._length))
         elif isinstance(index, slice):
-            # TODO: BspLump[::] returns a copy (doesn't update _changes)
-            return bytearray([self[i] for i in _remap_slice_to_range(index, self._length)])
+            # NOTE: BspLump[::] returns a copy (doesn't update _changes)
+            return self.get_range(_remap_slice_to_range(index, self._length))
         else:
             raise TypeError(f"list indices must be integers or slices, not {type(index)}")
 
     def __setitem__(self, index: int | slice, value: Any):
         """remapping slices is allowed, but only slices"""
+        self.edits += 1
         if isinstance(index, int):
-            index = _remap_index(index, self._length)
-            self._changes[index] = value
+            buffer, index = self._locate(_remap_index(index, self._length))
+            if buffer is not None:
+                buffer[index] = value
+            else:
+                self._changes[index] = value
+                self._cache.pop(index, None)
+                self._evicted.pop(index, None)
         elif isinstance(index, slice):
-            slice_indices = list(_remap_slice_to_range(index, self._length))
-            length_change = len(list(value)) - len(slice_indices)
-            slice_changes = dict(zip(slice_indices, value))
-            if length_change == 0:  # replace a slice with an equal length slice
-                self._changes.update(slice_changes)
-            else:  # update a slice in the place of another slice (delete / insert)
-                self._length += length_change
-                head, tail = min(slice_indices), max(slice_indices)
-                # NOTE: slice may have negative step
-                # TODO: TEST different slice step
-                new_head = {i: v for i, v in self._changes.items() if i < head}
-                new_tail = {i + length_change: v for i, v in self._changes.items() if i > tail}
-                self._changes = {**new_head, **slice_changes, **new_tail}
+            _range = _remap_slice_to_range(index, self._length)
+            if _range.step == 1:  # NOTE: lengths can differ, like a list
+                self._replace(_range.start, max(_range.start, _range.stop), value)
+            else:
+                value = list(value)
+                if len(value) != len(_range):
+                    message = f"attempt to assign sequence of size {len(value)} to extended slice of size {len(_range)}"
+                    raise ValueError(message)
+                for i, entry in zip(_range, value):
+                    self[i] = entry
         else:
             raise TypeError(f"list indices must be integers or slices, not {type(index)}")
 
-    def __iter__(self):
-        return iter([self.get(i, mutable=False) for i in range(self._length)])
+    def __iter__(self) -> Iterator[Any]:
+        # NOTE: reads in chunks, without updating _changes
+        for start in range(0, self._length, self._chunk_length):
+            stop = min(start + self._chunk_length, self._length)
+            yield from self.get_range(range(start, stop))
 
     def __len__(self):
         return self._length
 
+    def __bytes__(self) -> bytes:
+        """the whole lump w/ all edits applied"""
+        self.commit_cache()
+        if len(self._changes) == 0 and self._pieces is None:  # one bulk read
+            return bytes(self.read_bytes(0, self._length * self._entry_size))
+        return b"".join(self.iter_bytes())
+
+    def as_memoryview(self) -> memoryview:
+        """read-only view of the whole lump; zero-copy if unchanged & the stream is in memory"""
+        self.commit_cache()
+        length = self._length * self._entry_size
+        unchanged = len(self._changes) == 0 and self._pieces is None
+        if unchanged and isinstance(self.stream, (mmap.mmap, io.BytesIO)):
+            buffer = self.stream if isinstance(self.stream, mmap.mmap) else self.stream.getbuffer()
+            with memoryview(buffer) as view:
+                if self.offset + length <= len(view):
+                    return view[self.offset:self.offset + length].toreadonly()
+        return memoryview(bytes(self))
+
+    def __buffer__(self, flags: int) -> memoryview:
+        """buffer protocol (Python 3.12+); e.g. memoryview(lump)"""
+        return self.as_memoryview()
+
+    def __release_buffer__(self, view: memoryview):
+        view.release()
+
+    def is_dirty(self) -> bool:
+        """have any entries been inserted / deleted, or does any entry in _changes differ from the stream?"""
+        # NOTE: writes of unchanged values are also journaled
+        # -- comparing bytes (not values) is bit-exact, even for NaN floats
+        self.commit_cache()
+        if self._pieces is not None:
+            if self._pieces != ([(None, 0, self._stream_length)] if self._stream_length > 0 else list()):
+                return True
+        size = self._entry_size
+        chunk_start, raw_chunk = None, b""
+        for index in sorted(self._changes):
+            start = index - index % self._chunk_length
+            if start != chunk_start:
+                chunk_start = start
+                raw_chunk = self.read_bytes(start * size, min(start + self._chunk_length, self._length) * size)
+            offset = (index - start) * size
+            if self.entry_as_bytes(self._changes[index]) != raw_chunk[offset:offset + size]:
+                return True
+        return False
+
+    def edit_state(self) -> Tuple[int, bytes]:
+        """(edits, digest of edited & inserted entries); changes whenever the lump is edited
+        cheaper than hashing the whole lump, since unedited entries aren't encoded"""
+        self.commit_cache()
+        if not self._mutable_entries:  # every edit goes through __setitem__ or _replace
+            return self.edits, b""
+        # NOTE: entries in _changes & _added could have been edited in-place since they were written
+        hasher = hashlib.blake2b(digest_size=16)
+        for entry in self._changes.values():
+            hasher.update(self.entry_as_bytes(entry))
+        hasher.update(self.entries_as_bytes(self._added))
+        return self.edits, hasher.digest()
+
+    def iter_bytes(self) -> Iterator[bytearray]:
+        """the whole lump as bytes, one chunk at a time; only edits are re-encoded"""
+        self.commit_cache()
+        for buffer, start, stop in self._spans():
+            for chunk_start in range(start, stop, self._chunk_length):
+                chunk_stop = min(chunk_start + self._chunk_length, stop)
+                if buffer is None:
+                    yield self.stream_bytes(chunk_start, chunk_stop)
+                else:
+                    yield bytearray(self.entries_as_bytes(buffer[chunk_start:chunk_stop]))
+
+    def stream_bytes(self, start: int, stop: int) -> bytearray:
+        """entries in the stream from start to stop as bytes; only _changes are re-encoded"""
+        size = self._entry_size
+        chunk = bytearray(self.read_bytes(start * size, stop * size))
+        if len(chunk) < (stop - start) * size:  # stream is too short
+            chunk.extend(bytes((stop - start) * size - len(chunk)))
+        if len(self._changes) < stop - start:  # sparse changes
+            changes = [(i, e) for i, e in self._changes.items() if start <= i < stop]
+        else:
+            changes = [(i, self._changes[i]) for i in range(start, stop) if i in self._changes]
+        for index, entry in changes:
+            offset = (index - start) * size
+            chunk[offset:offset + size] = self.entry_as_bytes(entry)
+        return chunk
+
     def append(self, entry):
-        self._length += 1
-        self[-1] = entry
+        self._replace(self._length, self._length, [entry])
 
-    def extend(self, entries: bytes):
-        for entry in entries:
-            self.append(entry)
+    def extend(self, entries: Iterable):
+        self._replace(self._length, self._length, entries)
 
     def insert(self, index: int, entry: Any):
-        self._length += 1
-        self[index + 1:] = self[index:]
-        self[index] = entry
+        # NOTE: out of range indices are clamped, like list.insert
+        if index < 0:
+            index = max(self._length + index, 0)
+        index = min(index, self._length)
+        self._replace(index, index, [entry])
 
-    def pop(self, index: Union[int, slice]) -> Union[int, bytes]:
+    def pop(self, index: Union[int, slice] = -1) -> Union[int, bytes]:
         out = self[index]
         del self[index]
         return out
@@ -200,22 +602,25 @@ class BasicBspLump(RawBspLump):
     _changes: Dict[int, object]
     # ^ {index: LumpClass(new_entry)}
     # NOTE: there are no checks to ensure changes are the correct type or size
+    _chunk_length: int = 0x1000  # max entries decoded at once by __iter__
     _entry_size: int  # sizeof(LumpClass)
     _length: int  # number of indexable entries
+    _struct: struct.Struct  # compiled LumpClass._format
+
+    _span_type: type = list
 
     def __init__(self):
-        self._changes = dict()
+        super().__init__()
+        self._added = list()
         self._entry_size = 0
-        self._length = 0
-        self.offset = 0
-        self.stream = io.BytesIO(b"")
 
     @classmethod
     def from_count(cls, stream: Stream, count: int, LumpClass: object):
         """starts from cursor; stream.seek() before creating"""
         out = cls()
         out.LumpClass = LumpClass
-        out._entry_size = struct.calcsize(LumpClass._format)
+        out._struct = branches_base.compiled_format(LumpClass._format)
+        out._entry_size = out._struct.size
         out._length = count
         out.offset = stream.tell()
         out.stream = stream
@@ -231,7 +636,8 @@ class BasicBspLump(RawBspLump):
     def from_header(cls, stream: Stream, lump_header: LumpHeader, LumpClass: object):
         out = cls()
         out.LumpClass = LumpClass
-        out._entry_size = struct.calcsize(LumpClass._format)
+        out._struct = branches_base.compiled_format(LumpClass._format)
+        out._entry_size = out._struct.size
         out._length = lump_header.length // out._entry_size
         out.offset = lump_header.offset
         out.stream = stream
@@ -242,19 +648,85 @@ class BasicBspLump(RawBspLump):
     def __repr__(self):
         return f"<{self.__class__.__name__}({len(self)} {self.LumpClass.__name__}) at 0x{id(self):016X}>"
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # NOTE: only lumps w/ a BytesIO stream can be pickled (e.g. GameLump_SPRP.props)
+        return {k: v for k, v in self.__dict__.items() if k != "_struct"}  # can't pickle struct.Struct
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._struct = branches_base.compiled_format(self.LumpClass._format)
+
+    def as_numpy(self) -> Any:  # numpy.ndarray
+        """numpy array w/ a structured dtype matching LumpClass; zero-copy (read-only) if unchanged"""
+        import numpy  # optional dependency; pip install numpy
+        dtype = branches_base.numpy_dtype(self.LumpClass)
+        self.commit_cache()
+        if len(self._changes) == 0 and self._pieces is None:
+            if isinstance(self.stream, (mmap.mmap, io.BytesIO)):  # zero-copy
+                buffer = self.stream if isinstance(self.stream, mmap.mmap) else self.stream.getbuffer()
+                out = numpy.frombuffer(buffer, dtype, count=self._length, offset=self.offset)
+                out.flags.writeable = False  # edits must go through _changes
+                return out
+            return numpy.frombuffer(self.read_bytes(0, self._length * self._entry_size), dtype)
+        # apply edits to a copy
+        return numpy.frombuffer(bytearray().join(self.iter_bytes()), dtype)
+
+    def entry_as_bytes(self, entry: Any) -> bytes:
+        if hasattr(entry, "as_int"):  # branches.base.BitField
+            entry = entry.as_int()
+        return self._struct.pack(entry)
+
     def get_unchanged(self, index: int) -> int:
         """no index remapping, be sure to respect stream data bounds!"""
         # NOTE: no .from_stream(); BasicLumpClasses only specify _format
-        self.stream.seek(self.offset + (index * self._entry_size))
-        raw_entry = struct.unpack(self.LumpClass._format, self.stream.read(self._entry_size))
-        return self.LumpClass(raw_entry[0])
+        return self.LumpClass(self.unpack_entry(index)[0])
+
+    def get_unchanged_range(self, _range: range) -> List[Any]:
+        """no index remapping, be sure to respect stream data bounds!"""
+        return [self.LumpClass(t[0]) for t in self.unpack_range(_range)]
+
+    def entries_as_bytes(self, entries: List[Any]) -> bytes:
+        return b"".join(map(self.entry_as_bytes, entries))
+
+    def get_stream_range(self, start: int, stop: int) -> List[Any]:
+        """entries in the stream from start to stop w/ _changes applied; doesn't update _changes or _cache"""
+        changes = self._changes
+        if self._mutable_entries and len(self._cache) + len(self._evicted) > 0:  # may have been edited in-place
+            changes = {**self._evicted, **self._cache, **self._changes}
+        if len(changes) == 0:
+            return self.get_unchanged_range(range(start, stop))
+        unchanged_indices = [i for i in range(start, stop) if i not in changes]
+        if len(unchanged_indices) == 0:
+            return [changes[i] for i in range(start, stop)]
+        unchanged_start, unchanged_stop = min(unchanged_indices), max(unchanged_indices) + 1
+        unchanged = self.get_unchanged_range(range(unchanged_start, unchanged_stop))
+        return [changes[i] if i in changes else unchanged[i - unchanged_start] for i in range(start, stop)]
+
+    def unpack_range(self, _range: range) -> List[tuple]:
+        """raw tuples for all entries in _range; decoded from one contiguous read"""
+        if len(_range) == 0:
+            return list()
+        start, stop = min(_range), max(_range) + 1
+        raw_bytes = self.read_bytes(start * self._entry_size, stop * self._entry_size)
+        _tuples = list(self._struct.iter_unpack(raw_bytes))
+        if _range.step == 1:
+            return _tuples
+        return [_tuples[i - start] for i in _range]
+
+    def unpack_entry(self, index: int) -> tuple:
+        """raw tuple for entry at index; no index remapping, be sure to respect stream data bounds!"""
+        offset = self.offset + (index * self._entry_size)
+        if isinstance(self.stream, mmap.mmap):  # zero-copy
+            return self._struct.unpack_from(self.stream, offset)
+        return self._struct.unpack(read_at(self.stream, offset, self._entry_size))
 
     def __getitem__(self, index: Union[int, slice]):
         """Reads bytes from self.stream & returns LumpClass(es)"""
         if isinstance(index, int):
             return self.get(_remap_index(index, self._length))
         elif isinstance(index, slice):
-            return [self[i] for i in _remap_slice_to_range(index, self._length)]
+            # NOTE: BspLump[::] returns a copy (doesn't update _changes)
+            return self.get_range(_remap_slice_to_range(index, self._length))
         else:
             raise TypeError(f"list indices must be integers or slices, not {type(index)}")
 
@@ -267,17 +739,27 @@ class BspLump(BasicBspLump):
     _changes: Dict[int, object]
     # ^ {index: LumpClass(new_entry)}
     # NOTE: there are no checks to ensure changes are the correct type or size
+    cache_size: int = 0x1000  # max entries in _cache; None for no limit, 0 to disable
+    # NOTE: in-place edits are journaled when an entry leaves the cache
+    # -- unedited entries move to _evicted, so edits made later (e.g. to an entry held elsewhere) are still found
+    # -- _evicted grows w/ every entry read by index; iterate, slice or use .get(i, mutable=False) for pure reads
     _entry_size: int  # sizeof(LumpClass)
     _length: int  # number of indexable entries
+    _mutable_entries: bool = True
 
     def get_unchanged(self, index: int) -> int:
         """no index remapping, be sure to respect stream data bounds!"""
-        self.stream.seek(self.offset + (index * self._entry_size))
         # BROKEN: quake.Edge does not support .from_stream()
         # return self.LumpClass.from_stream(self.stream)
         # HACK: required for quake.Edge
-        _tuple = struct.unpack(self.LumpClass._format, self.stream.read(self._entry_size))
-        return self.LumpClass.from_tuple(_tuple)
+        return self.LumpClass.from_tuple(self.unpack_entry(index))
+
+    def get_unchanged_range(self, _range: range) -> List[Any]:
+        """no index remapping, be sure to respect stream data bounds!"""
+        return [self.LumpClass.from_tuple(t) for t in self.unpack_range(_range)]
+
+    def entry_as_bytes(self, entry: Any) -> bytes:
+        return self._struct.pack(*entry.as_tuple())
 
     def search(self, **kwargs):
         """Returns all lump entries which have the queried values [e.g. find(x=0)]"""
@@ -294,11 +776,11 @@ class ExternalRawBspLump(RawBspLump):
     # -- should also override any returned entries with _changes
 
     @classmethod
-    def from_header(cls, lump_header: LumpHeader):
+    def from_header(cls, lump_header: LumpHeader, memory_map: bool = False):
         out = cls()
         out._length = lump_header.filesize
         out.offset = 0
-        out.stream = open(lump_header.filename, "rb")
+        out.stream = open_stream(lump_header.filename, memory_map)
         return out
 
 
@@ -312,10 +794,10 @@ class ExternalBasicBspLump(BasicBspLump):
     _length: int  # number of indexable entries
 
     @classmethod
-    def from_header(cls, lump_header: LumpHeader, LumpClass: object):
+    def from_header(cls, lump_header: LumpHeader, LumpClass: object, memory_map: bool = False):
         out = super().from_header(None, lump_header, LumpClass)
         out.offset = 0
-        out.stream = open(lump_header.filename, "rb")
+        out.stream = open_stream(lump_header.filename, memory_map)
         return out
 
 
@@ -331,10 +813,10 @@ class ExternalBspLump(BspLump):
     _length: int  # number of indexable entries
 
     @classmethod
-    def from_header(cls, lump_header: LumpHeader, LumpClass: object):
+    def from_header(cls, lump_header: LumpHeader, LumpClass: object, memory_map: bool = False):
         out = super().from_header(None, lump_header, LumpClass)
         out.offset = 0
-        out.stream = open(lump_header.filename, "rb")
+        out.stream = open_stream(lump_header.filename, memory_map)
         return out
 
 
@@ -355,21 +837,22 @@ class GameLump:
     # -- sprp: Static Props
 
     def __init__(self, stream: Stream, lump_header: LumpHeader, endianness: str,
-                 LumpClasses: Dict[str, object], GameLumpHeaderClass: object):
+                 LumpClasses: Dict[str, object], GameLumpHeaderClass: object, lump_cache: Any = None):
         self.GameLumpHeaderClass = GameLumpHeaderClass
         self.endianness = endianness
         self.loading_errors = dict()
         lump_offset = 0
         if not hasattr(lump_header, "filename"):
             lump_offset = lump_header.offset
-            stream.seek(lump_offset)
         else:
             self.is_external = True
-        game_lumps_count = int.from_bytes(stream.read(4), self.endianness)
+        game_lumps_count = int.from_bytes(read_at(stream, lump_offset, 4), self.endianness)
+        header_size = branches_base.compiled_format(GameLumpHeaderClass._format).size
+        raw_headers = read_at(stream, lump_offset + 4, header_size * game_lumps_count)
         self.headers = dict()
         # {"child_name": child_header}
         for i in range(game_lumps_count):
-            child_header = GameLumpHeaderClass.from_stream(stream)
+            child_header = GameLumpHeaderClass.from_bytes(raw_headers[header_size * i:header_size * (i + 1)])
             if self.is_external:
                 child_header.offset = child_header.offset - lump_header.offset
             child_name = child_header.id.decode("ascii")
@@ -384,17 +867,16 @@ class GameLump:
             if child_LumpClass is None:
                 setattr(self, child_name, create_RawBspLump(stream, child_header))
             else:
-                stream.seek(child_header.offset)
                 try:
-                    child_lump_bytes = stream.read(child_header.length)
+                    child_lump_bytes = read_at(stream, child_header.offset, child_header.length)
                     compressed = child_lump_bytes[:4] == b"LZMA"
                     if compressed and child_header.flags & 1 != 1:
                         warnings.warn(UserWarning(f"{child_name} game lump is compressed but the flag is unset (Xbox360?)"))
                     if not compressed:
-                        child_lump = child_LumpClass.from_bytes(child_lump_bytes)
+                        child_lump = decode(child_LumpClass, child_lump_bytes, lump_cache)
                     if compressed and child_header.length > 17:  # sizeof(LZMA_Header)
                         child_lump_bytes = decompress_valve_LZMA(child_lump_bytes)
-                        child_lump = child_LumpClass.from_bytes(child_lump_bytes)
+                        child_lump = decode(child_LumpClass, child_lump_bytes, lump_cache)
                     elif compressed:  # but otherwise empty
                         # NOTE: length might be 12, for an empty source.GameLump_SPRP
                         warnings.warn(UserWarning(f"compressed empty {child_name} game lump"))
@@ -419,14 +901,15 @@ class GameLump:
         out.append(len(self.headers).to_bytes(4, self.endianness))
         headers = []
         # skip the headers
-        cursor_offset = lump_offset + 4 + len(self.headers) * struct.calcsize(self.GameLumpHeaderClass._format)
+        header_size = branches_base.compiled_format(self.GameLumpHeaderClass._format).size
+        cursor_offset = lump_offset + 4 + len(self.headers) * header_size
         # write child lumps
         # TODO: generate absent headers from lump names
         # -- this will require an endianness check for header.id
         for child_name, child_header in self.headers.items():
             child_lump = getattr(self, child_name)
             if isinstance(child_lump, RawBspLump):
-                child_lump_bytes = child_lump[::]
+                child_lump_bytes = bytes(child_lump)
             else:
                 child_lump_bytes = child_lump.as_bytes()  # SpecialLumpClass method
             out.append(child_lump_bytes)
@@ -452,22 +935,23 @@ class DarkMessiahSPGameLump:
     unknown: int
 
     def __init__(self, stream: io.BufferedReader, lump_header: Any, endianness: str,
-                 LumpClasses: Dict[str, object], GameLumpHeaderClass: object):
+                 LumpClasses: Dict[str, object], GameLumpHeaderClass: object, lump_cache: Any = None):
         self.endianness = endianness
         self.GameLumpHeaderClass = GameLumpHeaderClass
         self.loading_errors = dict()
         lump_offset = 0
         if not hasattr(lump_header, "filename"):
             lump_offset = lump_header.offset
-            stream.seek(lump_offset)
         else:
             self.is_external = True
-        game_lumps_count = int.from_bytes(stream.read(4), self.endianness)
-        self.unknown = int.from_bytes(stream.read(4), self.endianness)
+        game_lumps_count = int.from_bytes(read_at(stream, lump_offset, 4), self.endianness)
+        self.unknown = int.from_bytes(read_at(stream, lump_offset + 4, 4), self.endianness)
+        header_size = branches_base.compiled_format(GameLumpHeaderClass._format).size
+        raw_headers = read_at(stream, lump_offset + 8, header_size * game_lumps_count)
         self.headers = dict()
         # {"child_name": child_header}
         for i in range(game_lumps_count):
-            child_header = GameLumpHeaderClass.from_stream(stream)
+            child_header = GameLumpHeaderClass.from_bytes(raw_headers[header_size * i:header_size * (i + 1)])
             if self.is_external:
                 child_header.offset = child_header.offset - lump_header.offset
             child_name = child_header.id.decode("ascii")
@@ -482,14 +966,13 @@ class DarkMessiahSPGameLump:
             if child_LumpClass is None:
                 setattr(self, child_name, create_RawBspLump(stream, child_header))
             else:
-                stream.seek(child_header.offset)
                 try:
-                    child_lump_bytes = stream.read(child_header.length)
+                    child_lump_bytes = read_at(stream, child_header.offset, child_header.length)
                     # check if GameLump child is LZMA compressed (Xbox360)
                     # -- GameLumpHeader.flags does not appear to inidicate compression
                     if child_lump_bytes[:4] == b"LZMA":
                         child_lump_bytes = decompress_valve_LZMA(child_lump_bytes)
-                    child_lump = child_LumpClass.from_bytes(child_lump_bytes)
+                    child_lump = decode(child_LumpClass, child_lump_bytes, lump_cache)
                 except Exception as exc:
                     self.loading_errors[child_name] = exc
                     child_lump = create_RawBspLump(stream, child_header)
@@ -507,14 +990,15 @@ class DarkMessiahSPGameLump:
         out.append(self.unknown)
         headers = []
         # skip the headers
-        cursor_offset = lump_offset + 4 + len(self.headers) * struct.calcsize(self.GameLumpHeaderClass._format)
+        header_size = branches_base.compiled_format(self.GameLumpHeaderClass._format).size
+        cursor_offset = lump_offset + 4 + len(self.headers) * header_size
         # write child lumps
         # TODO: generate absent headers from lump names
         # -- this will require an endianness check for header.id
         for child_name, child_header in self.headers.items():
             child_lump = getattr(self, child_name)
             if isinstance(child_lump, RawBspLump):
-                child_lump_bytes = child_lump[::]
+                child_lump_bytes = bytes(child_lump)
             else:
                 child_lump_bytes = child_lump.as_bytes()  # SpecialLumpClass method
             out.append(child_lump_bytes)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 from collections import namedtuple
+import hashlib
+import importlib
 import os
 import shutil
 import struct
+import threading
 from types import MethodType, ModuleType
-from typing import Dict
+from typing import Any, Dict, List
+import weakref
 
 from . import base
 from . import lumps
@@ -27,8 +31,14 @@ class ExternalLumpManager:
     # unique to external lumps
     headers: Dict[str, ExternalLumpHeader]
     # ^ {"LUMP_NAME": ExternalLumpHeader}
-    loading_errors: Dict[str, Exception]
+    _loaded_lumps: Dict[str, weakref.ref]
+    # ^ {"LUMP_NAME": weakref.ref(lump)}
+    _loading_errors: Dict[str, Exception]
     # ^ {"LUMP_NAME": Error}
+    _load_lock: threading.RLock  # held while loading a lump
+    compact_entities: bool = False
+    lump_cache: Any = None
+    memory_mapped: bool = False
 
     def __init__(self, bsp: RespawnBsp):
         self.branch = bsp.branch
@@ -37,11 +47,16 @@ class ExternalLumpManager:
         self.file_magic = bsp.file_magic
         self.filename = bsp.filename
         self.folder = bsp.folder
+        self.memory_mapped = bsp.memory_mapped
+        self.compact_entities = bsp.compact_entities
+        self.lump_cache = bsp.lump_cache
         self.lump_count = bsp.lump_count
         self.revision = bsp.revision
         # generate headers
         self.headers = dict()
-        self.loading_errors = dict()
+        self._load_lock = threading.RLock()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         for LUMP in bsp.branch.LUMP:
             lump_filenames = {
                 f"{bsp.filename}.{LUMP.value:04x}.bsp_lump",
@@ -65,17 +80,37 @@ class ExternalLumpManager:
 
     __repr__ = base.Bsp.__repr__
 
+    def __getstate__(self) -> Dict[str, Any]:
+        """for pickling w/ base.BspHandle; loaded lumps are discarded"""
+        skip = {"branch", "_load_lock", "_loaded_lumps", "_loading_errors", *self.headers}
+        state = {k: v for k, v in self.__dict__.items() if k not in skip and not isinstance(v, MethodType)}
+        state["branch"] = self.branch.__name__  # modules can't be pickled
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self.branch = importlib.import_module(state["branch"])
+        self._load_lock = threading.RLock()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
+        for method_name, method in getattr(self.branch, "methods", dict()).items():
+            setattr(self, method_name, MethodType(method, self))
+
     def __getattr__(self, attr):
         """initialises lumps when created"""
         # NOTE: __getattr__ is only called if the attribute doesn't exist, so we load the lump when the user asks for it
         # -- this has the added benefit that `del bsp.external.LUMP_NAME` unloads it from memory, while allowing reloads
-        # TODO: we could use the same deferred loading approach for all bsps for a performance boost
-        # -- this would remove the simple check of `assert len(bsp.loading_errors) == 0` to ensure read quality, however
-        # -- though if loading errors was a @property it could load all SpecialLumpClasses & the GameLump to verify
-        # -- all other lumps can be verified by length alone, though checking for invalid floats would be a neat feature
-        if attr not in self.headers:
+        # NOTE: base.Bsp uses the same deferred loading approach for internal lumps
+        # -- the loading_errors @property loads all lumps to verify read quality
+        # -- checking for invalid floats would be a neat feature
+        if attr not in self.__dict__.get("headers", dict()):
             raise AttributeError(f"type object '{self.__class__.__name__}' has no attribute '{attr}'")
-        lump_name = attr
+        with self._load_lock:
+            if attr in self.__dict__:  # another thread loaded it while we waited
+                return self.__dict__[attr]
+            return self._preload_lump(attr)
+
+    def _preload_lump(self, lump_name: str):
         lump_header = self.headers[lump_name]
         # NOTE: lump_header should always be an ExternalLumpHeader
         # -- this is a copy of the internal header + filename & filesize for the external file
@@ -88,36 +123,45 @@ class ExternalLumpManager:
         try:
             if lump_name == "GAME_LUMP":  # NOTE: lump_header.version is ignored in this case
                 GameLumpClasses = getattr(self.branch, "GAME_LUMP_CLASSES", dict())
-                lump_file = open(lump_header.filename, "rb")
+                lump_file = lumps.open_stream(lump_header.filename, self.memory_mapped)
                 ExternalBspLump = lumps.GameLump(lump_file, lump_header, self.endianness,
-                                                 GameLumpClasses, self.branch.GAME_LUMP_HEADER)
+                                                 GameLumpClasses, self.branch.GAME_LUMP_HEADER, self.lump_cache)
             elif lump_name in self.branch.LUMP_CLASSES:
                 LumpClass = self.branch.LUMP_CLASSES[lump_name][lump_header.version]
-                ExternalBspLump = lumps.ExternalBspLump.from_header(lump_header, LumpClass)
+                ExternalBspLump = lumps.ExternalBspLump.from_header(lump_header, LumpClass, self.memory_mapped)
             elif lump_name in self.branch.BASIC_LUMP_CLASSES:
                 LumpClass = self.branch.BASIC_LUMP_CLASSES[lump_name][lump_header.version]
-                ExternalBspLump = lumps.ExternalBasicBspLump.from_header(lump_header, LumpClass)
+                ExternalBspLump = lumps.ExternalBasicBspLump.from_header(lump_header, LumpClass, self.memory_mapped)
             elif lump_name in self.branch.SPECIAL_LUMP_CLASSES:
                 SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[lump_name][lump_header.version]
                 with open(lump_header.filename, "rb") as bsp_lump_file:
-                    ExternalBspLump = SpecialLumpClass.from_bytes(bsp_lump_file.read())
+                    ExternalBspLump = self.decode(SpecialLumpClass, bsp_lump_file.read())
             else:
-                ExternalBspLump = lumps.ExternalRawBspLump.from_header(lump_header)
+                ExternalBspLump = lumps.ExternalRawBspLump.from_header(lump_header, self.memory_mapped)
         except KeyError:  # lump version not supported
-            ExternalBspLump = lumps.ExternalRawBspLump.from_header(lump_header)
+            ExternalBspLump = lumps.ExternalRawBspLump.from_header(lump_header, self.memory_mapped)
         except Exception as exc:
-            self.loading_errors[lump_name] = exc
-            ExternalBspLump = lumps.from_header.ExternalRawBspLump(lump_header)
+            self._loading_errors[lump_name] = exc
+            ExternalBspLump = lumps.ExternalRawBspLump.from_header(lump_header, self.memory_mapped)
         setattr(self, lump_name, ExternalBspLump)
+        self._loaded_lumps[lump_name] = base.loaded_ref(ExternalBspLump)
         return getattr(self, lump_name)  # uses __getattribute__
 
+    @property
+    def loading_errors(self) -> Dict[str, Exception]:
+        """loads every external lump to check for errors"""
+        for lump_name, lump_header in self.headers.items():
+            if lump_header.filesize != 0:
+                getattr(self, lump_name)
+        return self._loading_errors
+
     # NOTE: hasattr / dir won't list available external lumps, but self.headers will (if filtered)
     # -- available_external_lumps = [L for L, h in bsp.external.headers.items() if h.length != 0]
     # -- alternatively, filter by `os.path.exists(bsp.external.headers["LUMP_NAME"].filename)`
 
     def lump_as_bytes(self, lump_name: str) -> bytes:
         """based on base.Bsp.lump_as_bytes()"""
-        if lump_name in self.loading_errors:  # failed to parse
+        if lump_name in self._loading_errors:  # failed to parse
             assert isinstance(getattr(self, lump_name), lumps.ExternalRawBspLump)
             return bytes(getattr(self, lump_name))
         # NOTE: lump_as_bytes wont mess with "edit detection"
@@ -125,6 +169,8 @@ class ExternalLumpManager:
             with open(self.headers[lump_name].filename, "rb") as bsp_lump_file:
                 return bsp_lump_file.read()
         lump_entries = getattr(self, lump_name)
+        if hasattr(lump_entries, "dtype"):  # numpy.ndarray (see BspLump.as_numpy)
+            return lump_entries.tobytes()
         # NOTE: we assume the contents of lumps match what the header & branch say they should be
         lump_version = self.headers[lump_name].version
         all_lump_classes = {**self.branch.BASIC_LUMP_CLASSES,
@@ -149,17 +195,62 @@ class ExternalLumpManager:
             raw_lump = bytes(lump_entries)
         return raw_lump
 
-    def save_lump(self, bsp_filename: str, lump_name: str):
-        if lump_name not in self.external.headers:
+    def is_dirty(self, lump_name: str) -> bool:
+        """based on base.Bsp.is_dirty()"""
+        if lump_name not in self.__dict__:
+            return False
+        lump = self.__dict__[lump_name]
+        if lump is not self._loaded_lumps.get(lump_name, lambda: None)():  # replaced
+            return True
+        if not isinstance(lump, lumps.RawBspLump):  # SpecialLumpClasses could have been mutated in-place
+            return True
+        if len(lump) * lump._entry_size != self.headers[lump_name].filesize:
+            return True
+        return lump.is_dirty()
+
+    def lump_hash(self, lump_name: str) -> str:
+        """based on base.Bsp.lump_hash(); clean lumps are hashed straight from their .bsp_lump file"""
+        hasher = hashlib.blake2b(digest_size=16)
+        if self.is_dirty(lump_name):
+            hasher.update(self.lump_as_bytes(lump_name))
+            return hasher.hexdigest()
+        lump_hashes = self.__dict__.setdefault("_lump_hashes", dict())
+        if lump_name not in lump_hashes:
+            lump_header = self.headers[lump_name]
+            with open(lump_header.filename, "rb") as bsp_lump_file:
+                lumps.hash_range(bsp_lump_file, 0, lump_header.filesize, hasher)
+            lump_hashes[lump_name] = hasher.hexdigest()
+        return lump_hashes[lump_name]
+
+    decode = base.Bsp.decode
+    lump_hashes = base.Bsp.lump_hashes
+
+    def save_lump(self, bsp_filename: str, lump_name: str, lump_offset: int = None) -> int:
+        """write the named lump to a .bsp_lump alongside bsp_filename; returns bytes written
+        lump_offset is the internal GAME_LUMP offset (GAME_LUMP headers hold offsets)"""
+        if lump_name not in self.headers:
             raise AttributeError(f"no {lump_name} lump to save!")
+        lump_header = self.headers[lump_name]
+        if lump_offset is None:
+            lump_offset = lump_header.offset
         LUMP = getattr(self.branch.LUMP, lump_name)
         external_lump_filename = f"{bsp_filename}.{LUMP.value:04x}.bsp_lump"
-        if not hasattr(self.external, LUMP.name):  # no edits
-            shutil.copyfile(self.external.headers[LUMP.name].filename, external_lump_filename)
-        else:
-            raw_lump = self.lump_as_bytes(lump_name)
-            with open(external_lump_filename, "w") as bsp_lump_file:
-                bsp_lump_file.write(raw_lump)
+        with open(external_lump_filename, "wb") as bsp_lump_file:
+            in_place = lump_name != "GAME_LUMP" or lump_header.offset == lump_offset
+            if not self.is_dirty(lump_name) and in_place:  # no edits
+                with open(lump_header.filename, "rb") as in_file:
+                    return lumps.copy_bytes(in_file, 0, lump_header.filesize, bsp_lump_file)
+            lump = getattr(self, lump_name)
+            if isinstance(lump, lumps.RawBspLump):  # encoded in chunks
+                chunks = lump.iter_bytes()
+            elif lump_name == "GAME_LUMP" and hasattr(lump, "headers"):
+                chunks = [lump.as_bytes(lump_offset)]
+            else:
+                chunks = [self.lump_as_bytes(lump_name)]
+            length = 0
+            for chunk in chunks:
+                length += bsp_lump_file.write(chunk)
+            return length
 
 
 class RespawnBsp(valve.ValveBsp):
@@ -176,18 +267,76 @@ class RespawnBsp(valve.ValveBsp):
     # struct BspHeader { char file_magic[4]; int version, revision, lump_count;
     #                    LumpHeader headers[128]; };
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True,
+                 memory_map: bool = False, lump_cache: Any = None):
         self.entity_headers = dict()
-        super(RespawnBsp, self).__init__(branch, filename, autoload)
+        super(RespawnBsp, self).__init__(branch, filename, autoload, memory_map, lump_cache)
         # NOTE: bsp revision appears before headers, not after (as in Valve's variant)
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        # collect files
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(self.filename.partition(".")[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._preload_headers()
+        self.external = ExternalLumpManager(self)
+
+        # .ent files; only the first line is read, entities are loaded on first access by __getattr__
+        # TODO: give a warning if available .ent files do not match ENTITY_PARTITIONS
+        # NOTE: ENTITY_PARTITIONS contains "01*" as the first entry, does this mean the entity lump?
+        self.entity_headers = dict()
+        for ent_filetype in ("env", "fx", "script", "snd", "spawn"):
+            LUMP_name = f"ENTITIES_{ent_filetype}"
+            if os.path.basename(self.entity_filename(LUMP_name)) in self.associated_files:
+                with open(self.entity_filename(LUMP_name), "rb") as ent_file:
+                    self.entity_headers[LUMP_name] = ent_file.readline().decode().rstrip("\n")
+                    # Titanfall:  ENTITIES01
+                    # Apex Legends:  ENTITIES02 num_models=0
+
+    def _lump_streams(self) -> List[lumps.Stream]:
+        """streams read by loaded lumps, including .bsp_lump files"""
+        streams = super()._lump_streams()
+        external = self.__dict__.get("external", None)
+        if external is not None:
+            loaded = [external.__dict__.get(lump_name, None) for lump_name in external.headers]
+            streams.extend(lump.stream for lump in loaded if getattr(lump, "stream", None) is not None)
+        return streams
+
+    def __getattr__(self, attr: str) -> Any:
+        """loads .ent files & lumps when they are first accessed"""
+        entity_headers = self.__dict__.get("entity_headers", dict())  # __init__ might not have set headers yet
+        if attr in entity_headers and attr not in self.__dict__.get("_deleted_lumps", ()):
+            with self._load_lock:
+                if attr not in self.__dict__:  # another thread could have loaded it while we waited
+                    self._preload_entities(attr)
+                return self.__dict__[attr]
+        return super(RespawnBsp, self).__getattr__(attr)
+
+    def __delattr__(self, attr: str):
+        """`del bsp.ENTITIES_env` deletes the .ent file's lump; save_as won't write it"""
+        if attr in self.__dict__.get("entity_headers", dict()):
+            self._delete_lump(attr)
+        else:
+            super(RespawnBsp, self).__delattr__(attr)
+
+    def entity_filename(self, LUMP_name: str) -> str:
+        """path to the .ent file for the named entities lump; e.g. ENTITIES_env -> maps/mp_glitch_env.ent"""
+        ent_filetype = LUMP_name[len("ENTITIES_"):]
+        return os.path.join(self.folder, f"{self.filename.partition('.')[0]}_{ent_filetype}.ent")
+
+    def _preload_entities(self, LUMP_name: str):
+        with open(self.entity_filename(LUMP_name), "rb") as ent_file:
+            ent_file.readline()  # see entity_headers
+            entities = self.decode(shared.Entities, ent_file.read())
+            # each .ent file also has a null byte at the very end
+        setattr(self, LUMP_name, entities)
+        self._loaded_lumps[LUMP_name] = base.loaded_ref(entities)
+
+    def _unload_lumps(self):
+        super(RespawnBsp, self)._unload_lumps()
+        for LUMP_name in self.entity_headers:
+            self.__dict__.pop(LUMP_name, None)
+
+    def _preload_headers(self):
+        """.bsp metadata & headers only; doesn't look for .bsp_lump or .ent files"""
+        self.file = self._open_file()
         # collect metadata
         file_magic = self.file.read(4)
         if file_magic == self.file_magic:
@@ -208,113 +357,85 @@ class RespawnBsp(valve.ValveBsp):
         assert self.lump_count == 127, "irregular RespawnBsp lump_count"
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect lumps
-        self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
-        for lump_name, lump_header in self._header_generator(offset=16):
-            if lump_header.offset >= self.bsp_file_size:
-                continue  # or version has flag (e.g. (50, 1))
-            self._preload_lump(lump_name, lump_header)
+        # collect headers (lumps are loaded on first access)
+        self.headers = dict(self._header_generator(offset=16))
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         # compiler signature
         self._get_signature(16 + (16 * 128))
 
-        self.external = ExternalLumpManager(self)
+    def lump_hash(self, lump_name: str) -> str:
+        """.bsp_lump files override lumps in the .bsp, so those are hashed instead (unless the lump was edited)"""
+        external = getattr(self, "external", None)  # not collected by bsp_tool.probe
+        if external is not None and lump_name in external.headers and not self.is_dirty(lump_name):
+            return external.lump_hash(lump_name)
+        return super(RespawnBsp, self).lump_hash(lump_name)
 
-        # .ent files
-        # TODO: give a warning if available .ent files do not match ENTITY_PARTITIONS
-        # NOTE: ENTITY_PARTITIONS contains "01*" as the first entry, does this mean the entity lump?
-        for ent_filetype in ("env", "fx", "script", "snd", "spawn"):
-            entity_file = f"{self.filename.partition('.')[0]}_{ent_filetype}.ent"  # e.g. "mp_glitch_env.ent"
-            if entity_file in self.associated_files:
-                with open(os.path.join(self.folder, entity_file), "rb") as ent_file:
-                    LUMP_name = f"ENTITIES_{ent_filetype}"
-                    self.entity_headers[LUMP_name] = ent_file.readline().decode().rstrip("\n")
-                    # Titanfall:  ENTITIES01
-                    # Apex Legends:  ENTITIES02 num_models=0
-                    setattr(self, LUMP_name, shared.Entities.from_bytes(ent_file.read()))
-                    # each .ent file also has a null byte at the very end
+    def _preload_lump(self, lump_name: str, lump_header: lumps.LumpHeader):
+        if lump_header.offset >= self.bsp_file_size:
+            return  # or version has flag (e.g. (50, 1))
+        super(RespawnBsp, self)._preload_lump(lump_name, lump_header)
 
     def save_as(self, filename: str, no_bsp_lump: bool = False):
-        # lumps -> bytes
+        """lumps are streamed to the new file(s) one at a time, headers are written last"""
         lump_order = sorted([L for L in self.branch.LUMP],
                             key=lambda L: (self.headers[L.name].offset, self.headers[L.name].length))
         # ^ ["LUMP.name"]
-        raw_lumps: Dict[str, bytes] = dict()
-        # ^ {"LUMP.name": b"raw lump data"}
-        for LUMP in self.branch.LUMP:
-            if LUMP.name == "GAME_LUMP":
-                continue  # need header.offset before generating
-            try:
-                lump_bytes = self.lump_as_bytes(LUMP.name)
-            except Exception as exc:
-                print(f"Failed to convert {LUMP.name} to bytes")
-                raise exc
-            if lump_bytes != b"":  # don't write empty lumps
-                raw_lumps[LUMP.name] = lump_bytes
-        # recalculate headers
-        current_offset = 16 + (16 * 128)
         if len(self.signature) % 4 != 0:  # pad signature
             self.signature += b"\0" * (4 - len(self.signature) % 4)
-        current_offset += len(self.signature)
-        headers = dict()
-        for LUMP in lump_order:
-            if LUMP.name == "GAME_LUMP" and hasattr(self, "GAME_LUMP"):  # generate
-                raw_lumps["GAME_LUMP"] = self.GAME_LUMP.as_bytes(current_offset)
-            if LUMP.name not in raw_lumps:  # lump is empty
-                version = self.headers[LUMP.name].version  # preserve PHYSICS_LEVEL version
-                header = self.branch.LumpHeader(current_offset, 0, version, 0)
-            else:  # lump has data
+        external = getattr(self, "external", None)
+        has_internal_lumps = not isinstance(self.bsp_version, tuple)  # Apex Legends Season 11+ only uses .bsp_lump
+        os.makedirs(os.path.dirname(os.path.realpath(filename)), exist_ok=True)
+        with open(filename, "wb") as outfile:
+            outfile.write(b"\0" * (16 + (16 * 128)))  # filled in once all lumps are written
+            outfile.write(self.signature)
+            current_offset = outfile.tell()
+            headers = dict()
+            for LUMP in lump_order:
                 offset = current_offset
-                length = len(raw_lumps[LUMP.name])
-                version = self.headers[LUMP.name].version
+                length = 0
+                try:
+                    if has_internal_lumps:  # write INTERNAL .bsp lump
+                        length = self.write_lump(LUMP.name, outfile)
+                    # write EXTERNAL .bsp_lump
+                    if not no_bsp_lump and external is not None and LUMP.name in external.headers:
+                        external_length = external.save_lump(filename, LUMP.name, offset)
+                        if not has_internal_lumps:
+                            length = external_length
+                except Exception as exc:
+                    print(f"Failed to write {LUMP.name}")
+                    raise exc
+                version = self.headers[LUMP.name].version  # preserve PHYSICS_LEVEL version
                 fourCC = 0  # fourCC is always 0 (no LZMA lump compression)
-                header = self.branch.LumpHeader(offset, length, version, fourCC)
+                headers[LUMP.name] = self.branch.LumpHeader(offset, length, version, fourCC)
                 current_offset += length
                 if current_offset % 4 != 0:  # pad
                     current_offset += 4 - current_offset % 4
-            headers[LUMP.name] = header
-        del current_offset
-        # write to file(s)
-        os.makedirs(os.path.dirname(os.path.realpath(filename)), exist_ok=True)
-        # TODO: close self.file if overwriting
-        outfile = open(filename, "wb")
-        bsp_version = self.bsp_version
-        if isinstance(self.bsp_version, tuple):  # Apex Legends Season 10+
-            bsp_version = bsp_version[0] + bsp_version[1] << 16
-        _format = "4s3I" if self.endianness == "little" else ">4s3I"
-        outfile.write(struct.pack(_format, self.file_magic, bsp_version, self.revision, 127))
-        for LUMP in self.branch.LUMP:
-            outfile.write(headers[LUMP.name].as_bytes())
-        outfile.write(self.signature)
-        # copy GameLump offset to external header
-        old_eglh = self.external.headers["GAME_LUMP"]
-        self.external.headers["GAME_LUMP"] = ExternalLumpHeader(headers["GAME_LUMP"].offset, *old_eglh[1:])
-        # write lump contents (cannot be done until headers allocate padding)
-        for LUMP in [L for L in lump_order if L.name in raw_lumps]:
-            # write INTERNAL .bsp lump
-            if not isinstance(self.bsp_version, tuple):  # pre Apex Season 10+
-                padding_length = headers[LUMP.name].offset - outfile.tell()
-                if padding_length > 0:  # pad previous lump
-                    outfile.write(b"\0" * padding_length)
-                outfile.write(raw_lumps[LUMP.name])
-            # write EXTERNAL .bsp_lump
-            if not no_bsp_lump and LUMP.name in self.external.headers:
-                self.external.save_lump(filename, LUMP.name)
-        # final padding
-        end = outfile.tell()
-        padding_length = 0
-        if end % 4 != 0:
-            padding_length = 4 - end % 4
-        outfile.write(b"\0" * padding_length)
-        outfile.close()  # main .bsp is written
+                if has_internal_lumps and outfile.tell() != current_offset:
+                    outfile.write(b"\0" * (current_offset - outfile.tell()))
+            # write headers
+            outfile.seek(0)
+            bsp_version = self.bsp_version
+            if isinstance(self.bsp_version, tuple):  # Apex Legends Season 10+
+                bsp_version = bsp_version[0] + (bsp_version[1] << 16)
+            _format = "4s3I" if self.endianness == "little" else ">4s3I"
+            outfile.write(struct.pack(_format, self.file_magic, bsp_version, self.revision, 127))
+            for LUMP in self.branch.LUMP:
+                outfile.write(headers[LUMP.name].as_bytes())
+        # main .bsp is written
         # write .ent lumps
         # NOTE: the ENTITY_PARTITIONS lump should list all used .ent lumps
         for ent_variant in ("env", "fx", "script", "snd", "spawn"):
-            if not hasattr(self, f"ENTITIES_{ent_variant}"):
-                continue
+            ent_LUMP_name = f"ENTITIES_{ent_variant}"
             ent_filename = f"{os.path.splitext(filename)[0]}_{ent_variant}.ent"
+            if ent_LUMP_name not in self.__dict__:
+                if ent_LUMP_name in self.entity_headers and ent_LUMP_name not in self._deleted_lumps:
+                    # never loaded, copy the original
+                    original = self.entity_filename(ent_LUMP_name)
+                    if os.path.realpath(ent_filename) != os.path.realpath(original):
+                        shutil.copyfile(original, ent_filename)
+                continue
             with open(ent_filename, "wb") as ent_file:
-                ent_LUMP_name = f"ENTITIES_{ent_variant}"
                 header = self.entity_headers.get(ent_LUMP_name, "ENTITIES01").encode("ascii")
                 # NOTE: the default .ent header will only work for titanfall & titanfall2
                 # -- apex_legends(13) requires a model count: f"ENTITIES02 {num_models=}"
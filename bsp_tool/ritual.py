@@ -1,6 +1,3 @@
-import os
-from typing import Dict
-
 from . import id_software
 
 
@@ -12,11 +9,7 @@ class RitualBsp(id_software.IdTechBsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        # collect files
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.file = self._open_file()
         # collect metadata
         self.file_magic = self.file.read(4)
         assert self.file_magic in self._file_magics, f"{self.file} is not a valid .bsp!"
@@ -25,8 +18,7 @@ class RitualBsp(id_software.IdTechBsp):
         self.checksum = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect headers
-        self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
-        for lump_name, lump_header in self._header_generator(offset=12):
-            self._preload_lump(lump_name, lump_header)
+        # collect headers (lumps are loaded on first access)
+        self.headers = dict(self._header_generator(offset=12))
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
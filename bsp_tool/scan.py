@@ -0,0 +1,143 @@
+"""Load every .bsp in a folder (or archive) in parallel, with a callback for each map"""
+from collections import namedtuple
+from concurrent import futures
+import fnmatch
+import importlib
+import os
+import tempfile
+import time
+import traceback
+from types import ModuleType
+from typing import Any, Callable, Generator, Iterable, List, Union
+
+from . import load_bsp
+from .lump_cache import LumpCache
+
+
+ScanJob = namedtuple("ScanJob", ["filename", "archive_class", "archive"])
+# ^ a .bsp on disk, or a file inside an archive (archive_class & archive are None for files on disk)
+ScanResult = namedtuple("ScanResult", ["filename", "archive", "BspClass", "branch", "bsp_version",
+                                       "duration", "loading_errors", "result", "error", "traceback"])
+# ^ outcome of loading a single .bsp
+# -- duration is in seconds & includes the callback
+# -- result is whatever the callback returned
+# -- error is repr() of the exception raised by load_bsp or the callback; traceback is it's formatted traceback
+# NOTE: exceptions are sent as text, since they aren't always picklable
+# -- loading_errors is {"LUMP_NAME": repr(exception)} for the same reason
+
+bsp_patterns = ("*.[bB][sS][pP]", "*.d3dbsp")
+
+
+def find_bsps(path: str, patterns: Iterable[str] = bsp_patterns, recursive: bool = True) -> Generator[str, None, None]:
+    """yields the filename of each .bsp under path"""
+    for folder, sub_folders, filenames in os.walk(path):
+        sub_folders.sort()  # walk in a predictable order
+        for filename in sorted(filenames):
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+                yield os.path.join(folder, filename)
+        if not recursive:
+            break
+
+
+def find_archived_bsps(path: str, archive_classes: Iterable[type], patterns: Iterable[str] = bsp_patterns,
+                       recursive: bool = True) -> Generator[ScanJob, None, None]:
+    """yields a ScanJob for each .bsp inside each archive under path"""
+    for folder, sub_folders, filenames in os.walk(path):
+        sub_folders.sort()
+        for archive_class in archive_classes:
+            for archive_filename in fnmatch.filter(sorted(filenames), archive_class.ext):
+                archive_filename = os.path.join(folder, archive_filename)
+                archive = archive_class(archive_filename)
+                for pattern in patterns:
+                    for filename in archive.search(pattern):
+                        yield ScanJob(filename, archive_class, archive_filename)
+        if not recursive:
+            break
+
+
+def scan_bsp(job: ScanJob, callback: Callable[[Any], Any] = None, branch_name: str = None,
+             memory_map: bool = False, lump_cache: LumpCache = None) -> ScanResult:
+    """load a single .bsp & run callback on it; never raises"""
+    branch_script = None if branch_name is None else importlib.import_module(branch_name)
+    start = time.perf_counter()
+    if job.archive_class is None:
+        return _scan_bsp(job, job.filename, start, callback, branch_script, memory_map, lump_cache)
+    with tempfile.TemporaryDirectory() as temp_folder:
+        try:
+            archive = job.archive_class(job.archive)
+            # NOTE: also extracts associated files (e.g. .bsp_lump & .ent)
+            for filename in archive.search(f"{job.filename}*"):
+                archive.extract(filename, temp_folder)
+        except Exception as exc:
+            return ScanResult(job.filename, job.archive, None, None, None,
+                              time.perf_counter() - start, dict(), None, repr(exc), traceback.format_exc())
+        path = os.path.join(temp_folder, job.filename)
+        return _scan_bsp(job, path, start, callback, branch_script, memory_map, lump_cache)
+
+
+def _scan_bsp(job: ScanJob, path: str, start: float, callback, branch_script, memory_map, lump_cache) -> ScanResult:
+    bsp, loading_errors, result, error, error_traceback = None, dict(), None, None, None
+    try:
+        bsp = load_bsp(path, branch_script, memory_map=memory_map, lump_cache=lump_cache)
+        loading_errors = {lump_name: repr(exc) for lump_name, exc in bsp.loading_errors.items()}  # loads every lump
+        if callback is not None:
+            result = callback(bsp)
+    except Exception as exc:
+        error, error_traceback = repr(exc), traceback.format_exc()
+    finally:
+        if bsp is not None:
+            bsp.close()
+    duration = time.perf_counter() - start
+    if bsp is None:
+        return ScanResult(job.filename, job.archive, None, None, None, duration, loading_errors, result, error,
+                          error_traceback)
+    # NOTE: modules cannot be pickled, so branch scripts are returned by name
+    return ScanResult(job.filename, job.archive, bsp.__class__, bsp.branch.__name__, bsp.bsp_version,
+                      duration, loading_errors, result, error, error_traceback)
+
+
+def scan(paths: Union[str, List[str]], callback: Callable[[Any], Any] = None, branch_script: ModuleType = None,
+         archive_classes: Iterable[type] = (), patterns: Iterable[str] = bsp_patterns, recursive: bool = True,
+         max_workers: int = None, memory_map: bool = False,
+         lump_cache: LumpCache = None) -> Generator[ScanResult, None, None]:
+    """load every .bsp under paths across a pool of processes, yielding a ScanResult as each map finishes
+    callback(bsp) is run in the worker process; both callback & it's return value must be picklable
+    archive_classes (from bsp_tool.extensions.archives) are searched for .bsps & extracted to a temp folder
+    max_workers=1 runs everything in this process (handy for debugging)
+    lump_cache is shared by all workers, so re-scanning unchanged maps skips decoding SpecialLumpClasses"""
+    if isinstance(paths, str):
+        paths = [paths]
+    archive_classes = tuple(archive_classes)
+    branch_name = None if branch_script is None else branch_script.__name__
+
+    def jobs() -> Generator[ScanJob, None, None]:
+        for path in paths:
+            if os.path.isfile(path):
+                yield ScanJob(path, None, None)
+                continue
+            yield from (ScanJob(f, None, None) for f in find_bsps(path, patterns, recursive))
+            if len(archive_classes) > 0:
+                yield from find_archived_bsps(path, archive_classes, patterns, recursive)
+
+    def resolved(result: ScanResult) -> ScanResult:
+        if result.branch is None:
+            return result
+        return result._replace(branch=importlib.import_module(result.branch))
+
+    if max_workers == 1:
+        for job in jobs():
+            yield resolved(scan_bsp(job, callback, branch_name, memory_map, lump_cache))
+        return
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    with futures.ProcessPoolExecutor(max_workers) as executor:
+        # NOTE: jobs are submitted lazily, so results stream back while folders are still being walked
+        max_pending = max_workers * 4
+        pending = set()
+        for job in jobs():
+            pending.add(executor.submit(scan_bsp, job, callback, branch_name, memory_map, lump_cache))
+            if len(pending) >= max_pending:
+                done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                yield from (resolved(future.result()) for future in done)
+        for future in futures.as_completed(pending):
+            yield resolved(future.result())
@@ -0,0 +1,134 @@
+"""Publish decoded lumps to shared memory, so worker processes can read them w/o decoding their own copy"""
+from __future__ import annotations
+from collections import namedtuple
+from multiprocessing import shared_memory
+import sys
+from typing import Any, Dict, Iterable
+
+from . import lumps
+
+
+SharedLump = namedtuple("SharedLump", ["block", "dtype", "length"])
+# ^ where to find a published lump
+# -- block is the name of the multiprocessing.shared_memory.SharedMemory holding the lump
+# -- dtype is a (structured) numpy.dtype, see branches.base.numpy_dtype
+
+default_lumps = ("VERTICES", "MESH_INDICES", "PLANES", "NODES")
+
+
+def publish(bsp: Any, lump_names: Iterable[str] = default_lumps) -> SharedLumps:
+    """copy each named lump in bsp (w/ any edits) into a new shared memory block
+    lumps bsp doesn't have are skipped; lump_names can also include RawBspLumps (published as uint8 arrays)
+    the returned SharedLumps owns the blocks, call .unlink() (or use it as a context manager) when done"""
+    import numpy  # optional dependency; pip install numpy
+    out = SharedLumps(dict())
+    try:
+        for lump_name in lump_names:
+            if not hasattr(bsp, lump_name):
+                continue
+            lump = getattr(bsp, lump_name)
+            if isinstance(lump, (lumps.BasicBspLump, lumps.BspLump)):
+                array = lump.as_numpy()
+            elif isinstance(lump, lumps.RawBspLump):
+                array = numpy.frombuffer(lump.as_memoryview(), numpy.uint8)
+            else:
+                raise TypeError(f"cannot publish {lump_name} ({type(lump).__name__}); only lumps w/ a fixed size work")
+            # NOTE: SharedMemory cannot be 0 bytes long
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            out._blocks[lump_name] = block
+            # NOTE: LumpClasses w/ a subarray dtype (e.g. quake.Edge) become 2D arrays; dtype restores the shape
+            dtype = array.dtype if array.ndim == 1 else numpy.dtype((array.dtype, array.shape[1:]))
+            out.manifest[lump_name] = SharedLump(block.name, dtype, len(array))
+            shared = numpy.ndarray(array.shape, array.dtype, buffer=block.buf)
+            shared[:] = array
+            del shared  # release block.buf
+    except Exception:
+        out.unlink()
+        raise
+    return out
+
+
+class SharedLumps:
+    """lumps published to shared memory; pickle & send to worker processes, then read lumps w/ [lump_name]
+    arrays are read-only & are only valid until .close() / .unlink()"""
+    manifest: Dict[str, SharedLump]
+    # ^ {"LUMP_NAME": SharedLump}; the only thing which is pickled
+    _arrays: Dict[str, Any]  # {"LUMP_NAME": numpy.ndarray}
+    _blocks: Dict[str, shared_memory.SharedMemory]  # blocks opened by this process
+    _owner: bool  # True in the process which called publish
+
+    def __init__(self, manifest: Dict[str, SharedLump]):
+        self.manifest = manifest
+        self._arrays = dict()
+        self._blocks = dict()
+        self._owner = True
+
+    def __repr__(self) -> str:
+        sizes = [f"{n} ({s.length})" for n, s in self.manifest.items()]
+        return f"<{self.__class__.__name__} {', '.join(sizes)} at 0x{id(self):016X}>"
+
+    def __getstate__(self) -> Dict[str, SharedLump]:
+        return self.manifest
+
+    def __setstate__(self, manifest: Dict[str, SharedLump]):
+        self.__init__(manifest)
+        self._owner = False
+
+    def __contains__(self, lump_name: str) -> bool:
+        return lump_name in self.manifest
+
+    def __iter__(self):
+        return iter(self.manifest)
+
+    def __len__(self) -> int:
+        return len(self.manifest)
+
+    def __getitem__(self, lump_name: str) -> Any:  # numpy.ndarray
+        """read-only numpy array of the published lump; attaches to the shared memory block on first use"""
+        if lump_name not in self._arrays:
+            import numpy  # optional dependency; pip install numpy
+            shared_lump = self.manifest[lump_name]
+            if lump_name not in self._blocks:
+                self._blocks[lump_name] = attach_block(shared_lump.block)
+            block = self._blocks[lump_name]
+            array = numpy.ndarray((shared_lump.length,), shared_lump.dtype, buffer=block.buf)
+            array.flags.writeable = False
+            self._arrays[lump_name] = array
+        return self._arrays[lump_name]
+
+    def __enter__(self) -> SharedLumps:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
+    def close(self):
+        """detach from all shared memory blocks; raises BufferError if arrays from [lump_name] are still in use"""
+        self._arrays.clear()
+        for block in self._blocks.values():
+            block.close()
+        self._blocks.clear()
+
+    def unlink(self):
+        """close & free all shared memory blocks; should only be called once, by the process which published"""
+        blocks = dict(self._blocks)
+        self.close()
+        for lump_name, shared_lump in self.manifest.items():
+            block = blocks.get(lump_name, None) or attach_block(shared_lump.block)
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:  # already unlinked
+                pass
+
+
+def attach_block(name: str) -> shared_memory.SharedMemory:
+    """open an existing SharedMemory block"""
+    # NOTE: before Python 3.13, attaching registers the block w/ the resource_tracker on POSIX
+    # -- workers started by multiprocessing share their parent's tracker, so this is harmless
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
@@ -264,7 +264,8 @@ def renamed_vec2(renamed_x: str, renamed_y: str) -> vec2:
                     f"    {renamed_x} = property(lambda s: s.x, __set_x)",
                     "    def __set_y(s, y): s.y = y",
                     f"    {renamed_y} = property(lambda s: s.y, __set_y)"]))
-    return locals()[f"vec2_{renamed_x}_{renamed_y}"]
+    # NOTE: kept in globals() so pickle can find it by name
+    return globals().setdefault(f"vec2_{renamed_x}_{renamed_y}", locals()[f"vec2_{renamed_x}_{renamed_y}"])
 
 
 # TODO: ivec2, ivec3, QAngle
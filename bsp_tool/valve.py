@@ -1,7 +1,7 @@
 import os
 import struct
 from types import ModuleType
-from typing import Any, Dict
+from typing import Any
 
 from . import base
 from . import id_software
@@ -20,8 +20,13 @@ class ValveBsp(base.Bsp):
     revision: int = 0
     # struct SourceBspHeader { char file_magic[4]; int version; LumpHeader headers[64]; int revision; };
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
-        super(ValveBsp, self).__init__(branch, filename, autoload)
+    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True,
+                 memory_map: bool = False, lump_cache: Any = None):
+        super(ValveBsp, self).__init__(branch, filename, autoload, memory_map, lump_cache)
+
+    def _associated_prefix(self) -> str:
+        """everything before the first "." (e.g. "shack" for "shack.360.bsp" & "mp_box.bsp.0000.bsp_lump")"""
+        return self.filename.partition(".")[0]
 
     def _preload_lump(self, lump_name: str, lump_header: Any):
         if lump_header.length == 0:
@@ -34,16 +39,15 @@ class ValveBsp(base.Bsp):
                 if self.branch.__name__.split(".")[-1] == "dark_messiah_sp":
                     GameLump = lumps.DarkMessiahSPGameLump
                 BspLump = GameLump(self.file, lump_header, self.endianness,
-                                   GameLumpClasses, self.branch.GAME_LUMP_HEADER)
+                                   GameLumpClasses, self.branch.GAME_LUMP_HEADER, self.lump_cache)
             elif lump_name in self.branch.LUMP_CLASSES:
                 LumpClass = self.branch.LUMP_CLASSES[lump_name][lump_header.version]
                 BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
             elif lump_name in self.branch.SPECIAL_LUMP_CLASSES:
                 SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[lump_name][lump_header.version]
                 decompressed_file, decompressed_header = lumps.decompressed(self.file, lump_header)
-                decompressed_file.seek(decompressed_header.offset)
-                lump_data = decompressed_file.read(decompressed_header.length)
-                BspLump = SpecialLumpClass.from_bytes(lump_data)
+                lump_data = lumps.read_at(decompressed_file, decompressed_header.offset, decompressed_header.length)
+                BspLump = self.decode(SpecialLumpClass, lump_data)
             elif lump_name in self.branch.BASIC_LUMP_CLASSES:
                 LumpClass = self.branch.BASIC_LUMP_CLASSES[lump_name][lump_header.version]
                 BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
@@ -52,17 +56,13 @@ class ValveBsp(base.Bsp):
         except KeyError:  # lump VERSION not supported
             BspLump = lumps.create_RawBspLump(self.file, lump_header)
         except Exception as exc:
-            self.loading_errors[lump_name] = exc
+            self._loading_errors[lump_name] = exc
             BspLump = lumps.create_RawBspLump(self.file, lump_header)
         setattr(self, lump_name, BspLump)
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        # collect files
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(self.filename.partition(".")[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.file = self._open_file()
         # collect metadata
         file_magic = self.file.read(4)
         if file_magic == self.file_magic:
@@ -80,11 +80,10 @@ class ValveBsp(base.Bsp):
         self.revision = int.from_bytes(self.file.read(4), self.endianness)
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
-        # collect lumps
-        self.headers = dict()
-        self.loading_errors: Dict[str, Exception] = dict()
-        for lump_name, lump_header in self._header_generator(offset=8):
-            self._preload_lump(lump_name, lump_header)
+        # collect headers (lumps are loaded on first access)
+        self.headers = dict(self._header_generator(offset=8))
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
 
     def lump_as_bytes(self, lump_name: str) -> bytes:
         """Converts the named (versioned) lump back into bytes"""
@@ -92,13 +91,15 @@ class ValveBsp(base.Bsp):
         if not hasattr(self, lump_name):
             return b""  # lump is empty / deleted
         lump_entries = getattr(self, lump_name)
+        if hasattr(lump_entries, "dtype"):  # numpy.ndarray (see BspLump.as_numpy)
+            return lump_entries.tobytes()
         lump_version = self.headers[lump_name].version
         all_lump_classes = {**self.branch.BASIC_LUMP_CLASSES,
                             **self.branch.LUMP_CLASSES,
                             **self.branch.SPECIAL_LUMP_CLASSES}
         # RawBspLump -> byte
         if lump_name != "GAME_LUMP":  # NOTE: will fail if GAME_LUMP failed to load
-            if lump_name not in all_lump_classes or lump_name in self.loading_errors:
+            if lump_name not in all_lump_classes or lump_name in self._loading_errors:
                 return bytes(lump_entries)
             elif lump_name in all_lump_classes:
                 if lump_version not in all_lump_classes[lump_name]:
@@ -123,69 +124,39 @@ class ValveBsp(base.Bsp):
         return raw_lump
 
     def save_as(self, filename: str = None):
+        """lumps are streamed to the new file one at a time, headers are written last"""
         lump_order = sorted([L for L in self.branch.LUMP],
                             key=lambda L: (self.headers[L.name].offset, self.headers[L.name].length))
-        # ^ {"lump.name": LumpHeader}
         # NOTE: messes up on empty lumps, so we can't get an exact 1:1 copy /;
-        raw_lumps: Dict[str, bytes] = dict()
-        # ^ {"LUMP.name": b"raw lump data]"}
-        for LUMP in self.branch.LUMP:
-            try:
-                lump_bytes = self.lump_as_bytes(LUMP.name)
-            except Exception as exc:
-                print(f"Failed to convert {LUMP.name} to bytes!")
-                raise exc
-            if lump_bytes != b"":  # don't write empty lumps
-                raw_lumps[LUMP.name] = lump_bytes
-        # recalculate headers
-        current_offset = 0
-        headers = dict()
-        for LUMP in lump_order:
-            # NOTE: fourCC should default to zero, we don't repack
-            if LUMP.name not in raw_lumps:  # lump is not present
-                headers[LUMP.name] = self.branch.LumpHeader(offset=current_offset,
-                                                            length=0,
-                                                            version=self.headers[LUMP.name].version)
-                continue
-            # wierd hack to align unused lump offsets correctly
-            if current_offset == 0:
-                # shift to end of header section
-                # struct SourceBspHeader { char file_magic[4]; int version; LumpHeader headers[64]; int revision; };
-                current_offset = 8 + (struct.calcsize(self.branch.LumpHeader._format) * len(self.branch.LUMP)) + 4
-            length = len(raw_lumps[LUMP.name])
-            headers[LUMP.name] = self.branch.LumpHeader(offset=current_offset,
-                                                        length=length,
-                                                        version=self.headers[LUMP.name].version)
-            current_offset += length
-            if current_offset % 4 != 0:
-                current_offset += 4 - current_offset % 4
-        del current_offset
-        if "GAME_LUMP" in raw_lumps:
-            raw_lumps["GAME_LUMP"] = self.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
-        # make file
         os.makedirs(os.path.dirname(os.path.realpath(filename)), exist_ok=True)
-        outfile = open(filename, "wb")
-        outfile.write(self.file_magic)
-        bsp_version = self.bsp_version
-        if isinstance(self.bsp_version, tuple):
-            bsp_version = bsp_version[0] + bsp_version[1] << 16
-        outfile.write(bsp_version.to_bytes(4, self.endianness))
-        # write headers
-        for LUMP in self.branch.LUMP:
-            outfile.write(headers[LUMP.name].as_bytes())
-        outfile.write(self.revision.to_bytes(4, self.endianness))
-        # write lump contents (cannot be done until headers allocate padding)
-        for LUMP in lump_order:
-            if LUMP.name not in raw_lumps:
-                continue
-            padding_length = headers[LUMP.name].offset - outfile.tell()
-            if padding_length > 0:  # NOTE: padding_length should not exceed 3
-                outfile.write(b"\0" * padding_length)
-            outfile.write(raw_lumps[LUMP.name])
-        # final padding
-        end = outfile.tell()
-        padding_length = 0
-        if end % 4 != 0:
-            padding_length = 4 - end % 4
-        outfile.write(b"\0" * padding_length)
-        outfile.close()  # main .bsp is written
+        with open(filename, "wb") as outfile:
+            # struct SourceBspHeader { char file_magic[4]; int version; LumpHeader headers[64]; int revision; };
+            header_length = 8 + (struct.calcsize(self.branch.LumpHeader._format) * len(self.branch.LUMP)) + 4
+            outfile.write(b"\0" * header_length)  # filled in once all lumps are written
+            headers = dict()
+            # ^ {"LUMP.name": LumpHeader}
+            for LUMP in lump_order:
+                offset = outfile.tell()
+                try:
+                    length = self.write_lump(LUMP.name, outfile)
+                except Exception as exc:
+                    print(f"Failed to write {LUMP.name}!")
+                    raise exc
+                if length == 0 and offset == header_length:  # no lumps written yet
+                    offset = 0  # wierd hack to align unused lump offsets correctly
+                # NOTE: fourCC should default to zero, we don't repack
+                headers[LUMP.name] = self.branch.LumpHeader(offset=offset, length=length,
+                                                            version=self.headers[LUMP.name].version)
+                if outfile.tell() % 4 != 0:  # pad
+                    outfile.write(b"\0" * (4 - outfile.tell() % 4))
+            # write headers
+            outfile.seek(0)
+            outfile.write(self.file_magic)
+            bsp_version = self.bsp_version
+            if isinstance(self.bsp_version, tuple):
+                bsp_version = bsp_version[0] + (bsp_version[1] << 16)
+            outfile.write(bsp_version.to_bytes(4, self.endianness))
+            for LUMP in self.branch.LUMP:
+                outfile.write(headers[LUMP.name].as_bytes())
+            outfile.write(self.revision.to_bytes(4, self.endianness))
+        # main .bsp is written
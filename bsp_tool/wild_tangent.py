@@ -1,5 +1,4 @@
 # NOTE: Genesis3D engine originally by Eclipse Entertainment
-import os
 
 from . import id_software
 
@@ -14,17 +13,17 @@ class Genesis3DBsp(id_software.IdTechBsp):
 
     def _preload(self):
         # collect files
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
-        # collect lumps
+        self.file = self._open_file()
+        # collect headers (lumps are loaded on first access)
         self.headers = dict()
-        self.loading_errors = dict()
+        self._loaded_lumps = dict()
+        self._loading_errors = dict()
         lump_header = self.branch.LumpHeader()
         while self.branch.LUMP(lump_header.id) != self.branch.LUMP.END:
             lump_header = self.branch.LumpHeader.from_stream(self.file)
             lump_name = self.branch.LUMP(lump_header.id).name
             lump_header.offset = self.file.tell()
             lump_header.length = lump_header.size * lump_header.count
-            self._preload_lump(lump_name, lump_header)
             self.headers[lump_name] = lump_header
             self.file.seek(lump_header.offset + lump_header.length)
         # validate & use HEADER lump
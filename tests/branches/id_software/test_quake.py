@@ -35,4 +35,39 @@ class TestMethods:
             # FAILING: assert len(data["lightmap_bytes"]) == data["width"] * data["height"]
 
     # TODO: test_model
-    # TODO: test_parse_vis
+
+    @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+    def test_parse_vis(self, bsp: QuakeBsp):
+        num_clusters = len([leaf for leaf in bsp.LEAVES if leaf.vis_offset != -1])
+        for i, leaf in enumerate(bsp.LEAVES):
+            assert len(bsp.parse_vis(i)) >= num_clusters + 7 >> 3
+
+    @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+    def test_vis_matrix(self, bsp: QuakeBsp):
+        pytest.importorskip("numpy")
+        matrix = bsp.vis_matrix()
+        assert bsp.vis_matrix() is matrix  # cached
+        assert len(matrix) == len(bsp.LEAVES)
+        for i in range(len(bsp.LEAVES)):
+            row = bsp.parse_vis(i)
+            assert [matrix.is_visible(i, b) for b in range(matrix.num_clusters)] == \
+                [bool(row[b >> 3] >> (b & 7) & 1) for b in range(matrix.num_clusters)]
+
+    @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+    def test_vis_matrix_cache(self, bsp: QuakeBsp, monkeypatch):
+        pytest.importorskip("numpy")
+        matrix = bsp.vis_matrix()
+        # NOTE: lump_hash encodes the whole lump; cache hits shouldn't need it
+        monkeypatch.setattr(bsp, "lump_hash", None, raising=False)
+        assert bsp.vis_matrix() is matrix
+        # edits invalidate, even if nothing really changed
+        leaf = bsp.LEAVES[0]
+        bsp.LEAVES[0] = leaf
+        assert bsp.vis_matrix() is not matrix
+        matrix = bsp.vis_matrix()
+        assert bsp.vis_matrix() is matrix
+        bsp.LEAVES[0].vis_offset = bsp.LEAVES[0].vis_offset  # in-place
+        assert bsp.vis_matrix() is matrix  # same bytes, same state
+        bsp.LEAVES[0].num_leaf_faces += 1
+        assert bsp.vis_matrix() is not matrix
+        bsp.LEAVES[0].num_leaf_faces -= 1
@@ -1,5 +1,6 @@
 import io
 import math
+import pickle
 import struct
 from typing import List
 
@@ -98,6 +99,22 @@ class TestVisibility:
             # TODO: verify decompressed_set
             # -- ensure trailing bits are zero
 
+    @pytest.mark.parametrize("bsp", vis_bsps.values(), ids=vis_bsps.keys())
+    def test_matrix(self, bsp: IdTechBsp):
+        pytest.importorskip("numpy")
+        vis = bsp.VISIBILITY
+        pvs, pas = vis.pvs_matrix(), vis.pas_matrix()
+        assert vis.pvs_matrix() is pvs  # cached
+        num_clusters = len(vis.pvs)
+        assert len(pvs) == len(pas) == pvs.num_clusters == num_clusters
+        for rows, matrix in ((vis.pvs, pvs), (vis.pas, pas)):
+            for a, row in enumerate(rows):
+                assert matrix.visible_from(a).tolist() == [b for b in range(num_clusters) if row[b >> 3] >> (b & 7) & 1]
+        rebuilt = quake2.Visibility.from_matrices(pvs, pas)
+        assert quake2.Visibility.from_bytes(rebuilt.as_bytes()).pvs == rebuilt.pvs
+        # cache is not pickled
+        assert "_matrices" not in pickle.loads(pickle.dumps(vis)).__dict__
+
 
 # @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
 # def test_lighting(bsp: IdTechBsp):
@@ -1,3 +1,4 @@
+import pickle
 import struct
 
 from ... import utils
@@ -28,6 +29,17 @@ def test_face_struct(bsp: IdTechBsp):  # the most complex MappedArray
     faces = [*map(quake3.Face.from_tuple, struct.iter_unpack(quake3.Face._format, raw_faces))]  # noqa F841
 
 
+@pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+def test_visibility(bsp: IdTechBsp):
+    vis = bsp.VISIBILITY
+    assert vis.as_bytes() == quake3.Visibility.from_bytes(vis.as_bytes()).as_bytes()
+    numpy = pytest.importorskip("numpy")
+    matrix = vis.matrix()
+    assert vis.matrix() is matrix  # cached
+    assert numpy.array_equal(matrix.as_bools(), [[matrix.is_visible(a, b) for b in range(len(vis))] for a in range(len(vis))])
+    assert pickle.loads(pickle.dumps(vis)) == vis
+
+
 # class TestMethods:
 #     @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
 #     def test_vertices_of_face(self, bsp: IdTechBsp):
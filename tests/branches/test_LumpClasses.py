@@ -6,7 +6,6 @@ import pytest
 
 from bsp_tool import branches
 from bsp_tool.branches import base
-from bsp_tool.utils import vector
 
 
 # NOTE: we indirectly test all _classes here, but they should have their own tests
@@ -43,6 +42,16 @@ for branch_script in sorted({*branches.quake_based, *branches.source_based}, key
         if issubclass(LumpClass, base.BitField):
             BitField_LumpClasses[f"{script_name}.{class_name}"] = LumpClass
 
+# every class w/ a _format, incl. BasicLumpClasses & list subclasses (e.g. quake.Edge)
+all_LumpClasses = dict()
+# ^ {"dev.game.LumpClass": LumpClass}
+for developer in branches.developers:
+    for branch_script in developer.scripts:
+        script_name = ".".join(branch_script.__name__.split(".")[-2:])
+        for class_name, LumpClass in inspect.getmembers(branch_script, inspect.isclass):
+            if isinstance(getattr(LumpClass, "_format", None), str) and LumpClass._format != "":
+                all_LumpClasses[f"{script_name}.{class_name}"] = LumpClass
+
 # NOTE: empty __init__ is invalid, thanks to time.SystemTime.__init__
 Struct_LumpClasses.pop("wild_tangent.genesis3d.Header")
 # TODO: establish alternate tests
@@ -81,10 +90,9 @@ def test_Struct(LumpClass):
 def test_MappedArray(LumpClass):
     assert hasattr(LumpClass, "_format")
     assert struct.calcsize(LumpClass._format) > 0, "invalid _format"
-    if not issubclass(LumpClass, vector.vec3):  # quake.Vertex special case
-        assert not hasattr(LumpClass, "__slots__"), "MappedArray doesn't use __slots__"  # Struct only
-    else:
-        assert LumpClass.__slots__ == LumpClass._mapping  # __slots__ inherited from vector.vec3
+    # NOTE: __slots__ are generated from _mapping by base.AutoSlots (quake.Vertex inherits from vector.vec3)
+    slots = {slot for cls in LumpClass.__mro__ for slot in cls.__dict__.get("__slots__", list())}
+    assert set(LumpClass._mapping).issubset(slots), "__slots__ do not match _mapping"
     assert not hasattr(LumpClass, "_arrays"), "MappedArray doesn't use _arrays"  # Struct only
     assert not hasattr(LumpClass, "_fields"), "MappedArray doesn't use _fields"  # BitField only
     assert len(LumpClass._mapping) != 0, "forgot to create _mapping"
@@ -101,7 +109,7 @@ def test_BitField(LumpClass):
     assert hasattr(LumpClass, "_format")
     assert LumpClass._format in "BHI", "BitField can only map a single unsigned integer"
     # TODO: allow endianness char "<" / ">" (NotYetImplemented)
-    assert not hasattr(LumpClass, "__slots__"), "BitField doesn't use __slots__"  # Struct only
+    assert LumpClass.__slots__ == list(LumpClass._fields), "__slots__ do not match _fields"  # see base.AutoSlots
     assert not hasattr(LumpClass, "_arrays"), "BitField doesn't use _arrays"  # Struct only
     assert not hasattr(LumpClass, "_mapping"), "BitField doesn't use _mapping"  # MappedArray only
     assert len(LumpClass._fields) != 0, "forgot to create _fields"
@@ -111,3 +119,11 @@ def test_BitField(LumpClass):
     # assert set(LumpClass._fields) == set(LumpClass.__annotations__), "missing type hints"
     assert LumpClass().as_bytes() == b"\0" * struct.calcsize(LumpClass._format)
     # NOTE: BitField does some verification in __init__
+
+
+@pytest.mark.parametrize("LumpClass", all_LumpClasses.values(), ids=all_LumpClasses.keys())
+def test_numpy_dtype(LumpClass):
+    pytest.importorskip("numpy")
+    dtype = base.numpy_dtype(LumpClass)
+    assert dtype.itemsize == struct.calcsize(LumpClass._format)
+    assert base.numpy_dtype(LumpClass) is dtype  # cached
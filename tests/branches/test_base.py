@@ -1,4 +1,6 @@
+import copy
 import enum
+import pickle
 import struct
 from typing import List
 
@@ -93,6 +95,40 @@ class TestStruct:
 
         assert len(test_Struct.as_bytes()) == struct.calcsize(AllChildTypes._format)
 
+    def test_layout(self):
+        layout = Example._layout
+        assert layout.struct is base.compiled_format(Example._format)
+        assert layout.attr_formats is base.struct_attr_formats[Example]
+        assert layout.slices == {"id": slice(0, 1), "position": slice(1, 4), "data": slice(4, 6),
+                                 "flags": slice(6, 7), "bitfield": slice(7, 8)}
+        assert layout.child_classes["position"] == dict()
+        assert Example()._layout is layout  # shared by all instances
+
+    def test_generated_methods(self):
+        assert base.is_generated(Example.from_tuple)
+        assert base.is_generated(Example.as_tuple)
+        raw_tuple = (1, 2.0, 3.0, 4.0, 5, 6, 2, 0x07000008)
+        generic = base.Struct.__dict__["from_tuple"].__func__(Example, raw_tuple)
+        generated = Example.from_tuple(raw_tuple)
+        for attr in Example.__slots__:
+            assert getattr(generic, attr).__class__ is getattr(generated, attr).__class__
+        assert generated.as_tuple() == base.Struct.as_tuple(generic) == list(raw_tuple)
+        # unexpected types fall back to the generic method
+        generated.position = (1.5, 2, 3)  # tuple instead of vec3
+        generated.data = [4.0, 5]
+        assert generated.as_tuple() == base.Struct.as_tuple(generated) == [1, 1.5, 2, 3, 4, 5, 2, 0x07000008]
+
+    def test_generated_methods_override(self):
+        class Checked(Example):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                assert self.id >= 0
+
+        assert not base.is_generated(Checked.from_tuple)  # must call __init__
+        assert base.is_generated(Checked.as_tuple)
+        with pytest.raises(AssertionError):
+            Checked.from_tuple((-1, 0.0, 0.0, 0.0, 0, 0, 0, 0))
+
 
 class TestMappedArray:
     # TODO: test non-Subclass MappedArrays do not overlap
@@ -160,6 +196,86 @@ class TestMappedArray:
         y = base.MappedArray((4, 5), 6, _mapping={"c": 2, "d": None}, _format="3b")
         assert x._attr_formats != y._attr_formats
 
+    def test_layout(self):
+        x = base.MappedArray(1, 2, 3, _mapping=[*"xyz"], _format="3f")
+        y = base.MappedArray(4, 5, 6, _mapping=[*"xyz"], _format="3f")
+        z = base.MappedArray(7, 8, 9, _mapping=[*"xyz"], _format="3i")
+        assert x._layout is y._layout  # equivalent mappings share a layout
+        assert x._layout is not z._layout
+        assert x.as_bytes() == struct.pack("3f", 1, 2, 3)
+
+        class Vertex(base.MappedArray):
+            _mapping = [*"xyz"]
+            _format = "3f"
+
+        assert Vertex()._layout is Vertex._layout
+        assert Vertex(_format="3i")._layout is z._layout
+
+        assert base.is_generated(Vertex.from_tuple)
+        v = Vertex.from_tuple((1.0, 2.0, 3.0))
+        assert v.as_tuple() == (1.0, 2.0, 3.0)
+        assert Vertex.from_tuple((1, 2, 3), _format="3i")._layout is z._layout
+
+    def test_spec_edited_in_place(self):
+        mapping = {"a": None, "b": 2}
+        x = base.MappedArray(1, (2, 3), _mapping=mapping, _format="3i")
+        mapping["b"] = 3
+        y = base.MappedArray(1, (2, 3, 4), _mapping=mapping, _format="4i")
+        assert type(x) is not type(y)
+        assert x._mapping == {"a": None, "b": 2}
+        assert y._mapping == {"a": None, "b": 3}
+        assert y.as_bytes() == struct.pack("4i", 1, 2, 3, 4)
+
+    def test_slots(self):
+        x = base.MappedArray(1, 2, 3, _mapping=[*"xyz"], _format="3i")
+        y = base.MappedArray(4, 5, 6, _mapping=[*"xyz"], _format="3i")
+        assert type(x) is type(y)  # equivalent specs share an anonymous subclass
+        assert type(x)._anonymous_base is base.MappedArray
+        assert not hasattr(x, "__dict__")
+        with pytest.raises(AttributeError):
+            x.w = 4
+        for clone in (copy.copy(x), copy.deepcopy(x), pickle.loads(pickle.dumps(x))):
+            assert type(clone) is type(x)
+            assert clone == x
+
+        class Vertex(base.MappedArray):
+            _mapping = {"position": [*"xyz"], "uv": [*"uv"]}
+            _format = "5f"
+
+        position = base.MappedArray(1, 2, 3, _mapping=[*"xyz"], _format="3f")
+        v = Vertex(position=position)
+        assert v.position == (1.0, 2.0, 3.0)
+        assert v.as_bytes() == struct.pack("5f", 1, 2, 3, 0, 0)
+        assert not hasattr(v, "__dict__")
+        assert copy.deepcopy(v) == v
+
+    def test_slots_extra_attrs(self):
+        class Labelled(base.MappedArray):
+            _mapping = [*"xyz"]
+            _format = "3f"
+
+            def __init__(self, *args, label: str = "", **kwargs):
+                super().__init__(*args, **kwargs)
+                self.label = label
+
+        class Tagged(base.MappedArray):
+            __slots__ = ["__dict__"]  # opt-out
+            _mapping = [*"xyz"]
+            _format = "3f"
+
+        labelled = Labelled(1, 2, 3, label="origin")
+        assert labelled.label == "origin"
+        assert "x" in Labelled.__slots__  # attrs are still slotted
+        tagged = Tagged(1, 2, 3)
+        tagged.tag = "spawn"
+        assert "x" in Tagged.__slots__
+        assert "x" not in tagged.__dict__
+        for x, attr in ((labelled, "label"), (tagged, "tag")):
+            clone = copy.deepcopy(x)
+            assert type(clone) is type(x)
+            assert clone == x
+            assert getattr(clone, attr) == getattr(x, attr)
+
     def test_as_cpp(self):  # covers BitField & Struct .as_cpp pretty well too
         basic = "struct MappedArray { int32_t x, y, z; };"
         multi_list = "struct MappedArray {\n\tint16_t a[2];\n\tint8_t b;\n};"
@@ -233,6 +349,27 @@ class TestBitField:
         with pytest.raises(OverflowError):
             test_bitfield.red = 0xFF + 1
 
+    def test_slots(self):
+        x = base.BitField(0xAA, 0xBB, _format="H", _fields={"lo": 8, "hi": 8})
+        assert type(x) is type(base.BitField.from_int(0, _format="H", _fields={"lo": 8, "hi": 8}))
+        assert not hasattr(x, "__dict__")
+        for clone in (copy.copy(x), copy.deepcopy(x), pickle.loads(pickle.dumps(x))):
+            assert type(clone) is type(x)
+            assert clone.as_int() == 0xBBAA
+
+        class Counted(base.BitField):
+            _fields = {"lo": 8, "hi": 8}
+            _format = "H"
+
+            def __setattr__(self, attr, value):
+                if attr in self._fields:
+                    super().__setattr__("edits", getattr(self, "edits", 0) + 1)
+                super().__setattr__(attr, value)
+
+        y = Counted(0xAA, 0xBB)
+        assert y.edits == 2
+        assert "lo" in Counted.__slots__
+
     def test_as_bytes(self):
         """wraps .as_int()"""
 
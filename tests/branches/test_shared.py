@@ -1,6 +1,8 @@
+import copy
+import pickle
 from typing import Dict, List
 
-from bsp_tool.branches.shared import Entities
+from bsp_tool.branches.shared import CompactEntities, CompactEntity, Entities, Entity
 
 import pytest
 
@@ -78,3 +80,205 @@ class TestEntities:
         assert len(parsed) == len(expected)
         for expected_dict, parsed_dict in zip(expected, parsed):
             assert parsed_dict == expected_dict
+
+    def test_crlf_multi_line_value(self):
+        expected = [dict(classname="ent_text", message="now playing\nsong\nby artist")]
+        raw = entity(**expected[0]).replace(b"\n", b"\r\n")
+        assert Entities.from_bytes(raw) == expected
+
+    def test_empty_key_value(self):
+        expected = [{"classname": "worldspawn", "": ""}]
+        assert Entities.from_bytes(entity(**expected[0])) == expected
+
+    def test_duplicate_keys(self):
+        raw = b'{\n"classname" "logic_auto"\n"OnMapSpawn" "a"\n"OnMapSpawn" "b"\n"OnMapSpawn" "c"\n}'
+        expected = [dict(classname="logic_auto", OnMapSpawn=["a", "b", "c"])]
+        parsed = Entities.from_bytes(raw)
+        assert parsed == expected
+        assert parsed.as_bytes() == raw + b"\n\x00"
+
+    def test_as_bytes(self):
+        expected = [*cases["two_entities"], *cases["two_newlines_in_value"]]
+        raw = Entities(expected).as_bytes()
+        assert raw == b"\n".join([entity(**d) for d in expected]) + b"\n\x00"
+        assert Entities.from_bytes(raw) == expected
+        assert Entities().as_bytes() == b"\n\x00"
+
+    @pytest.mark.parametrize("raw,line", [(b'{\n"classname" "worldspawn"\nbad line\n}', "L3: b'bad line'"),
+                                          (b'"classname" "worldspawn"', "L1"),
+                                          (b'{\n"classname" "worldspawn"\n}\n}', "L4: b'}'"),
+                                          (b'{\n"message" "unterminated\n}', "L2")])
+    def test_unexpected(self, raw: bytes, line: str):
+        with pytest.raises(RuntimeError, match=line):
+            Entities.from_bytes(raw)
+
+
+query_entities = [dict(classname="worldspawn"),
+                  dict(classname="light", targetname="lamp_1"),
+                  dict(classname="light", targetname="lamp_2", spawnflags="1"),
+                  dict(classname="func_door", targetname="door", model="*1"),
+                  dict(classname="logic_relay", OnTrigger=["lamp_1,TurnOn", "door,Open"]),
+                  dict(classname="info_player_start")]
+
+
+class TestEntityQuery:
+    def test_where(self):
+        entities = Entities(query_entities)
+        assert list(entities.where(classname="light")) == query_entities[1:3]
+        assert list(entities.where(classname="light", spawnflags="1")) == query_entities[2:3]
+        assert list(entities.where(spawnflags="1")) == query_entities[2:3]  # not indexed
+        assert list(entities.where(targetname="")) == [query_entities[i] for i in (0, 4, 5)]
+        assert list(entities.where(classname="light").where(targetname="lamp_2")) == query_entities[2:3]
+        assert len(entities.where(classname="not_a_classname")) == 0
+        assert entities.where(model="*1").first() == query_entities[3]
+        assert entities.where(model="*2").first(dict()) == dict()
+        assert set(entities._indexes) == {"classname", "targetname", "model"}
+
+    def test_where_any(self):
+        entities = Entities(query_entities)
+        expected = [query_entities[i] for i in (0, 3, 5)]
+        assert list(entities.where_any(classname="worldspawn", model="*1", targetname="not_a_targetname",
+                                       spawnflags="2")) == [query_entities[0], query_entities[3]]
+        assert list(entities.where_any(classname="info_player_start", model="*1", targetname="")) == [
+            query_entities[i] for i in (0, 3, 4, 5)]
+        assert list(entities.where_any(classname="worldspawn", model="*1").where_any(
+            classname="info_player_start", targetname="door")) == query_entities[3:4]
+        assert list(entities.where_any(classname="worldspawn", model="*1").where_any(
+            classname="info_player_start", targetname="door", spawnflags="")) == expected[:2]
+
+    def test_where_regex(self):
+        entities = Entities(query_entities)
+        assert list(entities.where_regex(classname="l.*", targetname="lamp_")) == query_entities[1:3]
+        assert list(entities.where_regex_any(classname="func_", targetname=".*_2$")) == query_entities[2:4]
+        assert list(entities.where(classname="light").where_regex(targetname=".*2")) == query_entities[2:3]
+
+    def test_search(self):
+        entities = Entities(query_entities)
+        assert entities.search(classname="light") == query_entities[1:3]
+        assert entities.search_any(classname="worldspawn", targetname="door") == [query_entities[0], query_entities[3]]
+        assert entities.search_regex(targetname="lamp") == query_entities[1:3]
+        assert entities.search_regex_any(classname="info", model=r"\*") == [query_entities[3], query_entities[5]]
+
+    def test_duplicate_keys(self):
+        entities = Entities(query_entities)
+        assert entities.index_of("OnTrigger") == {"lamp_1,TurnOn": [4], "door,Open": [4]}
+        assert entities.search(OnTrigger=["lamp_1,TurnOn", "door,Open"]) == query_entities[4:5]
+        assert list(entities.where(targetname="", OnTrigger=["lamp_1,TurnOn", "door,Open"])) == query_entities[4:5]
+        assert list(entities.where(classname=["light"])) == list()  # lists aren't looked up in indexes
+
+    def test_search_edits(self):
+        entities = Entities(copy.deepcopy(query_entities))
+        assert entities.search(classname="light") == query_entities[1:3]
+        entities.where(classname="light")  # build the index
+        entities[0]["classname"] = "x"
+        # NOTE: entities are plain dicts, so in-place edits are always checked
+        assert entities.search(classname="x") == [entities[0]]
+        assert entities.search(classname="worldspawn") == list()
+        assert entities.search_any(classname="x", targetname="door") == [entities[0], entities[3]]
+        assert entities.search_regex(classname="^x$") == [entities[0]]
+
+    def test_edits(self):
+        entities = Entities(copy.deepcopy(query_entities))
+        assert len(entities.where(classname="light")) == 2
+        entities.append(dict(classname="light"))
+        assert len(entities.where(classname="light")) == 3
+        del entities[1]
+        assert list(entities.where(classname="light")) == [query_entities[2], dict(classname="light")]
+        entities.insert(0, dict(classname="light"))
+        entities.sort(key=lambda e: e["classname"])
+        assert entities.where(classname="light").indices == [2, 3, 4]
+        # in-place edits to plain dicts can't be indexed, so they are always checked
+        entities[0]["classname"] = "light"
+        entities[2]["classname"] = "dark"
+        assert entities.where(classname="light").indices == [0, 3, 4]
+        assert entities.untracked() == [0, 1, 2, 3, 4, 5, 6]
+
+    def test_edits_in_place(self):
+        entities = Entities.from_bytes(Entities(query_entities).as_bytes())
+        assert all(isinstance(e, Entity) for e in entities)
+        assert entities.untracked() == list()
+        assert entities.where(model="*1").indices == [3]  # build the index
+        entities[3]["model"] = "*2"
+        entities[0]["model"] = "*1"
+        assert entities.where(model="*1").indices == [0]
+        assert entities.search(model="*2") == [entities[3]]
+        entities[0].pop("model")
+        entities[5].update(model="*1")
+        assert entities.where_any(model="*1", classname="worldspawn").indices == [0, 5]
+        del entities[3]["model"]
+        assert entities.search(model="*2") == list()
+        assert pickle.loads(pickle.dumps(entities)) == entities
+
+
+class TestCompactEntities:
+    raw = b"".join([b'{\n"classname" "worldspawn"\n"message" "map\nby author"\n}\n',
+                    b'{\n"classname" "logic_auto"\n"OnMapSpawn" "a"\n"spawnflags" "1"\n"OnMapSpawn" "b"\n}\n\x00'])
+
+    def test_from_bytes(self):
+        compact = CompactEntities.from_bytes(self.raw)
+        assert compact == Entities.from_bytes(self.raw)
+        assert all(isinstance(e, CompactEntity) and e._strings is compact.strings for e in compact)
+        assert compact[1]["OnMapSpawn"] == ["a", "b"]
+        assert list(compact[1].pairs())[-1] == ("OnMapSpawn", "b")
+        assert compact[1].get("targetname", "") == ""
+        assert dict(compact[1].items()) == {"classname": "logic_auto", "OnMapSpawn": ["a", "b"], "spawnflags": "1"}
+        assert len(compact.strings) == 10  # "1" is stored once
+        assert list(compact.where(classname="logic_auto")) == [compact[1]]
+
+    def test_as_bytes(self):
+        # NOTE: Entities groups duplicate keys, CompactEntities doesn't
+        assert CompactEntities.from_bytes(self.raw).as_bytes() == self.raw
+        assert Entities.from_bytes(self.raw).as_bytes() != self.raw
+
+    @pytest.mark.parametrize("raw", [b'{\n"classname" "worldspawn"\n\n}\n',  # Titanfall 2 mp_crossfire_spawn.ent
+                                     b'{\r\n\t"classname"\t"worldspawn"\r\n}\r\n\x00\x00',
+                                     b'\n{\n"classname" "worldspawn"\n}{\n"classname" "info_player_start" \n}\n\x00 \t'])
+    def test_layout(self, raw: bytes):
+        compact = CompactEntities.from_bytes(raw)
+        assert compact.as_bytes() == raw
+        assert pickle.loads(pickle.dumps(compact)).as_bytes() == raw
+
+    @pytest.mark.parametrize("raw", [b'{\r\n"classname" "worldspawn"\r\n"message" "map\r\nby author"\r\n}\r\n\x00',
+                                     b'// header\n{\n"classname" "worldspawn" // inline\n}\n// comment\n{\n}\n// end }\n',
+                                     b'{\n"classname" "worldspawn"\n"url" "http://a.b"}\n\x00',
+                                     b'{\n"classname" "worldspawn"\n"message" "caf\xe9"\n}\n\x00'])  # latin-1
+    def test_lossless(self, raw: bytes):
+        compact = CompactEntities.from_bytes(raw)
+        assert compact.as_bytes() == raw
+        assert pickle.loads(pickle.dumps(compact)).as_bytes() == raw
+
+    def test_lossless_values(self):
+        raw = b'{\r\n"classname" "worldspawn"\r\n"message" "map\r\nby author"\r\n}\r\n\x00'
+        compact = CompactEntities.from_bytes(raw)
+        assert compact == Entities.from_bytes(raw)  # values are read w/ "\n" line endings
+        compact[0]["message"] = "edited"  # edits reset the layout
+        assert compact.as_bytes() == b'{\n"classname" "worldspawn"\n"message" "edited"\n}\r\n\x00'
+        compact = CompactEntities.from_bytes(b'{\n"message" "caf\xe9"\n}\n')
+        assert compact[0]["message"] == "caf\udce9"  # surrogateescape
+
+    def test_edits(self):
+        compact = CompactEntities.from_bytes(self.raw)
+        compact[1]["OnMapSpawn"] = ["c", "d", "e"]
+        assert list(compact[1].pairs()) == [("classname", "logic_auto"), *[("OnMapSpawn", x) for x in "cde"],
+                                            ("spawnflags", "1")]
+        compact[1]["targetname"] = "auto"
+        del compact[1]["spawnflags"]
+        assert "spawnflags" not in compact[1] and "targetname" in compact[1]
+        with pytest.raises(KeyError):
+            del compact[1]["spawnflags"]
+        compact.append(dict(classname="light", OnTrigger=["x", "y"]))
+        compact.extend(Entities.from_bytes(self.raw))
+        compact[0] = dict(classname="worldspawn")
+        assert all(isinstance(e, CompactEntity) and e._strings is compact.strings for e in compact)
+        assert CompactEntities.from_bytes(compact.as_bytes()) == compact
+        assert len(compact.where(classname="logic_auto")) == 2
+        compact[1]["classname"] = "logic_relay"  # in place
+        assert len(compact.where(classname="logic_auto")) == 1
+        assert compact.untracked() == list()
+
+    def test_pickle(self):
+        compact = CompactEntities.from_bytes(self.raw[:-1])  # no null terminator
+        unpickled = pickle.loads(pickle.dumps(compact))
+        assert unpickled == compact
+        assert unpickled.strings is unpickled[0]._strings
+        assert unpickled.as_bytes() == self.raw[:-1]
@@ -0,0 +1,82 @@
+import pickle
+import random
+
+from bsp_tool.branches import visibility
+
+import pytest
+
+
+def random_rows(num_rows: int, num_clusters: int, seed: int = 0):
+    rng = random.Random(seed)
+    row_size = num_clusters + 7 >> 3
+    rows = list()
+    for i in range(num_rows):
+        row = bytearray(row_size)
+        for cluster in rng.sample(range(num_clusters), rng.randrange(num_clusters)):
+            row[cluster >> 3] |= 1 << (cluster & 7)
+        rows.append(bytes(row))
+    return rows
+
+
+class TestRunLength:
+    def test_round_trip(self):
+        rows = random_rows(64, 300)
+        encoded = [visibility.run_length_encode(row) for row in rows]
+        raw = b"".join(encoded)
+        offsets = [sum(map(len, encoded[:i])) for i in range(len(encoded))]
+        for row, offset, end in zip(rows, offsets, [*offsets[1:], len(raw)]):
+            assert visibility.run_length_decode(raw, offset, len(row)) == (row, end)
+        assert visibility.decode_rows(raw, offsets, 300 + 7 >> 3) == rows
+        assert visibility.decode_rows(raw, offsets[::-1], 300 + 7 >> 3) == rows[::-1]
+
+    def test_overshoot(self):
+        # NOTE: the last run of zeroes can decompress past the end of a row; kept so rows re-encode identically
+        raw = b"\x01\x00\x04\x02\x00\x03"
+        assert visibility.run_length_decode(raw, 0, 2) == (b"\x01\x00\x00\x00\x00", 3)
+        assert visibility.decode_rows(raw, [0, 3], 2) == [b"\x01\x00\x00\x00\x00", b"\x02\x00\x00\x00"]
+
+    def test_invalid(self):
+        with pytest.raises(RuntimeError):
+            visibility.decode_rows(b"\x01\x00\x00", [0], 4)  # zero count
+        with pytest.raises(RuntimeError):
+            visibility.decode_rows(b"\x01\x02", [0], 4)  # truncated
+        with pytest.raises(RuntimeError):
+            visibility.decode_rows(b"\x01\x00", [0], 4)  # missing count
+
+
+class TestVisibilityMatrix:
+    def test_queries(self):
+        pytest.importorskip("numpy")
+        rows = random_rows(50, 50)
+        matrix = visibility.VisibilityMatrix.from_rows(rows)
+        assert matrix.rows() == rows
+        visible = [[bool(row[b >> 3] >> (b & 7) & 1) for b in range(50)] for row in rows]
+        assert matrix.as_bools().tolist() == visible
+        for a in range(50):
+            assert matrix.visible_from(a).tolist() == [b for b in range(50) if visible[a][b]]
+            assert all(matrix.is_visible(a, b) == visible[a][b] for b in range(50))
+        assert matrix.visible_counts().tolist() == [sum(row) for row in visible]
+        pairs = [(a, b) for a in range(50) for b in range(0, 50, 7)]
+        a, b = zip(*pairs)
+        assert matrix.are_visible(a, b).tolist() == [visible[a][b] for a, b in pairs]
+
+    def test_trailing_bits(self):
+        pytest.importorskip("numpy")
+        matrix = visibility.VisibilityMatrix.from_rows([b"\xFF\xFF\x00", b"\xFF"], 10)
+        assert matrix.rows() == [b"\xFF\x03", b"\xFF\x00"]
+        assert matrix.visible_counts().tolist() == [10, 8]
+
+    def test_cache(self):
+        pytest.importorskip("numpy")
+
+        class Owner:
+            rows = random_rows(8, 8)
+
+        owner = Owner()
+        matrix = visibility.cached_matrix(owner, "rows", owner.rows)
+        assert visibility.cached_matrix(owner, "rows", owner.rows) is matrix
+        owner.rows[0] = b"\x00"
+        edited = visibility.cached_matrix(owner, "rows", owner.rows)
+        assert edited is not matrix
+        assert edited.rows()[0] == b"\x00"
+        assert pickle.loads(pickle.dumps(edited)).rows() == edited.rows()
@@ -1,12 +1,39 @@
+import pickle
+
 from ... import utils
 from bsp_tool import ValveBsp
-from bsp_tool.branches.valve import orange_box_x360
+from bsp_tool.branches.respawn import titanfall_x360
+from bsp_tool.branches.valve import orange_box_x360, sdk_2013_x360
+
+import pytest
 
 
 bsps = utils.get_test_maps(ValveBsp, {
     orange_box_x360: ["Xbox360/The Orange Box"]})
 
 
+x360_LumpClasses = {
+    LumpClass: f"{branch_script.__name__}.{LumpClass.__qualname__}"
+    for branch_script in (orange_box_x360, sdk_2013_x360, titanfall_x360)
+    for LumpClass in [
+        *[LumpClass
+          for LumpClass_dict in (branch_script.BASIC_LUMP_CLASSES, branch_script.LUMP_CLASSES)
+          for versions in LumpClass_dict.values()
+          for LumpClass in versions.values()],
+        *[value for name, value in vars(branch_script).items() if name.endswith("_x360") and isinstance(value, type)]]}
+
+
+@pytest.mark.parametrize("LumpClass", x360_LumpClasses.keys(), ids=x360_LumpClasses.values())
+def test_pickle_LumpClass(LumpClass):
+    assert pickle.loads(pickle.dumps(LumpClass)) is LumpClass
+
+
+@pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+def test_pickle_entry(bsp):
+    vertex_normal = bsp.VERTEX_NORMALS[0]
+    assert pickle.loads(pickle.dumps(vertex_normal)) == vertex_normal
+
+
 class TestMethods:
     ...
 
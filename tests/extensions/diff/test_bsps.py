@@ -31,6 +31,42 @@ class TestBspDiff:
         lump_diff = self.diff.DISPLACEMENT_INFO
         assert isinstance(lump_diff, diff.lumps.NoneDiff)
 
+    def test_unchanged_lumps(self):
+        unchanged = self.diff.unchanged_lumps()
+        assert "PLANES" not in unchanged
+        assert all(old_bsp.lump_hash(L) == new_bsp.lump_hash(L) for L in unchanged)
+
     # TODO: save
-    # TODO: has_no_changes
-    # TODO: what_changed
+
+
+def edited_copy(filename: str) -> (ValveBsp, ValveBsp):
+    old = ValveBsp(orange_box, filename)
+    new = ValveBsp(orange_box, filename)
+    new.VERTICES[0].x += 1
+    new.PLANES[1].distance += 1
+    return old, new
+
+
+def test_has_no_changes():
+    filename = "tests/maps/Team Fortress 2/test2.bsp"
+    old, new = ValveBsp(orange_box, filename), ValveBsp(orange_box, filename)
+    bsp_diff = diff.bsps.BspDiff(old, new)
+    assert bsp_diff.has_no_changes()
+    assert bsp_diff.changed_lumps() == list()
+    assert isinstance(bsp_diff.ENTITIES, diff.lumps.IdenticalDiff)
+    assert "ENTITIES" not in old.__dict__  # wasn't decoded
+    old.file.close()
+    new.file.close()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_short_stats(max_workers):
+    old, new = edited_copy("tests/maps/Team Fortress 2/test2.bsp")
+    bsp_diff = diff.bsps.BspDiff(old, new)
+    assert not bsp_diff.has_no_changes()
+    assert bsp_diff.what_changed() == {"VERTICES", "PLANES"}
+    assert isinstance(bsp_diff.VERTICES, diff.lumps.BspLumpDiff)
+    stats = bsp_diff.short_stats(max_workers=max_workers)
+    assert stats == {"VERTICES": "1 insertions(+) 1 deletions(-)", "PLANES": "1 insertions(+) 1 deletions(-)"}
+    old.file.close()
+    new.file.close()
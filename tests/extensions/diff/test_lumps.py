@@ -1,5 +1,11 @@
+import sys
+
+from bsp_tool import ValveBsp
+from bsp_tool.branches.valve import orange_box
 from bsp_tool.extensions import diff
 
+import pytest
+
 
 # TODO: TestNoneDiff  (short_stats only)
 # TODO: TestDiffLumps  (assigning diff class)
@@ -8,3 +14,26 @@ from bsp_tool.extensions import diff
 # -- branches.base.* -> diff.base.Diff
 # -- RawBspLump -> NotImplementedError
 # -- * -> diff.base.Diff
+
+
+class TestBspLumpDiff:
+    @pytest.mark.parametrize("has_numpy", [True, False])
+    def test_short_stats(self, monkeypatch, has_numpy):
+        if has_numpy:
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setitem(sys.modules, "numpy", None)  # import raises ImportError
+        filename = "tests/maps/Team Fortress 2/test2.bsp"
+        old, new = ValveBsp(orange_box, filename), ValveBsp(orange_box, filename)
+        lump_diff = diff.lumps.diff_lumps(old.VERTICES, new.VERTICES)
+        assert isinstance(lump_diff, diff.lumps.BspLumpDiff)
+        assert lump_diff.has_no_changes()
+        assert lump_diff.short_stats() == "0 insertions(+) 0 deletions(-)"
+        new.VERTICES[0].x += 1
+        new.VERTICES.append(new.VERTICES[0])  # duplicates don't count, same as diff.base.Diff
+        new.VERTICES.append(old.VERTICES[-1].__class__(1234, 5678, 9))
+        assert not lump_diff.has_no_changes()
+        expected = diff.base.Diff(old.VERTICES, new.VERTICES).short_stats()
+        assert lump_diff.short_stats() == expected == "2 insertions(+) 1 deletions(-)"
+        old.file.close()
+        new.file.close()
@@ -1,3 +1,5 @@
+import os
+
 from .. import utils
 from bsp_tool import RespawnBsp
 from bsp_tool.branches.respawn import titanfall2
@@ -17,3 +19,34 @@ def test_no_errors(bsp):
 @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
 def test_entities_loaded(bsp):
     assert bsp.ENTITIES[0]["classname"] == "worldspawn"
+
+
+def test_lazy_entities(tmp_path):
+    bsp = RespawnBsp(titanfall2, "tests/maps/Titanfall 2/mp_crossfire.bsp")
+    assert bsp.entity_headers == {"ENTITIES_env": "ENTITIES01", "ENTITIES_spawn": "ENTITIES01"}
+    assert "ENTITIES_spawn" not in bsp.__dict__  # not parsed until accessed
+    spawn = bsp.ENTITIES_spawn
+    assert spawn[0]["classname"] == "info_spawnpoint_human"
+    assert bsp.ENTITIES_spawn is spawn
+    assert not hasattr(bsp, "ENTITIES_fx")
+    bsp.unload("ENTITIES_spawn")
+    assert bsp.ENTITIES_spawn is not spawn
+    assert bsp.ENTITIES_spawn == spawn
+    # unloaded .ent files are copied, loaded ones are written
+    bsp.ENTITIES_spawn[0]["origin"] = "0 0 0"
+    bsp.save_as(str(tmp_path / "mp_crossfire.bsp"))
+    with open("tests/maps/Titanfall 2/mp_crossfire_env.ent", "rb") as old:
+        with open(tmp_path / "mp_crossfire_env.ent", "rb") as new:
+            assert new.read() == old.read()
+    new_bsp = RespawnBsp(titanfall2, str(tmp_path / "mp_crossfire.bsp"))
+    assert new_bsp.entity_headers == bsp.entity_headers
+    assert new_bsp.ENTITIES_spawn[0]["origin"] == "0 0 0"
+    assert "ENTITIES_env" not in new_bsp.__dict__
+    # deleted .ent files aren't written
+    del bsp.ENTITIES_env
+    assert not hasattr(bsp, "ENTITIES_env")
+    bsp.save_as(str(tmp_path / "deleted" / "mp_crossfire.bsp"))
+    assert not os.path.exists(tmp_path / "deleted" / "mp_crossfire_env.ent")
+    assert os.path.exists(tmp_path / "deleted" / "mp_crossfire_spawn.ent")
+    bsp.file.close()
+    new_bsp.file.close()
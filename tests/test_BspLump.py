@@ -1,3 +1,6 @@
+import mmap
+import os
+
 from . import utils
 
 from bsp_tool import lumps
@@ -113,3 +116,34 @@ class TestBasicBspLump:
             assert len(lump[-2:]) == 2
             with pytest.raises(TypeError):
                 assert lump["one"]
+
+
+class TestMemoryMapped:
+    @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+    def test_matches_file(self, bsp):
+        filename = os.path.join(bsp.folder, bsp.filename)
+        bsp = bsp.__class__(bsp.branch, filename)  # fresh copy, other tests make changes
+        mapped_bsp = bsp.__class__(bsp.branch, filename, memory_map=True)
+        assert isinstance(mapped_bsp.file, mmap.mmap)
+        for lump_name in ("VERTICES", "LEAF_FACES"):
+            lump, mapped_lump = getattr(bsp, lump_name), getattr(mapped_bsp, lump_name)
+            assert mapped_lump.stream is mapped_bsp.file
+            assert list(lump) == list(mapped_lump)
+        raw_lump = raw_lump_of(mapped_bsp)
+        assert bytes(raw_lump) == bytes(raw_lump_of(bsp))
+        bsp.file.close()
+        mapped_bsp.file.close()
+
+
+class TestAsNumpy:
+    @pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+    def test_lump_as_bytes(self, bsp):
+        pytest.importorskip("numpy")
+        bsp = bsp.__class__(bsp.branch, os.path.join(bsp.folder, bsp.filename))  # fresh copy
+        for lump_name in ("VERTICES", "LEAF_FACES"):
+            raw_lump = bsp.lump_as_bytes(lump_name)
+            array = getattr(bsp, lump_name).as_numpy()
+            assert len(array) == len(getattr(bsp, lump_name))
+            setattr(bsp, lump_name, array)
+            assert bsp.lump_as_bytes(lump_name) == raw_lump
+        bsp.file.close()
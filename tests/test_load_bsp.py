@@ -1,7 +1,11 @@
 import fnmatch
+import hashlib
 import os
+import pickle
+import shutil
 
 from . import maplist
+import bsp_tool
 from bsp_tool import branches
 from bsp_tool import lumps
 from bsp_tool import load_bsp
@@ -77,7 +81,6 @@ def test_load_bsp(group_path, game_name, map_dirs):
                     elif game_name == "DDayNormandy" and m in dday_mappack_excludes:
                         continue  # maps probably tweaked in a text editor, all null bytes are spaces
                     bsp = load_bsp(bsp_filename, branch_script)
-                    bsp.file.close()  # avoid OSError "Too many open files"
                     bsp_id = (bsp.__class__.__name__, bsp.branch.__name__, bsp.bsp_version)  # debug info
                     loading_errors = dict()
                     for lump_name, error in bsp.loading_errors.items():
@@ -100,6 +103,7 @@ def test_load_bsp(group_path, game_name, map_dirs):
                             if not isinstance(bsp.external.GAME_LUMP, lumps.RawBspLump):  # skip unmapped game lumps
                                 loading_errors.update({f"external.GAME_LUMP.{k} v{bsp.external.GAME_LUMP.headers[k].version}": v  # noqa E501
                                                        for k, v in bsp.external.GAME_LUMP.loading_errors.items()})
+                    bsp.file.close()  # avoid OSError "Too many open files"
                     del bsp  # close all open files before pytest freezes locals() on assert
                     assert len(loading_errors) == 0, ", ".join(loading_errors.keys())  # pass loading_errors out
                 except NotImplementedError as nie:
@@ -115,3 +119,91 @@ def test_load_bsp(group_path, game_name, map_dirs):
     assert errors == dict(), "\n".join([f"{len(errors)} out of {total} .bsps failed",
                                         *map(str, types),  # BspClass, branch_script, bsp_version
                                         *{ln for ae in errors.values() for ln in ae.args[0].split("\n")[0].split(", ")}])
+
+
+test_maps = [os.path.join(d, m) for d, ds, ms in os.walk("tests/maps") for m in fnmatch.filter(ms, "*.*bsp")]
+
+
+@pytest.mark.parametrize("filename", test_maps, ids=[m[len("tests/maps/"):] for m in test_maps])
+def test_probe(filename):
+    probe = bsp_tool.probe(filename)
+    bsp = load_bsp(filename)
+    assert probe.BspClass == bsp.__class__
+    assert probe.branch == bsp.branch
+    assert (probe.file_magic, probe.bsp_version) == (bsp.file_magic, bsp.bsp_version)
+    assert probe.headers.keys() == bsp.headers.keys()
+    assert probe.signature == bsp.signature
+    assert probe.file_size == bsp.bsp_file_size == os.path.getsize(filename)
+    assert "_associated_files" not in bsp.__dict__ or bsp.__class__ == bsp_tool.RespawnBsp
+    bsp.file.close()
+
+
+def test_associated_files(tmp_path):
+    shutil.copy("tests/maps/Quake 3 Arena/mp_lobby.bsp", tmp_path / "dm.v2.bsp")
+    for filename in ("dm.v2.aas", "dm.txt"):
+        (tmp_path / filename).touch()
+    bsp = load_bsp(str(tmp_path / "dm.v2.bsp"))
+    assert sorted(bsp.associated_files) == ["dm.v2.aas", "dm.v2.bsp"]
+    bsp.file.close()
+
+
+@pytest.mark.parametrize("filename", test_maps, ids=[m[len("tests/maps/"):] for m in test_maps])
+def test_handle(filename):
+    bsp = load_bsp(filename)
+    other = pickle.loads(pickle.dumps(bsp.handle())).open()
+    assert other.__class__ == bsp.__class__
+    assert other.branch == bsp.branch
+    assert other.headers.keys() == bsp.headers.keys()
+    assert all(other.headers[n].as_tuple() == h.as_tuple() for n, h in bsp.headers.items())
+    assert other.loading_errors.keys() == bsp.loading_errors.keys()
+    for lump_name in bsp.headers:
+        if hasattr(bsp, lump_name) and isinstance(getattr(bsp, lump_name), lumps.RawBspLump):
+            assert bytes(getattr(other, lump_name)) == bytes(getattr(bsp, lump_name)), lump_name
+    bsp.file.close()
+    other.file.close()
+
+
+def test_handle_dirty_lumps():
+    bsp = load_bsp("tests/maps/Quake 3 Arena/mp_lobby.bsp")
+    bsp.PLANES[0] = bsp.PLANES[0].__class__(normal=(0, 0, 1), distance=64)
+    del bsp.PLANES[-1]
+    handle = pickle.loads(pickle.dumps(bsp.handle()))
+    assert set(handle.dirty_lumps) == {"PLANES"}
+    other = handle.open()
+    assert other is handle.open()
+    assert len(other.PLANES) == len(bsp.PLANES)
+    assert other.PLANES[0] == bsp.PLANES[0]
+    assert not other.is_dirty("VERTICES")
+    clean = pickle.loads(pickle.dumps(bsp.handle(dirty_lumps=False))).open()
+    assert len(clean.PLANES) == len(bsp.PLANES) + 1
+    for b in (bsp, other, clean):
+        b.file.close()
+
+
+@pytest.mark.parametrize("filename", test_maps, ids=[m[len("tests/maps/"):] for m in test_maps])
+def test_lump_hashes(filename):
+    bsp = load_bsp(filename)
+    hashes = bsp.lump_hashes()
+    assert hashes.keys() == bsp.headers.keys()
+    external_lumps = bsp.external.headers if isinstance(bsp, bsp_tool.RespawnBsp) else dict()
+    for lump_name, lump_header in bsp.headers.items():
+        if lump_name in external_lumps:
+            continue  # hashed from .bsp_lump file
+        bsp.file.seek(lump_header.offset)
+        raw_lump = bsp.file.read(lump_header.length)
+        assert hashes[lump_name] == hashlib.blake2b(raw_lump, digest_size=16).hexdigest(), lump_name
+    assert bsp.lump_hashes() == hashes
+    bsp.file.close()
+
+
+def test_lump_hashes_edits():
+    bsp = load_bsp("tests/maps/Quake 3 Arena/mp_lobby.bsp")
+    hashes = bsp.lump_hashes()
+    distance = bsp.PLANES[0].distance
+    bsp.PLANES[0].distance += 1
+    edited = bsp.lump_hashes()
+    assert {n for n in hashes if edited[n] != hashes[n]} == {"PLANES"}
+    assert edited["PLANES"] == hashlib.blake2b(bsp.lump_as_bytes("PLANES"), digest_size=16).hexdigest()
+    bsp.PLANES[0].distance = distance
+    assert bsp.lump_hashes() == hashes
+    bsp.file.close()
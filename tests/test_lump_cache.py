@@ -0,0 +1,158 @@
+import os
+import pickle
+import struct
+import threading
+
+from bsp_tool import load_bsp
+from bsp_tool.branches import shared
+from bsp_tool.branches.id_software import quake
+from bsp_tool import lump_cache
+from bsp_tool.lump_cache import LumpCache
+
+import pytest
+
+
+raw_entities = b'{\n"classname" "worldspawn"\n}\n{\n"classname" "info_player_start"\n"origin" "0 0 64"\n}\n\x00'
+
+
+class CountingEntities(shared.Entities):
+    decoded = 0
+
+    @classmethod
+    def from_bytes(cls, raw_lump: bytes):
+        cls.decoded += 1
+        return super().from_bytes(raw_lump)
+
+
+class UnpicklableLump(bytearray):
+    @classmethod
+    def from_bytes(cls, raw_lump: bytes):
+        out = cls(raw_lump)
+        out.lock = threading.Lock()
+        return out
+
+
+class ArrayLump:
+    def __init__(self, array):
+        self.array = array
+
+    @classmethod
+    def from_bytes(cls, raw_lump: bytes):
+        import numpy
+        return cls(numpy.frombuffer(raw_lump, dtype="<f4").copy())
+
+
+unpickled = list()
+
+
+class Payload:
+    def __reduce__(self):
+        return unpickled.append, ("payload",)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LumpCache(str(tmp_path / "lump_cache"))
+
+
+def test_hit(cache):
+    CountingEntities.decoded = 0
+    first = cache.from_bytes(CountingEntities, raw_entities)
+    second = cache.from_bytes(CountingEntities, raw_entities)
+    assert CountingEntities.decoded == 1
+    assert second is not first
+    assert second.as_bytes() == first.as_bytes() == raw_entities
+    assert len(cache.entries()) == 1
+    # different bytes or decoder; different entry
+    cache.from_bytes(CountingEntities, raw_entities.replace(b"64", b"32"))
+    cache.from_bytes(shared.Entities, raw_entities)
+    assert CountingEntities.decoded == 2
+    assert len(cache.entries()) == 3
+
+
+def test_corrupt(cache):
+    CountingEntities.decoded = 0
+    cache.from_bytes(CountingEntities, raw_entities)
+    path, size, last_used = cache.entries()[0]
+    with open(path, "wb") as cache_file:
+        cache_file.write(b"not a pickle")
+    assert cache.from_bytes(CountingEntities, raw_entities).as_bytes() == raw_entities
+    assert CountingEntities.decoded == 2
+    assert cache.load(path).as_bytes() == raw_entities  # overwritten
+
+
+def test_secret(tmp_path):
+    folder = str(tmp_path / "lump_cache")
+    CountingEntities.decoded = 0
+    LumpCache(folder, secret=b"hunter2").from_bytes(CountingEntities, raw_entities)
+    LumpCache(folder, secret=b"hunter2").from_bytes(CountingEntities, raw_entities)
+    assert CountingEntities.decoded == 1
+    LumpCache(folder, secret=b"swordfish").from_bytes(CountingEntities, raw_entities)
+    assert CountingEntities.decoded == 2
+    # planted pickles are never loaded
+    cache = LumpCache(folder, secret=b"swordfish")
+    path, size, last_used = cache.entries()[0]
+    data = pickle.dumps(Payload())
+    with open(path, "wb") as cache_file:
+        cache_file.write(lump_cache.entry_header.pack(cache.magic, bytes(32), len(data), 0) + data)
+    cache.from_bytes(CountingEntities, raw_entities)
+    assert CountingEntities.decoded == 3
+    assert unpickled == list()
+    assert pickle.loads(pickle.dumps(cache)).secret == b"swordfish"
+
+
+def test_out_of_band(cache):
+    pytest.importorskip("numpy")
+    raw_lump = struct.pack("4f", 1, 2, 3, 4)
+    cache.from_bytes(ArrayLump, raw_lump)
+    path, size, last_used = cache.entries()[0]
+    with open(path, "rb") as cache_file:
+        assert cache_file.read().endswith(raw_lump)  # stored raw, after the pickle
+    lump = cache.from_bytes(ArrayLump, raw_lump)
+    assert lump.array.tolist() == [1, 2, 3, 4]
+    lump.array[0] = 5  # writable
+
+
+def test_prune(cache):
+    for i in range(16):
+        cache.from_bytes(shared.Entities, raw_entities.replace(b"64", str(i).encode()))
+    entries = cache.entries()
+    total_size = sum(size for path, size, last_used in entries)
+    oldest, newest = min(entries, key=lambda e: e[2])[0], max(entries, key=lambda e: e[2])[0]
+    cache.prune(max_size=total_size // 2)
+    remaining = {path for path, size, last_used in cache.entries()}
+    assert sum(os.path.getsize(p) for p in remaining) <= total_size * 3 // 8
+    assert oldest not in remaining and newest in remaining
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_unpicklable(cache):
+    # NOTE: lumps which can't be pickled are decoded every time
+    lump = cache.from_bytes(UnpicklableLump, b"1234")
+    assert lump == b"1234"
+    assert cache.entries() == []
+
+
+def test_load_bsp(cache):
+    filename = "tests/maps/Quake/mp_lobby.bsp"
+    bsp = load_bsp(filename, lump_cache=cache)
+    assert bsp.lump_cache is cache
+    assert bsp.loading_errors == dict()
+    assert isinstance(bsp.MIP_TEXTURES, quake.MipTextureLump)
+    assert len(cache.entries()) == len(bsp.branch.SPECIAL_LUMP_CLASSES)
+    cached = load_bsp(filename, lump_cache=cache)
+    assert cached.ENTITIES.as_bytes() == bsp.ENTITIES.as_bytes()
+    assert [mips for miptex, mips in cached.MIP_TEXTURES] == [mips for miptex, mips in bsp.MIP_TEXTURES]
+    bsp.file.close()
+    cached.file.close()
+
+
+def test_game_lump(cache):
+    filename = "tests/maps/Team Fortress 2/test2.bsp"
+    bsp = load_bsp(filename, lump_cache=cache)
+    sprp = bsp.GAME_LUMP.sprp
+    cached = load_bsp(filename, lump_cache=cache).GAME_LUMP.sprp
+    assert len(cache.entries()) > 0
+    assert cached.as_bytes() == sprp.as_bytes()
+    bsp.file.close()
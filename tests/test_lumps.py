@@ -1,8 +1,15 @@
 import collections
+from concurrent import futures
 import io
+import sys
 
+from bsp_tool import load_bsp
 from bsp_tool import lumps
 from bsp_tool.branches import base
+from bsp_tool.branches import shared
+from bsp_tool.branches.id_software import quake
+from bsp_tool.branches.respawn import titanfall
+from bsp_tool.branches.valve import orange_box_x360
 
 import pytest
 
@@ -35,9 +42,50 @@ class TestRemapSliceToRange:
         assert lumps._remap_slice_to_range(slice(0, 69, 1), 50) == range(0, 50, 1)
 
 
+class TestReadAt:
+    def test_streams(self, tmp_path):
+        data = bytes(range(256))
+        with open(tmp_path / "test.bin", "wb") as file:
+            file.write(data)
+        with open(tmp_path / "test.bin", "rb") as file:
+            file.seek(7)
+            assert lumps.read_at(file, 16, 4) == data[16:20]
+            assert file.tell() == 7  # cursor doesn't move
+            assert lumps.read_at(file, 254, 4) == data[254:]
+        for stream in (io.BytesIO(data), lumps.open_stream(tmp_path / "test.bin", memory_map=True)):
+            assert lumps.read_at(stream, 16, 4) == data[16:20]
+            stream.close()
+
+    def test_threads(self, tmp_path):
+        header = LumpHeader_basic(offset=0, length=6 * 0x1000)
+        data = b"".join(LumpClass_basic(i, i, i).as_bytes() for i in range(0x1000))
+        with open(tmp_path / "test.bin", "wb") as file:
+            file.write(data)
+        with open(tmp_path / "test.bin", "rb") as file:
+            lump = lumps.BspLump.from_header(file, header, LumpClass_basic)
+            lump.cache_size = 0
+
+            def read_lump(start: int) -> bool:
+                return all(lump[i].x == i for i in range(start, 0x1000, 7))
+
+            with futures.ThreadPoolExecutor(8) as executor:
+                assert all(executor.map(read_lump, range(7)))
+
+
 class TestDecompress:
     # TODO: test decompression on a repacked ValveBsp
-    ...
+    def test_reload(self):
+        bsp = load_bsp("tests/maps/Xbox360/The Orange Box/shack.360.bsp")
+        compressed = [name for name, header in bsp.headers.items() if header.fourCC != 0]
+        assert len(compressed) > 0
+        headers = {name: bsp.headers[name].as_tuple() for name in compressed}
+        for name in compressed:
+            first = list(getattr(bsp, name))
+            assert bsp.headers[name].as_tuple() == headers[name]  # header still describes the file
+            bsp.unload(name)
+            assert list(getattr(bsp, name)) == first
+        assert bsp.loading_errors == dict()
+        bsp.file.close()
 
 
 LumpHeader_basic = collections.namedtuple("basic", ["offset", "length"])
@@ -51,7 +99,59 @@ class LumpClass_basic(base.MappedArray):
 class TestRawBspLump:
     """test the changes system & bytearray-like behaviour"""
     # TODO: tests to ensure RawBspLump behaves like a bytearray
-    ...
+    def test_slice(self):
+        header = LumpHeader_basic(offset=2, length=8)
+        stream = io.BytesIO(b"\xFF\xFF" + bytes(range(8)))
+        lump = lumps.RawBspLump.from_header(stream, header)
+        assert lump[::] == bytearray(range(8))
+        lump[3] = 0xAA
+        lump.append(0xBB)
+        assert lump[2:5] == bytearray([2, 0xAA, 4])
+        assert lump[::-3] == bytearray([0xBB, 5, 2])
+        assert lump[-2:] == bytearray([7, 0xBB])
+        assert list(lump._changes) == [3]  # appended entries are kept in _added
+
+    def test_piece_table(self):
+        header = LumpHeader_basic(offset=0, length=8)
+        stream = io.BytesIO(bytes(range(8)))
+        lump = lumps.RawBspLump.from_header(stream, header)
+        lump.insert(2, 0xAA)
+        lump.extend(b"\xBB\xCC")
+        del lump[5:7]
+        lump[0:1] = b"\xDD\xEE"
+        expected = bytearray([0xDD, 0xEE, 1, 0xAA, 2, 3, 6, 7, 0xBB, 0xCC])
+        assert lump[::] == expected
+        assert bytes(lump) == expected
+        assert len(lump) == len(expected)
+        assert len(lump._changes) == 0  # edits are pieces, not _changes
+        assert lump.pop() == 0xCC
+        assert lump.is_dirty()
+        # undoing edits merges pieces back together
+        lump = lumps.RawBspLump.from_header(stream, header)
+        lump.insert(4, 0xAA)
+        assert len(lump._pieces) == 3
+        del lump[4]
+        assert lump._pieces == [(None, 0, 8)]
+        assert not lump.is_dirty()
+
+    def test_bytes(self):
+        header = LumpHeader_basic(offset=2, length=8)
+        stream = io.BytesIO(b"\xFF\xFF" + bytes(range(8)))
+        lump = lumps.RawBspLump.from_header(stream, header)
+        assert bytes(lump) == bytes(range(8))
+        view = lump.as_memoryview()
+        assert view.readonly
+        with pytest.raises(BufferError):  # zero-copy; stream can't be resized while viewed
+            stream.truncate(0)
+        assert view.tobytes() == bytes(range(8))
+        view.release()
+        lump[0] = 0xAA
+        del lump[1]
+        expected = bytes([0xAA, *range(2, 8)])
+        assert bytes(lump) == expected
+        assert lump.as_memoryview().tobytes() == expected
+        if sys.version_info >= (3, 12):  # buffer protocol
+            assert memoryview(lump).tobytes() == expected
 
 
 class TestBspLump:
@@ -63,7 +163,159 @@ class TestBspLump:
         lump[0].x += 1
         assert lump[0].x == 2
 
+    def test_slice(self):
+        header = LumpHeader_basic(offset=6, length=6 * 8)
+        stream = io.BytesIO(b"\xFF" * 6 + b"".join([bytes([i, 0] * 3) for i in range(8)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        expected = [LumpClass_basic(i, i, i) for i in range(8)]
+        assert lump[::] == expected
+        assert lump[2:5] == expected[2:5]
+        assert lump[::3] == expected[::3]
+        assert lump[::-2] == expected[::-2]
+        assert lump[-3:] == expected[-3:]
+        assert lump[5:2] == list()
+        assert list(lump) == expected
+        assert len(lump._changes) == 0  # slices are copies
+
+    def test_slice_changes(self):
+        header = LumpHeader_basic(offset=0, length=6 * 4)
+        stream = io.BytesIO(b"".join([bytes([i, 0] * 3) for i in range(4)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        lump[1] = LumpClass_basic(9, 9, 9)
+        lump[3].z = 7
+        expected = [LumpClass_basic(0, 0, 0), LumpClass_basic(9, 9, 9), LumpClass_basic(2, 2, 2), LumpClass_basic(3, 3, 7)]
+        assert lump[::] == expected
+        assert list(lump) == expected
+        assert lump[::-1] == expected[::-1]
+
+    def test_iter_bytes(self):
+        header = LumpHeader_basic(offset=0, length=6 * 4)
+        stream = io.BytesIO(b"".join([bytes([i, 0] * 3) for i in range(4)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        lump._chunk_length = 3  # test chunk boundaries
+        lump[1].y = 9
+        del lump[2]
+        lump.append(LumpClass_basic(5, 5, 5))
+        lump.append(LumpClass_basic(6, 6, 6))
+        expected = b"".join(e.as_bytes() for e in lump[::])
+        assert b"".join(lump.iter_bytes()) == expected
+        assert len(expected) == 6 * 5
+
+    def test_insert(self):
+        header = LumpHeader_basic(offset=0, length=6 * 4)
+        stream = io.BytesIO(b"".join([bytes([i, 0] * 3) for i in range(4)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        lump[2].x = 9  # in-place edit
+        lump.insert(0, LumpClass_basic(5, 5, 5))
+        lump.insert(-1, LumpClass_basic(6, 6, 6))
+        assert lump[3].x == 9  # _changes & _cache follow the entry
+        lump[0].y = 7
+        lump.extend([LumpClass_basic(8, 8, 8)] * 2)
+        del lump[1:3]
+        expected = [(5, 7, 5), (9, 2, 2), (6, 6, 6), (3, 3, 3), (8, 8, 8), (8, 8, 8)]
+        assert [e.as_tuple() for e in lump] == expected
+        assert b"".join(lump.iter_bytes()) == b"".join(LumpClass_basic(*e).as_bytes() for e in expected)
+        with pytest.raises(ValueError):
+            lump[::2] = [LumpClass_basic()]
+
+    def test_is_dirty(self):
+        header = LumpHeader_basic(offset=0, length=6 * 4)
+        stream = io.BytesIO(b"".join([bytes([i, 0] * 3) for i in range(4)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        assert not lump.is_dirty()
+        assert lump[2].x == 2
+        assert len(lump._changes) == 0  # reads are cached, not journaled
+        assert not lump.is_dirty()
+        lump[2].x = 3
+        assert lump.is_dirty()
+        lump[2].x = 2
+        assert not lump.is_dirty()
+
+    def test_cache(self):
+        header = LumpHeader_basic(offset=0, length=6 * 8)
+        stream = io.BytesIO(b"".join([bytes([i, 0] * 3) for i in range(8)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        lump.cache_size = 2
+        assert lump[0] is lump[0]
+        assert (lump.cache_hits, lump.cache_misses) == (1, 1)
+        lump[1].y = 9  # in-place edit
+        for entry in lump[2:]:
+            entry.z = 7  # slices are copies
+        assert lump[1:3] == [LumpClass_basic(1, 9, 1), LumpClass_basic(2, 2, 2)]
+        assert len(lump._cache) == 2
+        assert len(lump._changes) == 0
+        lump[3], lump[4]  # evict 1 & 2
+        assert list(lump._cache) == [3, 4]
+        assert list(lump._changes) == [1]  # edited in-place, so it was journaled
+        assert lump[1].y == 9
+        assert lump.get(5, mutable=False) is not lump.get(5, mutable=False)
+        lump.clear_cache()
+        assert len(lump._cache) == 0
+
+    def test_edit_after_eviction(self):
+        header = LumpHeader_basic(offset=0, length=6 * 8)
+        stream = io.BytesIO(b"".join([bytes([i, 0] * 3) for i in range(8)]))
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        lump.cache_size = 2
+        entry = lump[1]
+        for i in range(2, 8):  # evict 1
+            lump[i]
+        assert 1 not in lump._cache
+        assert len(lump._changes) == 0
+        entry.z += 1  # edited after eviction, through a reference we still hold
+        assert lump[1] is entry
+        assert lump[1:2] == [LumpClass_basic(1, 1, 2)]
+        assert lump.is_dirty()
+        assert list(lump._changes) == [1]
+        assert bytes(lump)[6:12] == bytes([1, 0, 1, 0, 2, 0])
+
+
+class TestBasicBspLump:
+    def test_slice(self):
+        header = LumpHeader_basic(offset=0, length=2 * 5)
+        stream = io.BytesIO(b"".join([i.to_bytes(2, "little") for i in range(5)]))
+        lump = lumps.BasicBspLump.from_header(stream, header, shared.UnsignedShorts)
+        assert lump[::] == [*range(5)]
+        assert lump[1:4] == [1, 2, 3]
+        lump[2] = 7
+        assert lump[::2] == [0, 7, 4]
+        assert list(lump) == [0, 1, 7, 3, 4]
+        assert list(lump._changes) == [2]  # reads are never journaled
+        assert b"".join(lump.iter_bytes()) == b"".join([i.to_bytes(2, "little") for i in (0, 1, 7, 3, 4)])
+
 
 # TODO: external lump test files as part of test maps (Issue #16)
 # TODO: TestGameLump
 # TODO: TestDarkMessiahSPGameLump
+
+
+class TestAsNumpy:
+    def test_dtype(self):
+        numpy = pytest.importorskip("numpy")
+        dtype = base.numpy_dtype(titanfall.VertexLitBump)
+        assert dtype.itemsize == 44
+        assert dtype["albedo_uv"] == numpy.dtype(("<f4", (2,)))
+        assert dtype["lightmap"].names == ("uv", "step")
+        assert base.numpy_dtype(orange_box_x360.StaticPropv6_x360)["skin"] == numpy.dtype(">i4")
+        assert base.numpy_dtype(shared.UnsignedShorts) == numpy.dtype("=u2")
+        assert base.numpy_dtype(quake.Edge) == numpy.dtype(("=u2", (2,)))  # list subclass
+
+    def test_zero_copy(self):
+        pytest.importorskip("numpy")
+        header = LumpHeader_basic(offset=2, length=6 * 2)
+        stream = io.BytesIO(b"\xFF\xFF\x01\x00\x02\x00\x03\x00\x04\x00\x05\x00\x06\x00")
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        array = lump.as_numpy()
+        assert not array.flags.writeable
+        assert array["z"].tolist() == [3, 6]
+        assert array.tobytes() == stream.getvalue()[2:]
+
+    def test_changes(self):
+        pytest.importorskip("numpy")
+        header = LumpHeader_basic(offset=0, length=6 * 2)
+        stream = io.BytesIO(b"\x01\x00\x02\x00\x03\x00\x04\x00\x05\x00\x06\x00")
+        lump = lumps.BspLump.from_header(stream, header, LumpClass_basic)
+        lump[1].y = 9
+        lump.append(LumpClass_basic(7, 8, 9))
+        array = lump.as_numpy()
+        assert array.tolist() == [(1, 2, 3), (4, 9, 6), (7, 8, 9)]
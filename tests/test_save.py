@@ -4,7 +4,7 @@ import os
 import re
 import shutil
 from types import ModuleType
-from typing import List
+from typing import Dict, List
 
 # BspClasses
 # from bsp_tool import D3DBsp
@@ -14,6 +14,7 @@ from bsp_tool import ReMakeQuakeBsp
 from bsp_tool import RespawnBsp
 from bsp_tool import ValveBsp
 # branches
+from bsp_tool.branches.shared import CompactEntities
 from bsp_tool.branches.id_software import quake
 from bsp_tool.branches.id_software import quake2
 from bsp_tool.branches.id_software import quake3
@@ -177,3 +178,87 @@ def test_ValveBsp_strata(map_path: str):
     # bsp_diff = save_and_diff_backup(ValveBsp, strata, map_path)
     assert False
     ...
+
+
+def raw_lumps(bsp) -> Dict[str, bytes]:
+    out = dict()
+    for lump_name, header in bsp.headers.items():
+        bsp.file.seek(header.offset)
+        out[lump_name] = bsp.file.read(header.length)
+    return out
+
+
+@map_dirs_to_test("Team Fortress 2")
+def test_ValveBsp_save_unloaded(map_path: str):
+    """lumps which were never loaded are copied byte-for-byte"""
+    bsp = ValveBsp(orange_box, map_path)
+    old_lumps = raw_lumps(bsp)
+    bsp.save()
+    assert raw_lumps(bsp) == old_lumps
+    assert len(bsp.loading_errors) == 0
+
+
+@map_dirs_to_test("Team Fortress 2")
+def test_ValveBsp_save_clean(map_path: str):
+    """loaded lumps without changes are also copied byte-for-byte"""
+    bsp = ValveBsp(orange_box, map_path)
+    old_lumps = raw_lumps(bsp)
+    assert len(bsp.loading_errors) == 0  # loads every lump
+    for vertex in bsp.VERTICES:
+        vertex.x  # read-only access
+    bsp.PLANES[0].normal.x += 0  # writes the same value
+    dirty_lumps = {L for L in bsp.headers if bsp.is_dirty(L)}
+    assert "VERTICES" not in dirty_lumps
+    assert "PLANES" not in dirty_lumps
+    assert "ENTITIES" in dirty_lumps  # SpecialLumpClasses can't be checked
+    bsp.save()
+    new_lumps = raw_lumps(bsp)
+    assert {L for L in old_lumps if new_lumps[L] != old_lumps[L]}.issubset(dirty_lumps)
+
+
+@map_dirs_to_test("Team Fortress 2")
+def test_ValveBsp_save_changes(map_path: str):
+    bsp = ValveBsp(orange_box, map_path)
+    old_lumps = raw_lumps(bsp)
+    bsp.VERTICES[0].x += 1
+    bsp.VERTICES.append(bsp.VERTICES[1])
+    vertices = list(bsp.VERTICES)
+    bsp.save()
+    assert list(bsp.VERTICES) == vertices
+    new_lumps = raw_lumps(bsp)
+    assert new_lumps["PLANES"] == old_lumps["PLANES"]
+    assert new_lumps["VERTICES"] != old_lumps["VERTICES"]
+
+
+def test_RespawnBsp_save_compact_entities(tmp_path):
+    """CompactEntities are written byte-for-byte"""
+    map_path = "tests/maps/Titanfall 2/mp_crossfire.bsp"
+    bsp = RespawnBsp(titanfall2, map_path)
+    bsp.compact_entities = True
+    assert isinstance(bsp.ENTITIES, CompactEntities)
+    assert all(isinstance(getattr(bsp, L), CompactEntities) for L in bsp.entity_headers)  # not copied by save_as
+    bsp.save_as(str(tmp_path / os.path.basename(map_path)))
+    new_bsp = RespawnBsp(titanfall2, str(tmp_path / os.path.basename(map_path)))
+    assert len(bsp.entity_headers) == 2
+    assert raw_lumps(new_bsp)["ENTITIES"] == raw_lumps(bsp)["ENTITIES"]
+    for ent_LUMP_name in bsp.entity_headers:
+        ent_filename = f"{os.path.splitext(bsp.filename)[0]}_{ent_LUMP_name[len('ENTITIES_'):]}.ent"
+        with open(os.path.join(bsp.folder, ent_filename), "rb") as old, open(tmp_path / ent_filename, "rb") as new:
+            assert old.read() == new.read()
+    bsp.file.close()
+    new_bsp.file.close()
+
+
+def test_ValveBsp_save_memory_mapped(tmp_path):
+    """lumps still in use don't stop a memory-mapped .bsp from saving"""
+    pytest.importorskip("numpy")
+    map_path = str(tmp_path / "test2.bsp")
+    shutil.copy("tests/maps/Team Fortress 2/test2.bsp", map_path)
+    bsp = ValveBsp(orange_box, map_path, memory_map=True)
+    planes = bsp.PLANES.as_numpy()  # zero-copy view of the mmap
+    bsp.VERTICES[0].x += 1
+    vertices = list(bsp.VERTICES)
+    bsp.save()
+    assert list(bsp.VERTICES) == vertices
+    assert planes.tobytes() == bsp.lump_as_bytes("PLANES")
+    bsp.close()
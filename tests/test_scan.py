@@ -0,0 +1,97 @@
+import os
+import shutil
+import threading
+import zipfile
+
+from bsp_tool import branches
+from bsp_tool import scan
+from bsp_tool.extensions.archives import id_software
+
+import pytest
+
+
+maps_dir = os.path.join(os.getcwd(), "tests/maps")
+
+
+def lump_count(bsp) -> int:  # must be picklable, so no lambdas
+    return len(bsp.headers)
+
+
+def broken_callback(bsp):
+    raise RuntimeError("callback failed")
+
+
+def unpicklable_callback(bsp):
+    raise RuntimeError(threading.Lock())  # exceptions w/ unpicklable args can't be sent back from a worker
+
+
+scanned = list()
+
+
+def keep_bsp(bsp):  # max_workers=1 only
+    bsp.external.VERTICES  # open the .bsp_lump
+    scanned.append(bsp)
+
+
+def test_find_bsps():
+    found = list(scan.find_bsps(maps_dir))
+    assert len(found) > 0
+    assert all(f.lower().endswith((".bsp", ".d3dbsp")) for f in found)
+    assert not any(f.endswith(".bsp_lump") for f in found)
+    shallow = list(scan.find_bsps(maps_dir, recursive=False))
+    assert len(shallow) == 0  # test maps are sorted into folders per-game
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_scan(max_workers):
+    quake_dir = os.path.join(maps_dir, "Quake 3 Arena")
+    expected = set(scan.find_bsps(quake_dir))
+    results = list(scan.scan(quake_dir, lump_count, max_workers=max_workers))
+    assert {r.filename for r in results} == expected
+    for result in results:
+        assert result.error is None
+        assert result.branch is branches.id_software.quake3
+        assert result.result == len(branches.id_software.quake3.LUMP)
+        assert result.duration > 0
+
+
+def test_errors_captured():
+    filename = os.path.join(maps_dir, "Quake 3 Arena/mp_lobby.bsp")
+    result, = scan.scan(filename, broken_callback, max_workers=1)
+    assert result.error == "RuntimeError('callback failed')"
+    assert "broken_callback" in result.traceback
+    assert result.BspClass is not None
+
+
+def test_unpicklable_error():
+    filename = os.path.join(maps_dir, "Quake 3 Arena/mp_lobby.bsp")
+    result, = scan.scan(filename, unpicklable_callback, max_workers=2)
+    assert result.error.startswith("RuntimeError(<unlocked _thread.lock object")
+    assert "unpicklable_callback" in result.traceback
+
+
+@pytest.mark.parametrize("memory_map", [False, True])
+def test_files_closed(tmp_path, memory_map):
+    filename = str(tmp_path / "mp_crossfire.bsp")
+    shutil.copy(os.path.join(maps_dir, "Titanfall 2/mp_crossfire.bsp"), filename)
+    with open(f"{filename}.0003.bsp_lump", "wb") as bsp_lump_file:  # VERTICES
+        bsp_lump_file.write(bytes(12 * 8))
+    scanned.clear()
+    result, = scan.scan(filename, keep_bsp, max_workers=1, memory_map=memory_map)
+    assert result.error is None
+    bsp, = scanned
+    assert bsp.file.closed
+    assert bsp.external.VERTICES.stream.closed
+
+
+def test_archives(tmp_path):
+    filename = os.path.join(maps_dir, "Quake 3 Arena/mp_lobby.bsp")
+    with zipfile.ZipFile(tmp_path / "maps.pk3", "w") as pk3:
+        pk3.write(filename, "maps/mp_lobby.bsp")
+    results = list(scan.scan(str(tmp_path), lump_count, archive_classes=[id_software.Pk3], max_workers=2))
+    assert len(results) == 1
+    result = results[0]
+    assert result.filename == "maps/mp_lobby.bsp"
+    assert result.archive == str(tmp_path / "maps.pk3")
+    assert result.error is None
+    assert result.result == len(branches.id_software.quake3.LUMP)
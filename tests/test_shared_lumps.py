@@ -0,0 +1,70 @@
+from concurrent import futures
+import pickle
+
+from bsp_tool import load_bsp
+from bsp_tool import shared_lumps
+
+import pytest
+
+
+numpy = pytest.importorskip("numpy")
+
+
+def vertex_sum(shared: shared_lumps.SharedLumps) -> float:  # must be picklable, so no lambdas
+    with shared:
+        return float(shared["VERTICES"]["x"].sum())
+
+
+@pytest.fixture
+def bsp():
+    bsp = load_bsp("tests/maps/Titanfall 2/mp_crossfire.bsp")
+    yield bsp
+    bsp.file.close()
+
+
+def test_publish(bsp):
+    with shared_lumps.publish(bsp, [*shared_lumps.default_lumps, "NOT_A_LUMP", "LIGHTMAP_DATA_SKY"]) as shared:
+        expected = {n for n in shared_lumps.default_lumps if n in bsp.headers}
+        assert set(shared) == {*expected, "LIGHTMAP_DATA_SKY"}
+        for lump_name in expected:
+            array = shared[lump_name]
+            assert not array.flags.writeable
+            assert array.tobytes() == bsp.lump_as_bytes(lump_name)
+        assert bytes(shared["LIGHTMAP_DATA_SKY"]) == bytes(bsp.LIGHTMAP_DATA_SKY)
+        del array
+
+
+def test_edits(bsp):
+    bsp.PLANES[0] = bsp.PLANES[0].__class__(normal=(0, 0, 1), distance=64)
+    del bsp.PLANES[-1]
+    with shared_lumps.publish(bsp, ["PLANES"]) as shared:
+        planes = shared["PLANES"]
+        assert len(planes) == len(bsp.PLANES)
+        assert planes[0]["distance"] == 64
+        del planes
+
+
+def test_subarray():
+    tf2 = load_bsp("tests/maps/Team Fortress 2/test2.bsp")
+    with shared_lumps.publish(tf2, ["EDGES"]) as shared:
+        edges = shared["EDGES"]  # quake.Edge is a list subclass
+        assert edges.shape == (len(tf2.EDGES), 2)
+        assert edges.tolist() == [list(edge) for edge in tf2.EDGES]
+        del edges
+    tf2.file.close()
+
+
+def test_special_lump(bsp):
+    with pytest.raises(TypeError):
+        shared_lumps.publish(bsp, ["VERTICES", "ENTITIES"])
+
+
+def test_workers(bsp):
+    with shared_lumps.publish(bsp, ["VERTICES"]) as shared:
+        manifest = pickle.loads(pickle.dumps(shared))
+        assert manifest.manifest == shared.manifest
+        assert not manifest._owner
+        expected = float(shared["VERTICES"]["x"].sum())
+        with futures.ProcessPoolExecutor(2) as executor:
+            results = list(executor.map(vertex_sum, [shared] * 4))
+        assert results == [expected] * 4
@@ -1,3 +1,5 @@
+import os
+
 from .. import utils
 from bsp_tool import ValveBsp
 from bsp_tool.branches.strata import strata
@@ -26,6 +28,39 @@ def test_entities_loaded(bsp):
     assert bsp.ENTITIES[0]["classname"] == "worldspawn"
 
 
+@pytest.mark.parametrize("bsp", bsps.values(), ids=bsps.keys())
+def test_lazy_loading(bsp):
+    bsp = ValveBsp(bsp.branch, os.path.join(bsp.folder, bsp.filename))  # fresh copy
+    assert "PAKFILE" not in bsp.__dict__
+    assert "ENTITIES" not in bsp.__dict__
+    assert bsp.ENTITIES[0]["classname"] == "worldspawn"
+    assert "ENTITIES" in bsp.__dict__
+    assert "PAKFILE" not in bsp.__dict__
+    bsp.ENTITIES[0]["classname"] = "unloaded"
+    bsp.unload("ENTITIES")  # discard changes
+    assert bsp.ENTITIES[0]["classname"] == "worldspawn"
+    assert len(bsp.loading_errors) == 0
+    assert "PAKFILE" in bsp.__dict__
+    bsp.file.close()
+
+
+def test_delete_lump(tmp_path):
+    bsp = ValveBsp(orange_box, "tests/maps/Team Fortress 2/test2.bsp")
+    num_planes = len(bsp.PLANES)
+    del bsp.PLANES
+    assert not hasattr(bsp, "PLANES")
+    assert bsp.lump_as_bytes("PLANES") == b""  # lump is empty / deleted
+    assert bsp.is_dirty("PLANES")
+    bsp.save_as(str(tmp_path / "test2.bsp"))
+    new_bsp = ValveBsp(orange_box, str(tmp_path / "test2.bsp"))
+    assert new_bsp.headers["PLANES"].length == 0
+    bsp.unload("PLANES")  # undelete
+    assert len(bsp.PLANES) == num_planes
+    assert not bsp.is_dirty("PLANES")
+    bsp.close()
+    new_bsp.close()
+
+
 @pytest.mark.parametrize("bsp", x360_bsps.values(), ids=x360_bsps.keys())
 def test_x360(bsp):
     assert len(bsp.loading_errors) == 0